@@ -0,0 +1,110 @@
+# Benchmark các codec UDP (common/codec.py) trên message thật của game: snapshot server gửi đi và input client gửi lên
+# Chạy: python -m benchmarks.codec_bench [--log match.ftml] [--ticks N] [--repeat N]
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+
+from benchmarks.engine_bench import ScriptedRoom
+from common.codec import CODECS, JSON
+from server.match_log import REC_INPUT, REC_TICK
+from server.replay import ReplayRunner
+
+
+def _normalize(message):
+    # Snapshot dùng chung dict với state của engine: chụp lại thành dữ liệu thuần như bên nhận thấy
+    return JSON.decode(JSON.encode(message))
+
+
+def _from_log(path, limit):
+    """Mô phỏng lại log trận, lấy snapshot sau mỗi tick và input đã ghi"""
+    runner = ReplayRunner(path)
+    snapshots, inputs = [], []
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for kind, data in runner._records:
+                runner._apply(kind, data)
+                if kind == REC_INPUT:
+                    inputs.append(_normalize(data[1]))
+                elif kind == REC_TICK:
+                    snapshots.append(_normalize(runner.engine.get_snapshot()))
+                    if len(snapshots) >= limit:
+                        break
+    finally:
+        runner.close()
+    return snapshots, inputs
+
+
+def _synthetic(ticks, seed):
+    """Không có log: dùng phòng chơi theo kịch bản của bench-engine"""
+    rng = random.Random(seed)
+    random.seed(seed)
+    snapshots, inputs = [], []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        room = ScriptedRoom(0, 0.1, rng)
+        queue_input = room.engine.queue_input
+
+        def capture(player_id, message):
+            inputs.append(_normalize(message))
+            return queue_input(player_id, message)
+
+        room.engine.queue_input = capture
+        for _ in range(ticks):
+            room.step(False)
+            snapshots.append(_normalize(room.engine.get_snapshot()))
+    return snapshots, inputs
+
+
+def _measure(codec, messages, repeat):
+    """(µs encode / message, µs decode / message, byte trung bình); kiểm tra roundtrip trước khi đo"""
+    encoded = [codec.encode(m) for m in messages]
+    for message, data in zip(messages, encoded):
+        if codec.decode(data) != message:
+            raise AssertionError(f"{codec.name}: roundtrip khác message gốc: {message!r}")
+    encode, decode = codec.encode, codec.decode
+    best_encode = best_decode = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for message in messages:
+            encode(message)
+        best_encode = min(best_encode, time.perf_counter() - start)
+        start = time.perf_counter()
+        for data in encoded:
+            decode(data)
+        best_decode = min(best_decode, time.perf_counter() - start)
+    count = len(messages)
+    return best_encode / count * 1e6, best_decode / count * 1e6, sum(map(len, encoded)) / count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.codec_bench', description="Compare UDP codecs on game messages")
+    parser.add_argument('--log', metavar='PATH', help='Match log (.ftml) to take snapshots/inputs from (default: scripted room)')
+    parser.add_argument('--ticks', type=int, default=1800, help='Snapshots to collect')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing runs per codec (best is reported)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.log:
+        snapshots, inputs = _from_log(args.log, args.ticks)
+    else:
+        snapshots, inputs = _synthetic(args.ticks, args.seed)
+    source = args.log or 'scripted room'
+    print(f"Source: {source}, {len(snapshots)} snapshots, {len(inputs)} inputs; codecs: {', '.join(CODECS)}")
+
+    for label, messages in (('snapshot', snapshots), ('input', inputs)):
+        if not messages:
+            continue
+        print(f"  {label:8s} {'codec':8s} {'bytes':>8s} {'encode µs':>10s} {'decode µs':>10s} {'msgs/s (enc+dec)':>17s}")
+        baseline = None
+        for codec in CODECS.values():
+            encode_us, decode_us, size = _measure(codec, messages, args.repeat)
+            baseline = baseline or size
+            print(f"  {'':8s} {codec.name:8s} {size:8.1f} {encode_us:10.2f} {decode_us:10.2f} "
+                  f"{1e6 / (encode_us + decode_us):17.0f}   ({size / baseline * 100:.0f}% of json)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
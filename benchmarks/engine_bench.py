@@ -0,0 +1,162 @@
+# Benchmark mô phỏng GameEngine không cần mạng: N phòng, mỗi phòng 2 người chơi theo kịch bản
+# Chạy: python main.py bench-engine [--rooms N] [--ticks N] [--fire-rate P] [--cprofile out.pstats]
+#       (hoặc python -m benchmarks.engine_bench ...)
+import argparse
+import contextlib
+import cProfile
+import json
+import math
+import os
+import pstats
+import random
+import sys
+import time
+import tracemalloc
+
+from common.messages import GameConstants
+from common.stats import percentile
+from server.game import GameEngine
+
+
+class ScriptedRoom:
+    """Một phòng chơi với 2 người chơi chạy vòng tròn, xoay nòng và bắn ngẫu nhiên"""
+    def __init__(self, index, fire_rate, rng):
+        self.engine = GameEngine()
+        self.fire_rate = fire_rate
+        self.rng = rng
+        self.tick = 0
+        self.pids = [f"r{index}p1", f"r{index}p2"]
+        for pid in self.pids:
+            self.engine.add_player(pid, None, None, pid)
+        self._start()
+
+    def _start(self):
+        for pid in self.pids:
+            self.engine.set_player_ready(pid)
+        self.engine.start_game()
+
+    def step(self, serialize):
+        """Một tick của server: xử lý input của từng người chơi, update_game và (tuỳ chọn) serialize state"""
+        engine = self.engine
+        if engine.game_state['game_over']:
+            engine.restart_game()
+            self._start()
+
+        self.tick += 1
+        t = self.tick / 60.0
+        for i, pid in enumerate(self.pids):
+            phase = t + i * math.pi
+            message = {
+                'id': pid,
+                'x': 400 + 250 * math.cos(phase) * (1 if i == 0 else -1),
+                'y': 300 + 150 * math.sin(phase),
+                'angle': (self.tick * 3 + i * 180) % 360,
+            }
+            if self.rng.random() < self.fire_rate:
+                message['fire'] = True
+            if engine.players[pid].ammo == 0:
+                message['ammo_update'] = GameConstants.MAX_AMMO
+            engine.queue_input(pid, message)
+
+        engine.update_game()
+        if serialize:
+            return json.dumps(engine.get_snapshot()).encode()
+        return None
+
+
+def _run_ticks(rooms, ticks, serialize, tick_times=None):
+    for _ in range(ticks):
+        start = time.perf_counter()
+        for room in rooms:
+            room.step(serialize)
+        if tick_times is not None:
+            tick_times.append(time.perf_counter() - start)
+
+
+def _measure_allocations(rooms, ticks, serialize, top):
+    """Đo cấp phát bằng tracemalloc (chạy riêng vì tracemalloc làm chậm đáng kể)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    base, _ = tracemalloc.get_traced_memory()
+    peaks = []
+    # reset_peak() có từ Python 3.9; bản cũ hơn chỉ đo được phần tăng thêm sau mỗi tick (không phải đỉnh).
+    # Không dùng stop()/start() để reset vì sẽ xoá các trace cần cho so sánh snapshot bên dưới
+    reset_peak = getattr(tracemalloc, 'reset_peak', None)
+    for _ in range(ticks):
+        current, _ = tracemalloc.get_traced_memory()
+        if reset_peak is not None:
+            reset_peak()
+        _run_ticks(rooms, 1, serialize)
+        after, peak = tracemalloc.get_traced_memory()
+        peaks.append((peak if reset_peak is not None else after) - current)
+    after = tracemalloc.take_snapshot()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stats = after.compare_to(before, 'lineno')
+    allocated = sum(s.count_diff for s in stats if s.count_diff > 0)
+    return {
+        'peak_bytes_per_tick': sum(peaks) / len(peaks) if peaks else 0.0,
+        'retained_bytes': current - base,
+        'retained_blocks': allocated,
+        'top': [(str(s.traceback), s.size_diff, s.count_diff) for s in stats[:top]],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='main.py bench-engine', description="Headless GameEngine tick benchmark")
+    parser.add_argument('--rooms', type=int, default=50, help='Number of simultaneous rooms (2 scripted players each)')
+    parser.add_argument('--ticks', type=int, default=600, help='Server ticks to measure')
+    parser.add_argument('--fire-rate', type=float, default=0.1, help='Chance per player per tick to fire (bullet density)')
+    parser.add_argument('--warmup', type=int, default=120)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-serialize', action='store_true', help='Skip json.dumps of the broadcast snapshot after each room tick')
+    parser.add_argument('--alloc-ticks', type=int, default=120, help='Ticks measured under tracemalloc (0 = skip)')
+    parser.add_argument('--cprofile', metavar='PATH', help='Profile the measured ticks and write pstats to PATH')
+    parser.add_argument('--top', type=int, default=15, help='Functions/allocation sites to print')
+    args = parser.parse_args(argv)
+
+    serialize = not args.no_serialize
+    rng = random.Random(args.seed)
+    random.seed(args.seed)
+
+    # GameEngine in log khi đổi map/kết thúc trận; bỏ qua trong lúc đo
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        rooms = [ScriptedRoom(i, args.fire_rate, rng) for i in range(args.rooms)]
+        _run_ticks(rooms, args.warmup, serialize)
+
+        profile = cProfile.Profile() if args.cprofile else None
+        tick_times = []
+        if profile:
+            profile.enable()
+        start = time.perf_counter()
+        _run_ticks(rooms, args.ticks, serialize, tick_times)
+        elapsed = time.perf_counter() - start
+        if profile:
+            profile.disable()
+
+        bullets = sum(len(room.engine.bullets) for room in rooms)
+        alloc = _measure_allocations(rooms, args.alloc_ticks, serialize, args.top) if args.alloc_ticks else None
+
+    tick_ms = [t * 1000.0 for t in tick_times]
+    print(f"Rooms: {args.rooms}, ticks: {args.ticks}, fire rate: {args.fire_rate}, serialize: {serialize}")
+    print(f"  bullets in flight (end) : {bullets}")
+    print(f"  server ticks/sec        : {args.ticks / elapsed:10.1f}")
+    print(f"  room ticks/sec          : {args.ticks * args.rooms / elapsed:10.1f}")
+    print(f"  tick time p50/p99/max   : {percentile(tick_ms, 50):.3f} / {percentile(tick_ms, 99):.3f} / {max(tick_ms):.3f} ms")
+    print(f"  60 Hz budget used (p99) : {percentile(tick_ms, 99) / (1000 / 60) * 100:9.1f}%")
+    if alloc:
+        print(f"  peak alloc per tick     : {alloc['peak_bytes_per_tick'] / 1024:10.1f} KiB")
+        print(f"  retained after {args.alloc_ticks} ticks : {alloc['retained_bytes'] / 1024:10.1f} KiB in {alloc['retained_blocks']} blocks")
+        for site, size, count in alloc['top']:
+            print(f"    {size / 1024:+9.1f} KiB {count:+7d}  {site}")
+
+    if profile:
+        profile.dump_stats(args.cprofile)
+        pstats.Stats(args.cprofile).sort_stats('tottime').print_stats(args.top)
+        print(f"pstats đã ghi ra {args.cprofile}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
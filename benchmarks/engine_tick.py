@@ -0,0 +1,71 @@
+# Microbenchmark cho bước cập nhật đạn của GameEngine
+# Chạy: python -m benchmarks.engine_tick [số_đạn] [số_tick]
+import copy
+import math
+import sys
+import time
+
+from common.messages import GameConstants
+from server.game import GameEngine
+
+
+def _legacy_update_bullets(engine):
+    """Bản cũ của _update_bullets: tính cos/sin cho mỗi viên đạn mỗi tick"""
+    for bullet in engine.bullets[:]:
+        bullet.x += bullet.speed * math.cos(math.radians(bullet.angle))
+        bullet.y += bullet.speed * math.sin(math.radians(bullet.angle))
+
+        if (bullet.x < 0 or bullet.x > GameConstants.SCREEN_WIDTH or
+                bullet.y < 0 or bullet.y > GameConstants.SCREEN_HEIGHT):
+            if bullet in engine.bullets:
+                engine.bullets.remove(bullet)
+
+
+def _make_engine(bullet_count):
+    """Tạo engine với 1 player bắn đủ số đạn theo các góc bước 5 độ"""
+    engine = GameEngine()
+    engine.add_player('1', None, None, 'bench')
+    engine.start_game()
+    player = engine.players['1']
+    for i in range(bullet_count):
+        player.ammo = 1
+        player.x, player.y = 400, 300
+        player.angle = (i * 5) % 360
+        engine.process_player_message('1', {'fire': True})
+    return engine
+
+
+def _run(update, bullet_count, ticks):
+    """Đo thời gian trung bình mỗi tick, nạp lại đạn khi đã bay ra khỏi màn hình"""
+    engine = _make_engine(bullet_count)
+    template = [copy.copy(b) for b in engine.bullets]
+    elapsed = 0.0
+    # Đạn bay hết màn hình sau khoảng 40 tick, nên đo theo từng đợt
+    done = 0
+    while done < ticks:
+        engine.bullets[:] = [copy.copy(b) for b in template]
+        batch = min(30, ticks - done)
+        start = time.perf_counter()
+        for _ in range(batch):
+            update(engine)
+        elapsed += time.perf_counter() - start
+        done += batch
+    return elapsed / ticks
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    bullet_count = int(argv[0]) if len(argv) > 0 else 500
+    ticks = int(argv[1]) if len(argv) > 1 else 3000
+
+    before = _run(_legacy_update_bullets, bullet_count, ticks)
+    after = _run(GameEngine._update_bullets, bullet_count, ticks)
+
+    print(f"Bullets: {bullet_count}, ticks: {ticks}")
+    print(f"  trig mỗi tick    : {before * 1e6:9.1f} us/tick")
+    print(f"  vận tốc dựng sẵn : {after * 1e6:9.1f} us/tick")
+    print(f"  speedup          : {before / after:9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# Đo thời gian frame trong trận theo từng giai đoạn bằng FrameProfiler (không cần cửa sổ)
+# Chạy: python -m benchmarks.frame_profile [số_frame] [file_xuất.csv|.json] [ngưỡng_p99_ms]
+# Khi có ngưỡng, thoát với mã 1 nếu p99 thời gian frame vượt ngưỡng (dùng làm cổng hồi quy)
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from benchmarks.particles import _spawn
+from benchmarks.render_text import _game_state
+from client.gui import GameRenderer
+
+
+def _bullets(rng, count):
+    return [{'x': rng.uniform(0, 800), 'y': rng.uniform(0, 600)} for _ in range(count)]
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    frames = int(argv[0]) if len(argv) > 0 else 600
+    export_path = argv[1] if len(argv) > 1 and argv[1] != '-' else None
+    max_p99 = float(argv[2]) if len(argv) > 2 else None
+
+    renderer = GameRenderer('bench')
+    renderer.initialize()
+    renderer.set_player_id('1')
+    renderer.set_map(0)
+    profiler = renderer.profiler
+    rng = random.Random(0)
+    state = _game_state()
+    dt = 1 / 60
+
+    def frame():
+        _spawn(renderer.particles, 30, rng)
+        state['bullets'] = _bullets(rng, 12)
+        with profiler.stage('animations'):
+            renderer.update_animations(dt)
+        renderer.draw_game_state(state)
+        with profiler.stage('hud'):
+            renderer.draw_hud(7, 10, False, 0, 0, False)
+        with profiler.stage('present'):
+            renderer.update_display()
+
+    # Làm nóng các bộ đệm trước khi đo
+    for _ in range(60):
+        frame()
+
+    profiler.enable(record=True)
+    last = time.perf_counter()
+    for _ in range(frames):
+        frame()
+        now = time.perf_counter()
+        profiler.end_frame(now - last)
+        last = now
+    profiler.disable()
+
+    summary = profiler.summary()
+    fm = summary['frame_ms']
+    print(f"Frames: {summary['frames']}")
+    print(f"  frame     : p50 {fm['p50']:.3f}  p95 {fm['p95']:.3f}  p99 {fm['p99']:.3f}  max {fm['max']:.3f} ms")
+    for name, st in summary['stages'].items():
+        print(f"  {name:10}: mean {st['mean']:.3f}  p95 {st['p95']:.3f}  p99 {st['p99']:.3f} ms")
+    print(f"  gc        : total {summary['gc_ms']['total']:.3f} ms, max {summary['gc_ms']['max']:.3f} ms")
+
+    if export_path:
+        profiler.export(export_path)
+        print(f"  đã xuất ra {export_path}")
+
+    renderer.cleanup()
+
+    if max_p99 is not None and fm['p99'] > max_p99:
+        print(f"FAIL: p99 {fm['p99']:.3f} ms > {max_p99:.3f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
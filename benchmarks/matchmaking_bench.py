@@ -0,0 +1,66 @@
+# Benchmark hàng đợi ghép trận (server/matchmaking.py) với đồng hồ mô phỏng: người chơi vào hàng đợi theo
+# tốc độ cho trước, match() chạy định kỳ; báo số cặp ghép được mỗi giây (thời gian thật), phân vị thời gian chờ
+# và chênh lệch rating
+# Chạy: python -m benchmarks.matchmaking_bench [--players N] [--arrivals N] [--interval S]
+import argparse
+import random
+import sys
+import time
+
+from common.stats import percentile
+from server.matchmaking import Matchmaker
+
+
+def _simulate(players, arrivals, interval, seed):
+    rng = random.Random(seed)
+    ratings = [rng.gauss(1500, 300) for _ in range(players)]
+    matchmaker = Matchmaker()
+    gaps = []
+    busy = 0.0
+    passes = 0
+    peak = 0
+    now = 0.0
+    next_player = 0
+    while next_player < players or len(matchmaker) > 1:
+        # Người chơi vào hàng đợi trong khoảng interval vừa qua
+        target = min(players, int((now + interval) * arrivals))
+        for pid in range(next_player, target):
+            matchmaker.enqueue(pid, ratings[pid], pid / arrivals)
+        next_player = max(next_player, target)
+        now += interval
+        peak = max(peak, len(matchmaker))
+
+        start = time.perf_counter()
+        pairs = matchmaker.match(now)
+        busy += time.perf_counter() - start
+        passes += 1
+        for a, b in pairs:
+            gaps.append(abs(ratings[a] - ratings[b]))
+    return matchmaker, gaps, busy, passes, peak, now
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='benchmarks.matchmaking_bench', description="Matchmaking queue benchmark")
+    parser.add_argument('--players', type=int, default=100000, help='Players that join the queue')
+    parser.add_argument('--arrivals', type=float, default=2000.0, help='Players joining per simulated second')
+    parser.add_argument('--interval', type=float, default=0.25, help='Simulated seconds between match() passes')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    # Lưu mọi lần chờ (mặc định chỉ giữ các lần gần nhất)
+    Matchmaker.RECENT_WAITS = args.players
+    matchmaker, gaps, busy, passes, peak, elapsed = _simulate(args.players, args.arrivals, args.interval, args.seed)
+    waits = list(matchmaker.recent_waits)
+    print(f"Players: {args.players}, arrivals: {args.arrivals:.0f}/s, match() every {args.interval}s "
+          f"({passes} passes, {elapsed:.0f}s simulated)")
+    print(f"  pairs formed            : {len(gaps):10d}  (left in queue: {len(matchmaker)}, peak queue: {peak})")
+    print(f"  pairs/sec (wall time)   : {len(gaps) / busy:10.0f}")
+    print(f"  match() mean            : {busy / passes * 1000:10.3f} ms")
+    print(f"  wait p50/p90/p99/max    : {percentile(waits, 50):.2f} / {percentile(waits, 90):.2f} / "
+          f"{percentile(waits, 99):.2f} / {max(waits):.2f} s")
+    print(f"  rating gap p50/p90/p99  : {percentile(gaps, 50):.1f} / {percentile(gaps, 90):.1f} / {percentile(gaps, 99):.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+# Benchmark ParticleSystem: thời gian update + draw mỗi frame khi có nhiều particle
+# Chạy: python -m benchmarks.particles [số_particle] [số_frame]
+import os
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from client.gui import ParticleSystem
+
+
+def _spawn(system, count, rng):
+    """Giữ mật độ particle ổn định: bổ sung particle, trail và explosion mới"""
+    for _ in range(count):
+        system.add_particle(rng.uniform(0, 800), rng.uniform(0, 600), (255, 180, 60),
+                            (rng.uniform(-2, 2), rng.uniform(-2, 2)),
+                            lifetime=rng.uniform(0.5, 1.5), size=rng.randint(2, 5))
+    for _ in range(max(1, count // 4)):
+        system.add_trail(rng.uniform(0, 800), rng.uniform(0, 600), (0, 255, 255))
+    if rng.random() < 0.2:
+        system.add_explosion(rng.uniform(0, 800), rng.uniform(0, 600), size=rng.uniform(0.5, 1.5))
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    target = int(argv[0]) if len(argv) > 0 else 2000
+    frames = int(argv[1]) if len(argv) > 1 else 600
+
+    pygame.init()
+    screen = pygame.display.set_mode((800, 600))
+    system = ParticleSystem()
+    rng = random.Random(0)
+    dt = 1 / 60
+
+    # Đưa hệ thống về trạng thái ổn định trước khi đo (mỗi particle sống ~1s)
+    per_frame = max(1, target // 60)
+    for _ in range(90):
+        _spawn(system, per_frame, rng)
+        system.update(dt)
+
+    update_time = draw_time = 0.0
+    for _ in range(frames):
+        _spawn(system, per_frame, rng)
+        start = time.perf_counter()
+        system.update(dt)
+        mid = time.perf_counter()
+        system.draw(screen)
+        update_time += mid - start
+        draw_time += time.perf_counter() - mid
+
+    total = (update_time + draw_time) / frames
+    print(f"Particles (mục tiêu): {target}, frames: {frames}")
+    print(f"  update : {update_time / frames * 1e3:8.2f} ms/frame")
+    print(f"  draw   : {draw_time / frames * 1e3:8.2f} ms/frame")
+    print(f"  tổng   : {total * 1e3:8.2f} ms/frame (~{1 / total:.0f} FPS giới hạn bởi particle)")
+    print(f"  glyph cache: {system.glyphs.cache.stats()}")
+
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main()
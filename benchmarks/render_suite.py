@@ -0,0 +1,180 @@
+# Bộ benchmark vẽ không cần cửa sổ: chạy GameRenderer với SDL dummy driver qua mọi theme,
+# map và mức tải (số xe tăng, đạn, particle), báo FPS và chi phí từng hàm vẽ.
+# Chạy: python -m benchmarks.render_suite [--frames N] [--themes a,b] [--maps 0,1] [--loads light,heavy]
+#                                         [--states file.jsonl] [--dirty-rects] [--cprofile 20] [--json out.json]
+import argparse
+import cProfile
+import io
+import json
+import math
+import os
+import pstats
+import random
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from client.gui import GameRenderer
+from common.messages import GameConstants
+
+# Mức tải: (số xe tăng, số đạn trên màn hình, số particle sinh thêm mỗi frame)
+LOADS = {
+    'light': (2, 4, 10),
+    'medium': (4, 20, 40),
+    'heavy': (8, 60, 120),
+}
+
+
+def synthetic_states(tanks, bullets, frames, seed=0):
+    """Chuỗi game_state giả lập: xe tăng chạy vòng tròn và xoay nòng, đạn bay thẳng quanh màn hình"""
+    rng = random.Random(seed)
+    w, h = GameConstants.SCREEN_WIDTH, GameConstants.SCREEN_HEIGHT
+    orbits = [(rng.uniform(150, w - 150), rng.uniform(150, h - 150), rng.uniform(40, 120), rng.uniform(0, 2 * math.pi))
+              for _ in range(tanks)]
+    shots = [[rng.uniform(0, w), rng.uniform(0, h), rng.uniform(-10, 10), rng.uniform(-10, 10)]
+             for _ in range(bullets)]
+
+    for frame in range(frames):
+        t = frame / 60.0
+        players = {}
+        for i, (cx, cy, r, phase) in enumerate(orbits):
+            a = phase + t
+            players[str(i + 1)] = {
+                'x': cx + r * math.cos(a), 'y': cy + r * math.sin(a),
+                'angle': (math.degrees(a) + 90) % 360,
+                'hp': 100 - (frame + i * 13) % 100, 'ammo': 10 - frame % 10,
+                'name': f"tank{i + 1}", 'ready': True,
+            }
+        for shot in shots:
+            shot[0] = (shot[0] + shot[2]) % w
+            shot[1] = (shot[1] + shot[3]) % h
+        yield {
+            'players': players,
+            'bullets': [{'x': x, 'y': y} for x, y, _, _ in shots],
+            'game_over': False,
+            'winner_id': None,
+        }
+
+
+def recorded_states(path):
+    """Đọc chuỗi game_state đã ghi, mỗi dòng một JSON"""
+    states = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                state = json.loads(line)
+                if 'players' in state:
+                    states.append(state)
+    return states
+
+
+def run_scenario(renderer, states, particles_per_frame, rng):
+    """Vẽ lần lượt các state như vòng lặp client, trả về (số frame, thời gian)"""
+    profiler = renderer.profiler
+    dt = 1 / 60
+    count = 0
+    start = last = time.perf_counter()
+    for state in states:
+        for _ in range(particles_per_frame):
+            renderer.particles.add_particle(rng.uniform(0, 800), rng.uniform(0, 600), (255, 180, 60),
+                                            (rng.uniform(-2, 2), rng.uniform(-2, 2)),
+                                            lifetime=rng.uniform(0.3, 1.0), size=rng.randint(2, 5))
+        if count % 30 == 0 and particles_per_frame:
+            renderer.particles.add_explosion(rng.uniform(0, 800), rng.uniform(0, 600))
+        with profiler.stage('animations'):
+            renderer.update_animations(dt)
+        renderer.draw_game_state(state)
+        with profiler.stage('hud'):
+            renderer.draw_hud(state['players'].get('1', {}).get('ammo', 10), GameConstants.MAX_AMMO,
+                              False, 0, 0, False)
+        with profiler.stage('present'):
+            renderer.update_display()
+        now = time.perf_counter()
+        profiler.end_frame(now - last)
+        last = now
+        count += 1
+    return count, time.perf_counter() - start
+
+
+def _parse_list(value, default):
+    return default if not value else [v.strip() for v in value.split(',') if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless GameRenderer benchmark")
+    parser.add_argument('--frames', type=int, default=300, help='Frames per scenario (synthetic states)')
+    parser.add_argument('--warmup', type=int, default=30)
+    parser.add_argument('--themes', help='Comma-separated theme names (default: all)')
+    parser.add_argument('--maps', help='Comma-separated map ids (default: all)')
+    parser.add_argument('--loads', help=f"Comma-separated load levels from {', '.join(LOADS)} (default: all)")
+    parser.add_argument('--states', help='JSON-lines file of recorded game states (replaces synthetic states)')
+    parser.add_argument('--dirty-rects', action='store_true', help='Render with dirty-rectangle updates')
+    parser.add_argument('--cprofile', type=int, default=0, metavar='N', help='Print the top N functions by cumulative time')
+    parser.add_argument('--json', metavar='PATH', help='Write all results to PATH')
+    args = parser.parse_args(argv)
+
+    renderer = GameRenderer('bench', dirty_rects=args.dirty_rects)
+    renderer.initialize()
+    renderer.set_player_id('1')
+
+    themes = _parse_list(args.themes, list(renderer.THEMES))
+    maps = [int(m) for m in _parse_list(args.maps, [str(m) for m in range(GameConstants.MAP_COUNT)])]
+    loads = _parse_list(args.loads, list(LOADS))
+    recorded = recorded_states(args.states) if args.states else None
+
+    profiler = renderer.profiler
+    profile = cProfile.Profile() if args.cprofile else None
+    results = []
+
+    print(f"{'theme':14} {'map':>3} {'load':8} {'fps':>8} {'p50':>7} {'p99':>7}  top stages (mean ms)")
+    for theme in themes:
+        renderer.set_theme(theme)
+        for map_id in maps:
+            renderer.set_map(map_id)
+            for load in loads:
+                tanks, bullets, particles = LOADS[load]
+                if recorded is not None:
+                    states = recorded
+                else:
+                    states = list(synthetic_states(tanks, bullets, args.frames + args.warmup))
+                rng = random.Random(0)
+                renderer.particles = type(renderer.particles)()
+
+                profiler.disable()
+                run_scenario(renderer, states[:args.warmup], particles, rng)
+                profiler.reset()
+                profiler.enable()
+                if profile:
+                    profile.enable()
+                frames, elapsed = run_scenario(renderer, states[args.warmup:] or states, particles, rng)
+                if profile:
+                    profile.disable()
+                profiler.disable()
+
+                summary = profiler.summary()
+                fps = frames / elapsed if elapsed > 0 else 0.0
+                top = sorted(summary['stages'].items(), key=lambda kv: kv[1]['mean'], reverse=True)[:3]
+                top_str = ', '.join(f"{name} {st['mean']:.2f}" for name, st in top)
+                print(f"{theme:14} {map_id:>3} {load:8} {fps:8.1f} {summary['frame_ms']['p50']:7.2f} "
+                      f"{summary['frame_ms']['p99']:7.2f}  {top_str}")
+                results.append({'theme': theme, 'map': map_id, 'load': load, 'fps': fps,
+                                'frames': frames, 'summary': summary})
+
+    if profile:
+        out = io.StringIO()
+        pstats.Stats(profile, stream=out).sort_stats('cumulative').print_stats(args.cprofile)
+        print(out.getvalue())
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'dirty_rects': args.dirty_rects, 'results': results}, f, indent=2)
+        print(f"Đã ghi kết quả ra {args.json}")
+
+    renderer.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,94 @@
+# Benchmark thời gian vẽ xe tăng: vẽ trực tiếp bằng pygame.draw so với blit sprite
+# Chạy: python -m benchmarks.render_tank [số_frame]
+import math
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+from client.gui import GameRenderer
+
+
+def _legacy_draw_tank(renderer, x, y, angle, is_player):
+    """Bản cũ của draw_tank: ~10 lệnh pygame.draw và lượng giác mỗi lần vẽ"""
+    screen = renderer.screen
+    colors = renderer.colors
+    tank_size = 40
+    tank_width = tank_size
+    tank_height = tank_size * 0.6
+    base_color = colors['player'] if is_player else colors['enemy']
+    dark_color = colors['player_dark'] if is_player else colors['enemy_dark']
+    highlight_color = colors['accent'] if is_player else colors['accent_dark']
+
+    body_rect = pygame.Rect(int(x - tank_width/2), int(y - tank_height/2),
+                            int(tank_width), int(tank_height))
+    pygame.draw.rect(screen, base_color, body_rect, border_radius=8)
+    pygame.draw.rect(screen, dark_color, body_rect, 2, border_radius=8)
+
+    turret_radius = tank_size * 0.25
+    pygame.draw.circle(screen, base_color, (int(x), int(y)), int(turret_radius))
+    pygame.draw.circle(screen, dark_color, (int(x), int(y)), int(turret_radius), 2)
+
+    barrel_length = tank_size * 0.8
+    end_x = x + barrel_length * math.cos(math.radians(angle))
+    end_y = y + barrel_length * math.sin(math.radians(angle))
+    barrel_width = tank_size * 0.15
+    barrel_vector = pygame.Vector2(barrel_length * math.cos(math.radians(angle)),
+                                   barrel_length * math.sin(math.radians(angle)))
+    perpendicular = pygame.Vector2(-barrel_vector.y, barrel_vector.x).normalize() * (barrel_width/2)
+    barrel_points = [
+        (x + perpendicular.x, y + perpendicular.y),
+        (x - perpendicular.x, y - perpendicular.y),
+        (end_x - perpendicular.x, end_y - perpendicular.y),
+        (end_x + perpendicular.x, end_y + perpendicular.y)
+    ]
+    pygame.draw.polygon(screen, dark_color, barrel_points)
+    pygame.draw.polygon(screen, highlight_color, barrel_points, 1)
+
+    pygame.draw.line(screen, highlight_color,
+                     (x - tank_width/3, y - tank_height/4),
+                     (x + tank_width/3, y - tank_height/4), 2)
+    pygame.draw.line(screen, highlight_color,
+                     (x - tank_width/3, y + tank_height/4),
+                     (x + tank_width/3, y + tank_height/4), 2)
+
+    logo_color = colors['accent'] if is_player else colors['muted']
+    pygame.draw.circle(screen, logo_color, (int(x), int(y)), int(turret_radius/2))
+    pygame.draw.circle(screen, dark_color, (int(x), int(y)), int(turret_radius/2), 1)
+
+
+def _run(draw, renderer, frames, tanks):
+    """Đo thời gian vẽ trung bình mỗi frame cho một số xe tăng xoay liên tục"""
+    start = time.perf_counter()
+    for frame in range(frames):
+        for t in range(tanks):
+            angle = (frame + t * 35) * 5
+            draw(renderer, 100 + t * 60 % 600, 150 + t * 45 % 300, angle, t == 0)
+    return (time.perf_counter() - start) / frames
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    frames = int(argv[0]) if len(argv) > 0 else 2000
+    tanks = int(argv[1]) if len(argv) > 1 else 2
+
+    renderer = GameRenderer('bench')
+    renderer.initialize()
+
+    before = _run(_legacy_draw_tank, renderer, frames, tanks)
+    after = _run(GameRenderer.draw_tank, renderer, frames, tanks)
+
+    print(f"Frames: {frames}, tanks/frame: {tanks}")
+    print(f"  pygame.draw trực tiếp : {before * 1e6:9.1f} us/frame")
+    print(f"  blit sprite đã cache  : {after * 1e6:9.1f} us/frame")
+    print(f"  speedup               : {before / after:9.2f}x")
+    print(f"  sprite cache          : {renderer.tank_sprites.cache.stats()}")
+
+    renderer.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+# So sánh thời gian frame của màn hình chờ và HUD trong trận khi có/không có bộ đệm chữ
+# Chạy: python -m benchmarks.render_text [số_frame]
+import os
+import sys
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from client.gui import GameRenderer
+
+
+class _NoTextCache:
+    """Render trực tiếp mỗi lần gọi, tương đương hành vi trước khi có TextCache"""
+    def render(self, font, text, antialias, color):
+        return font.render(text, antialias, color)
+
+
+def _game_state():
+    return {
+        'players': {
+            '1': {'x': 150, 'y': 300, 'angle': 0, 'hp': 75, 'ammo': 7, 'name': 'alpha', 'ready': True},
+            '2': {'x': 650, 'y': 300, 'angle': 180, 'hp': 100, 'ammo': 10, 'name': 'bravo', 'ready': False},
+        },
+        'bullets': [],
+        'game_over': False,
+        'winner_id': None,
+        'map_id': 0,
+    }
+
+
+def _waiting(renderer, state):
+    renderer.draw_waiting_screen(state, False, False)
+
+
+def _match(renderer, state):
+    renderer.draw_game_state(state)
+    renderer.draw_hud(7, 10, False, 0, 0, False)
+
+
+def _run(renderer, draw, state, frames):
+    draw(renderer, state)
+    start = time.perf_counter()
+    for _ in range(frames):
+        draw(renderer, state)
+    return (time.perf_counter() - start) / frames
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    frames = int(argv[0]) if len(argv) > 0 else 300
+
+    renderer = GameRenderer('bench')
+    renderer.initialize()
+    renderer.set_player_id('1')
+    state = _game_state()
+    cached = renderer.text_cache
+
+    print(f"Frames: {frames}")
+    for label, draw in (("Màn hình chờ", _waiting), ("HUD trong trận", _match)):
+        renderer.text_cache = _NoTextCache()
+        before = _run(renderer, draw, state, frames)
+        renderer.text_cache = cached
+        after = _run(renderer, draw, state, frames)
+        print(f"  {label:16}: {before * 1e3:7.3f} ms -> {after * 1e3:7.3f} ms/frame")
+    print(f"  text cache: {cached.stats()}")
+
+    renderer.cleanup()
+
+
+if __name__ == "__main__":
+    main()
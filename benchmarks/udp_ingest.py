@@ -0,0 +1,97 @@
+# Benchmark nhận input UDP: recvfrom + json.loads từng gói (cách cũ) so với UdpIngest.drain(),
+# và tốc độ loại bỏ gói flood từ địa chỉ lạ
+# Chạy: python -m benchmarks.udp_ingest [số_gói] [kích_thước_lô]
+import json
+import socket
+import sys
+import time
+
+from server.ingest import UdpIngest
+from server.metrics import MetricsRegistry
+
+
+def _payloads(count):
+    return [json.dumps({'id': 'p1', 'x': 400.5 + i % 100, 'y': 300.25, 'angle': i % 360,
+                        'fire': i % 7 == 0}).encode() for i in range(count)]
+
+
+def _counters():
+    m = MetricsRegistry()
+    return {'packets': m.counter('packets', '', labels=('direction',)), 'bytes_in': m.counter('bytes', '', labels=('direction',)),
+            'decode_errors': m.counter('decode', ''), 'truncated': m.counter('truncated', '')}
+
+
+def _legacy_receive(ingest, sock, count):
+    """Cách cũ: mỗi datagram một lần recvfrom(1024), decode + json.loads và cập nhật metric"""
+    sock.setblocking(True)
+    packets, bytes_in, decode_errors = ingest.packets, ingest.bytes_in, ingest.decode_errors
+    got = 0
+    for _ in range(count):
+        data, address = sock.recvfrom(1024)
+        packets.inc(1, 'in')
+        bytes_in.inc(len(data), 'in')
+        try:
+            message = json.loads(data.decode())
+            message.get('id')
+        except (ValueError, AttributeError):
+            decode_errors.inc()
+            continue
+        got += 1
+    return got
+
+
+def _run(receive, payloads, batch, registered=True):
+    """Gửi theo từng lô (không vượt quá bộ đệm kernel) rồi đo riêng thời gian nhận + giải mã"""
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    ingest = UdpIngest(receiver, **_counters())
+    # Đo đường xử lý chứ không đo giới hạn tốc độ
+    ingest.RATE_LIMIT = ingest.RATE_BURST = float('inf')
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.bind(('127.0.0.1', 0))
+    if registered:
+        ingest.register('p1', sender.getsockname())
+    target = receiver.getsockname()
+    elapsed = 0.0
+    received = 0
+    try:
+        for start in range(0, len(payloads), batch):
+            chunk = payloads[start:start + batch]
+            for data in chunk:
+                sender.sendto(data, target)
+            began = time.perf_counter()
+            received += receive(ingest, receiver, len(chunk))
+            elapsed += time.perf_counter() - began
+    finally:
+        sender.close()
+        receiver.close()
+    return received, elapsed
+
+
+def _drain(ingest, sock, count):
+    start = ingest.packets.value('in')
+    got = 0
+    while ingest.packets.value('in') - start < count:
+        got += len(ingest.drain())
+    return ingest.packets.value('in') - start
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    count = int(argv[0]) if len(argv) > 0 else 100000
+    batch = int(argv[1]) if len(argv) > 1 else 1000
+    payloads = _payloads(count)
+
+    legacy_count, legacy = _run(_legacy_receive, payloads, batch)
+    drain_count, drained = _run(_drain, payloads, batch)
+    flood_count, flooded = _run(_drain, payloads, batch, registered=False)
+
+    print(f"Datagrams: {count} ({len(payloads[0])} bytes), batch {batch}")
+    print(f"  recvfrom từng gói     : {legacy_count / legacy:12.0f} packets/s")
+    print(f"  UdpIngest.drain       : {drain_count / drained:12.0f} packets/s")
+    print(f"  speedup               : {legacy / drained:12.2f}x")
+    print(f"  flood từ địa chỉ lạ   : {flood_count / flooded:12.0f} packets/s bị loại (không giải mã)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# Nạp tài nguyên (ảnh map) theo yêu cầu, prefetch ở thread nền và cache trên đĩa
+import os
+import threading
+import time
+
+import pygame
+
+# frombytes/tobytes có từ pygame 2.1.3; bản cũ hơn chỉ có fromstring/tostring (cùng chữ ký)
+_frombytes = getattr(pygame.image, 'frombytes', None) or pygame.image.fromstring
+_tobytes = getattr(pygame.image, 'tobytes', None) or pygame.image.tostring
+
+
+class AssetLoader:
+    """Nạp ảnh map khi cần, prefetch các map còn lại ở nền và cache pixel đã giải mã trên đĩa.
+
+    Thread prefetch chỉ đọc file và giải mã ra Surface thô; việc convert sang định
+    dạng pixel của màn hình luôn chạy trên thread chính trong get_map().
+    """
+    MAP_FILES = ("map1.png", "map2.png", "map3.png")
+
+    def __init__(self, ui_dir, cache_dir=None):
+        self.ui_dir = ui_dir
+        self.cache_dir = cache_dir or os.path.join(ui_dir, ".cache")
+        self.timings = {}
+        self._raw = {}
+        self._maps = {}
+        self._lock = threading.Lock()
+        # Chỉ một thread giải mã tại một thời điểm để không ghi trùng file cache
+        self._decode_lock = threading.Lock()
+        self._prefetch_thread = None
+
+    def start_prefetch(self, map_ids=None):
+        """Giải mã trước các map ở thread nền (không chặn màn hình đăng nhập)"""
+        if self._prefetch_thread is not None:
+            return
+        ids = list(range(len(self.MAP_FILES))) if map_ids is None else list(map_ids)
+        self._prefetch_thread = threading.Thread(target=self._prefetch, args=(ids,), daemon=True)
+        self._prefetch_thread.start()
+
+    def _prefetch(self, map_ids):
+        for map_id in map_ids:
+            with self._decode_lock:
+                with self._lock:
+                    if map_id in self._raw or map_id in self._maps:
+                        continue
+                raw = self._decode(map_id)
+                with self._lock:
+                    self._raw.setdefault(map_id, raw)
+
+    def get_map(self, map_id):
+        """Surface đã convert của map, hoặc None nếu không có file ảnh"""
+        if map_id in self._maps:
+            return self._maps[map_id]
+
+        with self._decode_lock:
+            with self._lock:
+                raw = self._raw.pop(map_id, None)
+            if raw is None:
+                raw = self._decode(map_id)
+
+            surf = None
+            if raw is not None:
+                try:
+                    surf = raw.convert_alpha()
+                except Exception:
+                    surf = raw.convert()
+            self._maps[map_id] = surf
+        return surf
+
+    def _decode(self, map_id):
+        """Đọc ảnh map từ cache trên đĩa (nếu còn mới) hoặc giải mã file PNG"""
+        if not 0 <= map_id < len(self.MAP_FILES):
+            return None
+        name = self.MAP_FILES[map_id]
+        path = os.path.join(self.ui_dir, name)
+        if not os.path.exists(path):
+            return None
+
+        start = time.perf_counter()
+        source = 'disk cache'
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            surf = self._read_cache(name, mtime)
+            if surf is None:
+                source = 'png'
+                surf = pygame.image.load(path)
+                self._write_cache(name, mtime, surf)
+        except Exception as e:
+            print(f"Error loading {name}: {e}")
+            return None
+
+        self.timings[f"map {map_id + 1} ({source})"] = time.perf_counter() - start
+        return surf
+
+    def _cache_prefix(self, name, mtime):
+        return os.path.join(self.cache_dir, f"{name}.{mtime}.")
+
+    def _read_cache(self, name, mtime):
+        """Pixel thô đã giải mã: tên file chứa kích thước và định dạng (RGB/RGBA)"""
+        if not os.path.isdir(self.cache_dir):
+            return None
+        prefix = os.path.basename(self._cache_prefix(name, mtime))
+        for entry in os.listdir(self.cache_dir):
+            if not entry.startswith(prefix):
+                continue
+            try:
+                size, fmt = entry[len(prefix):].split('.')
+                w, h = (int(v) for v in size.split('x'))
+                with open(os.path.join(self.cache_dir, entry), 'rb') as f:
+                    return _frombytes(f.read(), (w, h), fmt)
+            except Exception as e:
+                # Cache hỏng hoặc không đọc được: giải mã lại từ PNG
+                print(f"Không thể đọc cache ảnh {name}: {e}")
+                return None
+        return None
+
+    def _write_cache(self, name, mtime, surf):
+        fmt = 'RGBA' if surf.get_flags() & pygame.SRCALPHA else 'RGB'
+        w, h = surf.get_size()
+        path = f"{self._cache_prefix(name, mtime)}{w}x{h}.{fmt}"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Xoá bản cache cũ của cùng file ảnh
+            for entry in os.listdir(self.cache_dir):
+                if entry.startswith(name + '.'):
+                    os.remove(os.path.join(self.cache_dir, entry))
+            tmp_path = path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(_tobytes(surf, fmt))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            # Không ghi được cache thì vẫn dùng ảnh vừa giải mã
+            print(f"Không thể ghi cache ảnh {name}: {e}")
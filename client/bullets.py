@@ -0,0 +1,84 @@
+# Mô phỏng đường bay của đạn phía client từ các sự kiện spawn/despawn do server gửi
+from common.messages import GameConstants
+from common.vectors import unit_vector
+
+
+class BulletSimulator:
+    """Đạn bay thẳng với vận tốc không đổi nên vị trí ở tick k của server là
+    (x + vx * (k - spawn_tick + 1), y + vy * (k - spawn_tick + 1)).
+
+    Client ước lượng tick hiện tại của server từ snapshot mới nhất (tick và thời điểm nhận)
+    nên có thể vẽ đạn ở tốc độ khung hình thay vì theo nhịp gói tin.
+    """
+    TICK_RATE = 60
+    # Không ngoại suy quá số tick này sau snapshot cuối (mạng bị gián đoạn)
+    MAX_EXTRAPOLATION = 10
+    # Giữ id đạn đã biến mất đủ lâu để bỏ qua các sự kiện spawn gửi lặp lại
+    FORGET_AFTER = 120
+
+    def __init__(self):
+        self.bullets = {}
+        self.removed = {}
+        self.server_tick = 0
+        self.received_at = 0.0
+
+    def apply(self, tick, events, received_at):
+        """Nạp sự kiện từ một snapshot; sự kiện trùng lặp giữa các snapshot được bỏ qua"""
+        if tick < self.server_tick:
+            # Snapshot cũ đến muộn: vẫn nhận sự kiện nhưng không lùi đồng hồ
+            tick, received_at = self.server_tick, self.received_at
+        self.server_tick = tick
+        self.received_at = received_at
+
+        bullets, removed = self.bullets, self.removed
+        for event in events:
+            kind, event_tick, bullet_id = event[0], event[1], event[2]
+            if kind == 's':
+                if bullet_id not in bullets and bullet_id not in removed:
+                    x, y, angle = event[3], event[4], event[5]
+                    dx, dy = unit_vector(angle)
+                    # Cùng phép tính với server nên vị trí trùng khớp tuyệt đối
+                    bullets[bullet_id] = (event_tick, x, y,
+                                          dx * GameConstants.BULLET_SPEED, dy * GameConstants.BULLET_SPEED)
+            elif kind == 'd':
+                bullets.pop(bullet_id, None)
+                removed[bullet_id] = event_tick
+
+        if len(removed) > 256:
+            oldest = tick - self.FORGET_AFTER
+            for bullet_id in [b for b, t in removed.items() if t < oldest]:
+                del removed[bullet_id]
+
+    def current_tick(self, now):
+        """Tick (số thực) ước lượng của server tại thời điểm now"""
+        elapsed = max(0.0, now - self.received_at) * self.TICK_RATE
+        return self.server_tick + min(elapsed, self.MAX_EXTRAPOLATION)
+
+    def positions(self, now):
+        """Danh sách (x, y) của các viên đạn đang bay tại thời điểm now"""
+        tick = self.current_tick(now)
+        width, height = GameConstants.SCREEN_WIDTH, GameConstants.SCREEN_HEIGHT
+        result = []
+        gone = None
+        for bullet_id, (spawn_tick, x, y, vx, vy) in self.bullets.items():
+            steps = tick - spawn_tick + 1
+            if steps < 0:
+                continue
+            bx = x + vx * steps
+            by = y + vy * steps
+            if bx < 0 or bx > width or by < 0 or by > height:
+                # Đã ra khỏi màn hình thì không thể quay lại (bay thẳng); server cũng loại bỏ
+                if gone is None:
+                    gone = []
+                gone.append(bullet_id)
+                continue
+            result.append((bx, by))
+        if gone:
+            for bullet_id in gone:
+                del self.bullets[bullet_id]
+                self.removed[bullet_id] = self.server_tick
+        return result
+
+    def clear(self):
+        self.bullets.clear()
+        self.removed.clear()
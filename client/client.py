@@ -7,10 +7,18 @@ import time
 import argparse
 import sys
 
+from client.bullets import BulletSimulator
 from client.gui import GameRenderer
+from client.snapshot import SnapshotBuffer
+from common.codec import CODECS, DECODE_ERRORS, DEFAULT_PREFERENCE, JSON, get_codec
 from common.messages import MessageTypes, GameConstants
+from common.vectors import unit_vector
 
 class TankGame:
+    # Nhịp mô phỏng/gửi input cố định và số bước bù tối đa mỗi frame
+    SIM_RATE = 60
+    MAX_SIM_STEPS = 5
+
     def __init__(self):
         self.tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -23,10 +31,14 @@ class TankGame:
         parser.add_argument('--username')
         parser.add_argument('--password')
         parser.add_argument('--name')
+        parser.add_argument('--dirty-rects', action='store_true', help='Only redraw changed screen regions during a match')
+        parser.add_argument('--max-fps', type=int, default=120, help='Render frame cap (0 = uncapped, rely on vsync)')
+        parser.add_argument('--codec', choices=sorted(CODECS), help='UDP codec to request from the server (default: fastest available)')
+        parser.add_argument('--profile', metavar='PATH', help='Record per-stage frame timings and export them to PATH (.csv or .json) on exit')
         try:
             self.cli_args = parser.parse_args(sys.argv[2:])
         except Exception:
-            self.cli_args = argparse.Namespace(auto=False, host=None, auth_type=None, username=None, password=None, name=None)
+            self.cli_args = argparse.Namespace(auto=False, host=None, auth_type=None, username=None, password=None, name=None, dirty_rects=False, max_fps=120, profile=None, codec=None)
 
         # Xác định host: tham số CLI > nhập tương tác > localhost
         if getattr(self.cli_args, 'host', None):
@@ -35,9 +47,18 @@ class TankGame:
             self.host = 'localhost'  # Mặc định, sẽ được cập nhật từ GUI
         
         self.player_id = None
+        self.codec = JSON
+        self.udp_token = None
         self.game_state = None
         self.running = True
         
+        # Game state từ thread UDP được bàn giao qua bộ đệm đôi
+        self.snapshots = SnapshotBuffer()
+        self.applied_sequence = 0
+        # Đạn được mô phỏng cục bộ từ sự kiện spawn/despawn trong snapshot
+        self.bullet_sim = BulletSimulator()
+        self.max_fps = max(0, getattr(self.cli_args, 'max_fps', 120) or 0)
+        
         # Cờ trạng thái trò chơi
         self.ready = False
         self.game_started = False
@@ -113,6 +134,10 @@ class TankGame:
                         auth_data['name'] = name
 
         try:
+            # Đề xuất codec cho UDP (server chọn codec đầu tiên mà nó hỗ trợ)
+            requested = getattr(self.cli_args, 'codec', None)
+            auth_data['codecs'] = [requested] if requested else DEFAULT_PREFERENCE
+            
             # Gửi dữ liệu xác thực
             json_data = json.dumps(auth_data)
             print(f"🔄 Đang gửi auth data: {json_data}")
@@ -150,6 +175,11 @@ class TankGame:
                 self.authenticated = True
                 self.player_db_id = response.get('player_id')
                 self.player_id = str(self.player_db_id)  # Gán player_id ngay tại đây
+                # Server cũ không trả về codec: dùng JSON
+                self.codec = get_codec(response.get('codec', 'json'))
+                # Gửi kèm mỗi gói UDP để server nhận ra mình nếu NAT đổi cổng
+                self.udp_token = response.get('udp_token')
+                print(f" UDP codec: {self.codec.name}")
                 self.username = username
                 print(f" Đăng nhập thành công! ID: {self.player_db_id}")
                 return {'success': True, 'auth_type': 'login'}
@@ -174,7 +204,7 @@ class TankGame:
         """Kết nối tới server với xác thực"""
         try:
             # Khởi tạo renderer sớm để sử dụng màn hình đăng nhập GUI
-            self.renderer = GameRenderer(self.username or '')
+            self.renderer = GameRenderer(self.username or '', dirty_rects=getattr(self.cli_args, 'dirty_rects', False))
             try:
                 self.renderer.initialize()
             except Exception as e:
@@ -239,6 +269,8 @@ class TankGame:
 
             # Cập nhật renderer với player id đã nhận
             self.renderer.set_player_id(self.player_id)
+            self.renderer.prewarm_backgrounds()
+            print(f"Startup: {self.renderer.startup_report()}")
             
             # Thiết lập UDP
             self.udp_socket.bind(('', 0))
@@ -264,6 +296,7 @@ class TankGame:
         self.waiting_for_restart = False
         self.last_fire_time = 0
         self.ready = False
+        self.bullet_sim.clear()
         
         # Báo cho client biết game đã kết thúc và cần quay lại màn hình chờ
         self.game_started = False 
@@ -294,12 +327,12 @@ class TankGame:
                     print("Game started!")
                 
                 elif data == MessageTypes.WAITING_FOR_PLAYERS:
-                    if not self.game_started:
-                        self.waiting_for_players = True
-                        self.game_started = False
-                        print("Waiting for more players...")
-                    else:
-                        print("Ignored WAITING message because game already started.")
+                    # Lúc đăng nhập, hoặc đối thủ đã rời phòng và mình được đưa lại vào hàng đợi ghép trận:
+                    # quay về màn hình chờ (phải bấm sẵn sàng lại ở phòng mới)
+                    if self.game_started or self.game_over:
+                        self.handle_restart()
+                    self.waiting_for_players = True
+                    print("Waiting for more players...")
 
                 elif data == MessageTypes.SERVER_FULL:
                     print("Server is full! Cannot join.")
@@ -313,32 +346,49 @@ class TankGame:
                 break
 
     def receive_udp_data(self):
-        """Nhận game state từ server qua UDP"""
+        """Nhận game state từ server qua UDP và bàn giao cho vòng lặp chính"""
         while self.running:
             try:
-                data, _ = self.udp_socket.recvfrom(1024)
-                game_state = json.loads(data.decode())
-                self.game_state = game_state
-                
-                # Cập nhật số đạn và vị trí từ server
-                if self.game_state and 'players' in self.game_state:
-                    player_data = self.game_state['players'].get(self.player_id)
-                    if player_data:
-                        if 'ammo' in player_data:
-                            self.ammo_count = player_data['ammo']
-                        self.player_x = player_data.get('x', self.player_x)
-                        self.player_y = player_data.get('y', self.player_y)
-                        self.player_angle = player_data.get('angle', self.player_angle)
-                
-                # Kiểm tra điều kiện kết thúc trận
-                if 'game_over' in self.game_state and self.game_state['game_over']:
-                    self.game_over = True
-                    self.winner_id = self.game_state.get('winner_id')
-                    # KHÔNG set game_started = False ở đây để tránh kẹt
-                    
+                data, _ = self.udp_socket.recvfrom(65535)
             except Exception as e:
                 print(f"UDP receive error: {e}")
                 break
+            
+            try:
+                game_state = self.codec.decode(data)
+            except DECODE_ERRORS as e:
+                print(f"UDP decode error: {e}")
+                continue
+            
+            # Chỉ đổi con trỏ snapshot; state được áp dụng trên thread chính
+            self.snapshots.publish(game_state)
+
+    def apply_latest_snapshot(self):
+        """Áp dụng snapshot mới nhất từ thread mạng (nếu có) vào trạng thái client"""
+        snapshot = self.snapshots.latest()
+        if snapshot is None or snapshot.sequence == self.applied_sequence:
+            return
+        self.applied_sequence = snapshot.sequence
+        self.game_state = snapshot.state
+        if 'tick' in self.game_state:
+            self.bullet_sim.apply(self.game_state['tick'], self.game_state.get('bullet_events', ()),
+                                  snapshot.received_at)
+        
+        # Cập nhật số đạn và vị trí từ server
+        if self.game_state and 'players' in self.game_state:
+            player_data = self.game_state['players'].get(self.player_id)
+            if player_data:
+                if 'ammo' in player_data:
+                    self.ammo_count = player_data['ammo']
+                self.player_x = player_data.get('x', self.player_x)
+                self.player_y = player_data.get('y', self.player_y)
+                self.player_angle = player_data.get('angle', self.player_angle)
+        
+        # Kiểm tra điều kiện kết thúc trận
+        if 'game_over' in self.game_state and self.game_state['game_over']:
+            self.game_over = True
+            self.winner_id = self.game_state.get('winner_id')
+            # KHÔNG set game_started = False ở đây để tránh kẹt
 
     def send_player_update(self):
         """Gửi cập nhật vị trí và trạng thái player tới server"""
@@ -352,9 +402,11 @@ class TankGame:
 
     def send_udp_data(self, data):
         """Gửi dữ liệu gameplay tới server qua UDP"""
+        if self.udp_token:
+            data['token'] = self.udp_token
         try:
             self.udp_socket.sendto(
-                json.dumps(data).encode(),
+                self.codec.encode(data),
                 (self.host, GameConstants.UDP_PORT)
             )
         except Exception as e:
@@ -418,12 +470,14 @@ class TankGame:
             self.player_angle -= 5
         if keys[pygame.K_RIGHT]:
             self.player_angle += 5
-        if keys[pygame.K_UP]:
-            self.player_x += 5 * math.cos(math.radians(self.player_angle))
-            self.player_y += 5 * math.sin(math.radians(self.player_angle))
-        if keys[pygame.K_DOWN]:
-            self.player_x -= 5 * math.cos(math.radians(self.player_angle))
-            self.player_y -= 5 * math.sin(math.radians(self.player_angle))
+        if keys[pygame.K_UP] or keys[pygame.K_DOWN]:
+            dx, dy = unit_vector(self.player_angle)
+            if keys[pygame.K_UP]:
+                self.player_x += 5 * dx
+                self.player_y += 5 * dy
+            if keys[pygame.K_DOWN]:
+                self.player_x -= 5 * dx
+                self.player_y -= 5 * dy
         
         self.player_x = max(20, min(GameConstants.SCREEN_WIDTH - 20, self.player_x))
         self.player_y = max(20, min(GameConstants.SCREEN_HEIGHT - 20, self.player_y))
@@ -448,50 +502,63 @@ class TankGame:
             self.last_fire_time = current_time
             self.ammo_count -= 1
 
-    def run(self):
-        """Main game loop"""
-        if not self.renderer:
-            return
-            
-        clock = pygame.time.Clock()
+    def handle_events(self):
+        """Xử lý sự kiện pygame (phím bấm, đóng cửa sổ)"""
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+            elif event.type == pygame.KEYDOWN:
+                if not self.game_started and not self.ready and event.key == pygame.K_SPACE:
+                    self.send_ready_status()
+                elif event.key == pygame.K_r and self.game_started and not self.game_over:
+                    self.start_reload()
+                elif event.key == pygame.K_t and self.game_over:
+                    # Chỉ gửi nếu chưa gửi
+                    if not self.waiting_for_restart:
+                        self.send_restart_request()
+                elif event.key == pygame.K_f:
+                    if self.renderer:
+                        self.renderer.toggle_fullscreen()
+                elif event.key == pygame.K_F3:
+                    if self.renderer:
+                        self.renderer.profiler.toggle_overlay()
 
-        while self.running:
-            current_time = time.time()
-            
-            self.update_reload()
-            
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    self.running = False
-                elif event.type == pygame.KEYDOWN:
-                    if not self.game_started and not self.ready and event.key == pygame.K_SPACE:
-                        self.send_ready_status()
-                    elif event.key == pygame.K_r and self.game_started and not self.game_over:
-                        self.start_reload()
-                    elif event.key == pygame.K_t and self.game_over:
-                        # Chỉ gửi nếu chưa gửi
-                        if not self.waiting_for_restart:
-                            self.send_restart_request()
-                    elif event.key == pygame.K_f:
-                        if self.renderer:
-                            self.renderer.toggle_fullscreen()
-            
-            # Logic vẽ màn hình
-            if not self.game_started and not self.game_over:
-                # Màn hình chờ
-                self.renderer.draw_waiting_screen(self.game_state, self.ready, self.waiting_for_players)
-            else:
-                # Game đang chạy hoặc kết thúc
-                if self.game_state:
-                    server_map_id = self.game_state.get('map_id') 
-                    if server_map_id is not None and self.renderer.get_current_map_id() != server_map_id:
-                        print(f"Client nhận lệnh đổi map sang ID: {server_map_id}")
-                        self.renderer.set_map(server_map_id)
-                    
-                    # Vẽ state (Nền, xe tăng, đạn)
-                    self.renderer.draw_game_state(self.game_state)
+    def simulation_step(self):
+        """Một bước mô phỏng cố định: reload, di chuyển, bắn và gửi input lên server"""
+        current_time = time.time()
+        self.update_reload()
+        
+        # Xử lý input khi game đang chạy và chưa kết thúc
+        if self.game_started and not self.game_over:
+            self.handle_movement()
+            self.handle_firing(current_time)
+            self.send_player_update()
+
+    def render_frame(self, frame_time):
+        """Vẽ một frame từ snapshot hiện tại, độc lập với nhịp mô phỏng"""
+        profiler = self.renderer.profiler
+        with profiler.stage('animations'):
+            self.renderer.update_animations(frame_time)
+        game_state = self.game_state
+        
+        # Logic vẽ màn hình
+        if not self.game_started and not self.game_over:
+            # Màn hình chờ
+            self.renderer.draw_waiting_screen(game_state, self.ready, self.waiting_for_players)
+        else:
+            # Game đang chạy hoặc kết thúc
+            if game_state:
+                server_map_id = game_state.get('map_id') 
+                if server_map_id is not None and self.renderer.get_current_map_id() != server_map_id:
+                    print(f"Client nhận lệnh đổi map sang ID: {server_map_id}")
+                    self.renderer.set_map(server_map_id)
                 
-                # Vẽ HUD
+                # Vẽ state (Nền, xe tăng, đạn)
+                bullets = self.bullet_sim.positions(time.time()) if 'tick' in game_state else None
+                self.renderer.draw_game_state(game_state, bullets)
+            
+            # Vẽ HUD
+            with profiler.stage('hud'):
                 self.renderer.draw_hud(
                     self.ammo_count, 
                     GameConstants.MAX_AMMO,
@@ -500,29 +567,72 @@ class TankGame:
                     self.last_fire_time,
                     self.game_over
                 )
-                
-                # Vẽ màn hình kết thúc (Popup)
-                if self.game_over:
-                    # Try to resolve winner name from last known game_state
+            
+            # Vẽ màn hình kết thúc (Popup)
+            if self.game_over:
+                # Try to resolve winner name from last known game_state
+                winner_name = None
+                try:
+                    if game_state and 'players' in game_state and self.winner_id is not None:
+                        pdata = game_state['players'].get(str(self.winner_id))
+                        if pdata and isinstance(pdata, dict):
+                            winner_name = pdata.get('name')
+                except Exception:
                     winner_name = None
-                    try:
-                        if self.game_state and 'players' in self.game_state and self.winner_id is not None:
-                            pdata = self.game_state['players'].get(str(self.winner_id))
-                            if pdata and isinstance(pdata, dict):
-                                winner_name = pdata.get('name')
-                    except Exception:
-                        winner_name = None
-
-                    self.renderer.draw_game_over(self.winner_id, winner_name, self.waiting_for_restart)
-                
-                # Xử lý input khi game đang chạy và chưa kết thúc
-                if self.game_started and not self.game_over:
-                    self.handle_movement()
-                    self.handle_firing(current_time)
-                    self.send_player_update()
 
+                self.renderer.draw_game_over(self.winner_id, winner_name, self.waiting_for_restart)
+
+        self.renderer.draw_profiler_overlay()
+        with profiler.stage('present'):
             self.renderer.update_display()
-            clock.tick(60)
+
+    def run(self):
+        """Main game loop: mô phỏng theo nhịp cố định, vẽ theo nhịp riêng"""
+        if not self.renderer:
+            return
+            
+        clock = pygame.time.Clock()
+        sim_dt = 1.0 / self.SIM_RATE
+        accumulator = 0.0
+        last_time = time.perf_counter()
+        profiler = self.renderer.profiler
+        profile_path = getattr(self.cli_args, 'profile', None)
+        if profile_path:
+            profiler.enable(record=True)
+
+        while self.running:
+            now = time.perf_counter()
+            frame_time = now - last_time
+            last_time = now
+            # Số liệu đang gom thuộc về frame vừa kết thúc
+            profiler.end_frame(frame_time)
+            # Giới hạn số bước bù sau một frame rất chậm để không bị dồn ứ
+            accumulator = min(accumulator + frame_time, sim_dt * self.MAX_SIM_STEPS)
+            
+            with profiler.stage('events'):
+                self.handle_events()
+            with profiler.stage('network'):
+                self.apply_latest_snapshot()
+            if profiler.enabled:
+                snapshot = self.snapshots.latest()
+                if snapshot is not None:
+                    profiler.set_snapshot_age(time.time() - snapshot.received_at)
+            
+            with profiler.stage('simulation'):
+                while accumulator >= sim_dt:
+                    self.simulation_step()
+                    accumulator -= sim_dt
+            
+            self.render_frame(frame_time)
+            with profiler.stage('tick_wait'):
+                clock.tick(self.max_fps)
+
+        if profile_path:
+            try:
+                profiler.export(profile_path)
+                print(f"Profiler: đã xuất {len(profiler.recorded)} frame ra {profile_path}")
+            except OSError as e:
+                print(f"Không thể xuất dữ liệu profiler: {e}")
 
         # Cleanup
         self.renderer.cleanup()
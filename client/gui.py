@@ -1,161 +1,155 @@
 import pygame
+import numpy as np
 import math
 import time
 import random
 import os
 import sys
+import threading
+import importlib.util
+from contextlib import contextmanager
 from common.messages import GameConstants
+from client.assets import AssetLoader
+from client.profiler import FrameProfiler
+from client.particles import ParticlePool, X, Y, LIFE, MAX_LIFE, SIZE, R, B, A, FADE
+from client.render_cache import BackgroundCache, GlyphCache, LRUCache, TankSpriteCache, TextCache
 
-# Optional UI helper: pygame_gui (if installed)
+# Optional UI helper: pygame_gui (if installed). Chỉ kiểm tra có cài hay không,
+# không import ngay để không làm chậm lúc khởi động
 try:
-    import pygame_gui
-    HAVE_PYGAME_GUI = True
+    HAVE_PYGAME_GUI = importlib.util.find_spec('pygame_gui') is not None
 except Exception:
-    pygame_gui = None
     HAVE_PYGAME_GUI = False
 
 class ParticleSystem:
     """Hệ thống quản lý hiệu ứng particle"""
+    # Ngân sách tối đa cho mỗi loại; vượt quá sẽ loại particle cũ nhất
+    MAX_PARTICLES = 4096
+    MAX_TRAILS = 2048
+    MAX_EXPLOSIONS = 256
+    # Explosion: progress tăng dt * 3 mỗi frame, tức sống 1/3 giây
+    EXPLOSION_LIFETIME = 1 / 3
+
     def __init__(self):
-        self.particles = []
-        self.explosions = []
-        self.trails = []
+        self.particles = ParticlePool(self.MAX_PARTICLES)
+        self.explosions = ParticlePool(self.MAX_EXPLOSIONS)
+        self.trails = ParticlePool(self.MAX_TRAILS)
+        # Surface hình tròn dùng lại giữa các frame
+        self.glyphs = GlyphCache()
     
     def add_particle(self, x, y, color, velocity, lifetime=1.0, size=3, fade=True):
-        self.particles.append({
-            'x': x, 'y': y, 
-            'color': color,
-            'vx': velocity[0], 'vy': velocity[1],
-            'lifetime': lifetime,
-            'max_lifetime': lifetime,
-            'size': size,
-            'fade': fade
-        })
+        self.particles.add(x, y, velocity[0], velocity[1], lifetime, size, color, fade)
     
     def add_explosion(self, x, y, size=1.0, color=None):
-        self.explosions.append({
-            'x': x, 'y': y,
-            'size': size,
-            'progress': 0.0,
-            'max_size': 40 * size,
-            'color': color or (255, 200, 100)
-        })
+        # SIZE lưu bán kính lớn nhất của vụ nổ
+        self.explosions.add(x, y, 0, 0, self.EXPLOSION_LIFETIME, 40 * size,
+                            color or (255, 200, 100))
     
     def add_trail(self, x, y, color, size=2, lifetime=0.5):
-        self.trails.append({
-            'x': x, 'y': y,
-            'color': color,
-            'lifetime': lifetime,
-            'max_lifetime': lifetime,
-            'size': size
-        })
+        self.trails.add(x, y, 0, 0, lifetime, size, color)
     
     def update(self, dt):
-        # Update particles
-        new_particles = []
-        for p in self.particles:
-            p['x'] += p['vx'] * dt * 60
-            p['y'] += p['vy'] * dt * 60
-            p['lifetime'] -= dt
-            if p['lifetime'] > 0:
-                new_particles.append(p)
-        self.particles = new_particles
-        
-        # Update explosions
-        new_explosions = []
-        for e in self.explosions:
-            e['progress'] += dt * 3
-            if e['progress'] < 1.0:
-                new_explosions.append(e)
-        self.explosions = new_explosions
-        
-        # Update trails
-        new_trails = []
-        for t in self.trails:
-            t['lifetime'] -= dt
-            if t['lifetime'] > 0:
-                new_trails.append(t)
-        self.trails = new_trails
+        self.particles.update(dt)
+        self.explosions.update(dt)
+        self.trails.update(dt)
     
-    def draw(self, screen):
-        # Draw trails
-        for t in self.trails:
-            alpha = int(255 * (t['lifetime'] / t['max_lifetime']))
-            size = int(t['size'] * (t['lifetime'] / t['max_lifetime']))
-            if size < 1: size = 1
-            
-            color = list(t['color'])
-            if len(color) == 3:
-                color.append(alpha)
-            
-            surf = pygame.Surface((size*2, size*2), pygame.SRCALPHA)
-            pygame.draw.circle(surf, color, (size, size), size)
-            screen.blit(surf, (t['x']-size, t['y']-size))
-        
-        # Draw particles
-        for p in self.particles:
-            if p['fade']:
-                alpha = int(255 * (p['lifetime'] / p['max_lifetime']))
-            else:
-                alpha = 255
-                
-            size = int(p['size'] * (p['lifetime'] / p['max_lifetime']))
-            if size < 1: size = 1
-            
-            color = list(p['color'])
-            if len(color) == 3:
-                color.append(alpha)
-            
-            surf = pygame.Surface((size*2, size*2), pygame.SRCALPHA)
-            pygame.draw.circle(surf, color, (size, size), size)
-            screen.blit(surf, (p['x']-size, p['y']-size))
-        
-        # Draw explosions
-        for e in self.explosions:
-            progress = e['progress']
-            size = e['max_size'] * (1 - (1 - progress) ** 2)
-            alpha = int(255 * (1 - progress))
-            
-            # Main explosion
-            color = list(e['color'])
-            color.append(alpha)
-            surf = pygame.Surface((int(size*2), int(size*2)), pygame.SRCALPHA)
-            pygame.draw.circle(surf, color, (int(size), int(size)), int(size))
-            
-            # Shockwave
-            wave_size = size * 1.3
-            wave_alpha = int(150 * (1 - progress))
-            wave_color = (min(255, e['color'][0] + 50), 
-                         min(255, e['color'][1] + 30), 
-                         max(0, e['color'][2] - 50), 
-                         wave_alpha)
-            pygame.draw.circle(surf, wave_color, (int(size), int(size)), int(wave_size), 3)
-            
-            screen.blit(surf, (e['x']-size, e['y']-size))
+    def _draw_circles(self, pool, batch):
+        """Tính bán kính/alpha theo lô rồi thêm các glyph hình tròn vào batch"""
+        d = pool.view()
+        if not d.shape[1]:
+            return
+        ratio = d[LIFE] / d[MAX_LIFE]
+        alpha = np.where(d[FADE] > 0, 255 * ratio, 255)
+        alpha = np.where(d[A] >= 0, d[A], alpha)
+        radius = np.maximum(1, (d[SIZE] * ratio).astype(np.int32))
+        rgb = d[R:B + 1].astype(np.int32)
+        
+        circle = self.glyphs.circle
+        append = batch.append
+        for x, y, rad, r, g, b, al in zip(d[X].tolist(), d[Y].tolist(), radius.tolist(),
+                                          rgb[0].tolist(), rgb[1].tolist(), rgb[2].tolist(),
+                                          alpha.tolist()):
+            append((circle((r, g, b), rad, al), (x - rad, y - rad)))
+    
+    def draw(self, screen, track=False):
+        """Vẽ tất cả particle; nếu track=True trả về danh sách Rect đã vẽ"""
+        batch = []
+        
+        # Draw trails, then particles
+        self._draw_circles(self.trails, batch)
+        self._draw_circles(self.particles, batch)
+        
+        # Draw explosions (main explosion + shockwave)
+        d = self.explosions.view()
+        if d.shape[1]:
+            ratio = d[LIFE] / d[MAX_LIFE]
+            sizes = d[SIZE] * (1 - ratio ** 2)
+            rgb = d[R:B + 1].astype(np.int32)
+            explosion = self.glyphs.explosion
+            for x, y, size, r, g, b, rt in zip(d[X].tolist(), d[Y].tolist(), sizes.tolist(),
+                                                rgb[0].tolist(), rgb[1].tolist(), rgb[2].tolist(),
+                                                ratio.tolist()):
+                radius = int(size)
+                if radius < 1:
+                    continue
+                batch.append((explosion((r, g, b), radius, 255 * rt), (x - size, y - size)))
+        
+        # Một lệnh blits cho cả frame thay vì một blit mỗi particle
+        if not batch:
+            return [] if track else None
+        return screen.blits(batch, doreturn=track)
 
 
 class GameRenderer:
-    def __init__(self, username):
+    # Ngôi sao ở nền menu: |sin(0.3t + c)| lặp lại sau pi / 0.3 giây,
+    # chu kỳ này được chia thành TWINKLE_PHASES khung dựng sẵn
+    STAR_COUNT = 100
+    TWINKLE_PERIOD = math.pi / 0.3
+    TWINKLE_PHASES = 64
+
+    def __init__(self, username, dirty_rects=False):
         self.player_name = username
         self.player_id = None
         self.screen = None
-        self.font = None
-        self.big_font = None
+        self._fonts = None
+        self._font_warmup = None
+        self.assets = None
+        self.startup_timings = {}
         self.original_width = GameConstants.SCREEN_WIDTH
         self.original_height = GameConstants.SCREEN_HEIGHT
         self.fullscreen = False
-        self.backgrounds = []
+        self.backgrounds = {}
+        self.background_cache = BackgroundCache()
         self.current_background = None
         self.scaled_background = None
+        self.map_thumbnail = None
         self.current_map_id = 0
         self.map_initialized = False
         
         # Particle system
         self.particles = ParticleSystem()
         
+        # Profiler theo giai đoạn vẽ (tắt mặc định)
+        self.profiler = FrameProfiler()
+        
         # HP display cache
         self._hp_display = {}
         
+        # Sprite xe tăng đã xoay sẵn (LRU theo bảng màu và góc)
+        self.tank_sprites = TankSpriteCache()
+        
+        # Surface chữ đã render (LRU, có đếm hit/miss)
+        self.text_cache = TextCache()
+        
+        # Lớp nền đã dựng sẵn theo theme/độ phân giải
+        self._bg_layers = {}
+        
+        # Surface HUD/overlay dựng sẵn, khoá theo các giá trị đầu vào (số đạn, tiến độ, màu, map...)
+        self.hud_cache = LRUCache(256)
+        
+        # Chế độ dirty-rect (tuỳ chọn): chỉ vẽ lại/cập nhật vùng bị thay đổi
+        self.set_dirty_rect_mode(dirty_rects)
+        
         # Animation states
         self.screen_shake = 0
         self.pulse_animation = 0
@@ -246,6 +240,7 @@ class GameRenderer:
 
     def set_theme(self, name):
         """Chọn theme theo tên"""
+        self.invalidate_background_cache()
         if name in self.THEMES:
             self.colors = self.THEMES[name]
             self.theme_name = name
@@ -266,47 +261,112 @@ class GameRenderer:
         pygame.display.set_caption(f"Fire Tank - {self.player_name} (Player {self.player_id})")
         self.scaled_background = None
 
-    def initialize(self):
-        """Khởi tạo pygame và font"""
-        pygame.init()
-        self.screen = pygame.display.set_mode(
-            (self.original_width, self.original_height), 
-            pygame.RESIZABLE | pygame.SCALED
-        )
-        pygame.display.set_caption(f"Fire Tank - Player {self.player_id}")
-        
-        # Load premium fonts
+    @contextmanager
+    def _timed(self, label):
+        """Ghi lại thời gian của một bước khởi động vào startup_timings"""
+        start = time.perf_counter()
         try:
-            font_path = os.path.join(self.project_root, "ui", "fonts")
-            if os.path.exists(os.path.join(font_path, "orbitron.ttf")):
-                self.font = pygame.font.Font(os.path.join(font_path, "orbitron.ttf"), 24)
-                self.small_font = pygame.font.Font(os.path.join(font_path, "orbitron.ttf"), 16)
-                self.big_font = pygame.font.Font(os.path.join(font_path, "orbitron.ttf"), 48)
-                self.title_font = pygame.font.Font(os.path.join(font_path, "orbitron.ttf"), 64)
-            else:
-                preferred_fonts = ["Arial Black", "Verdana", "Segoe UI"]
-                self.font = pygame.font.SysFont(preferred_fonts, 24)
-                self.small_font = pygame.font.SysFont(preferred_fonts, 16)
-                self.big_font = pygame.font.SysFont(preferred_fonts, 48)
-                self.title_font = pygame.font.SysFont(preferred_fonts, 64)
-        except:
-            self.font = pygame.font.Font(None, 24)
-            self.small_font = pygame.font.Font(None, 16)
-            self.big_font = pygame.font.Font(None, 48)
-            self.title_font = pygame.font.Font(None, 64)
-
-        self.load_backgrounds()
-        self.set_map(0)
-        
-        # Load logo
-        try:
-            logo_path = os.path.join(self.project_root, "ui", "logo.png")
-            if os.path.exists(logo_path):
-                self.logo = pygame.image.load(logo_path).convert_alpha()
-            else:
-                self.logo = None
-        except Exception:
-            self.logo = None
+            yield
+        finally:
+            self.startup_timings[label] = time.perf_counter() - start
+
+    def initialize(self):
+        """Khởi tạo pygame; font và ảnh map được nạp lười khi cần lần đầu"""
+        self._init_started = time.perf_counter()
+        with self._timed('pygame.init'):
+            pygame.init()
+        with self._timed('display'):
+            self._set_mode(pygame.RESIZABLE | pygame.SCALED)
+            pygame.display.set_caption(f"Fire Tank - Player {self.player_id}")
+        
+        # Dò danh sách SysFont (chậm trên một số hệ thống) ở thread nền
+        self._font_warmup = threading.Thread(target=pygame.font.get_fonts, daemon=True)
+        self._font_warmup.start()
+        
+        # Ảnh map chỉ được nạp khi cần; các map được giải mã trước ở thread nền
+        self.assets = AssetLoader(os.path.join(self.project_root, "ui"))
+        self.assets.start_prefetch()
+
+    def startup_report(self):
+        """Chuỗi tóm tắt thời gian khởi động theo từng bước (ms)"""
+        timings = dict(self.startup_timings)
+        if self.assets:
+            timings.update(self.assets.timings)
+        return ", ".join(f"{label} {value * 1000:.1f}ms" for label, value in timings.items())
+
+    def _load_fonts(self):
+        """Nạp font lần đầu được dùng"""
+        if self._font_warmup is not None:
+            self._font_warmup.join()
+        fonts = {}
+        with self._timed('fonts'):
+            try:
+                font_path = os.path.join(self.project_root, "ui", "fonts")
+                if os.path.exists(os.path.join(font_path, "orbitron.ttf")):
+                    for key, size in (('font', 24), ('small_font', 16), ('big_font', 48), ('title_font', 64)):
+                        fonts[key] = pygame.font.Font(os.path.join(font_path, "orbitron.ttf"), size)
+                else:
+                    preferred_fonts = ["Arial Black", "Verdana", "Segoe UI"]
+                    for key, size in (('font', 24), ('small_font', 16), ('big_font', 48), ('title_font', 64)):
+                        fonts[key] = pygame.font.SysFont(preferred_fonts, size)
+            except:
+                for key, size in (('font', 24), ('small_font', 16), ('big_font', 48), ('title_font', 64)):
+                    fonts[key] = pygame.font.Font(None, size)
+            # Nhãn "MAP n" của nền mặc định: tạo một lần để khoá cache chữ không đổi giữa các lần dựng nền
+            fonts['map_label_font'] = pygame.font.SysFont(None, 48)
+        self._fonts = fonts
+        return fonts
+
+    @property
+    def font(self):
+        return (self._fonts or self._load_fonts())['font']
+
+    @property
+    def small_font(self):
+        return (self._fonts or self._load_fonts())['small_font']
+
+    @property
+    def big_font(self):
+        return (self._fonts or self._load_fonts())['big_font']
+
+    @property
+    def title_font(self):
+        return (self._fonts or self._load_fonts())['title_font']
+
+    @property
+    def map_label_font(self):
+        return (self._fonts or self._load_fonts())['map_label_font']
+
+    @property
+    def logo(self):
+        """Logo (nạp lười, None nếu không có file)"""
+        if not hasattr(self, '_logo'):
+            self._logo = None
+            try:
+                logo_path = os.path.join(self.project_root, "ui", "logo.png")
+                if os.path.exists(logo_path):
+                    self._logo = pygame.image.load(logo_path).convert_alpha()
+            except Exception:
+                self._logo = None
+        return self._logo
+
+    def set_dirty_rect_mode(self, enabled):
+        """Bật/tắt chế độ dirty-rect cho màn hình trong trận"""
+        self.dirty_rects_enabled = bool(enabled)
+        self._dirty_rects = []
+        self._prev_dirty_rects = []
+        self._untracked_frame()
+
+    def _untracked_frame(self):
+        """Frame có vùng vẽ không được theo dõi: flip toàn màn hình, frame sau vẽ lại toàn bộ"""
+        self._can_restore = False
+        self._partial_frame = False
+        self._frame_tracked = False
+
+    def _mark_dirty(self, rect):
+        """Ghi nhận vùng đã vẽ trong frame hiện tại (chỉ ở chế độ dirty-rect)"""
+        if self.dirty_rects_enabled:
+            self._dirty_rects.append(rect)
 
     def add_screen_shake(self, intensity=5):
         """Thêm hiệu ứng rung màn hình"""
@@ -327,69 +387,124 @@ class GameRenderer:
 
     def _draw_premium_bg(self):
         """Vẽ background cao cấp với hiệu ứng parallax"""
-        self._draw_gradient_bg(self.colors['bg_top'], self.colors['bg_bottom'])
-        
         w, h = self.original_width, self.original_height
-        time_val = time.time()
-        
-        # Vẽ các ngôi sao
-        for i in range(100):
-            x = (i * 97) % w
-            y = (i * 63) % h
-            size = 0.5 + (i % 4) * 0.5
-            brightness = int(100 + 155 * abs(math.sin(time_val * 0.3 + i * 0.5)))
-            color = (brightness, brightness, brightness)
-            pygame.draw.circle(self.screen, color, (int(x), int(y)), max(1, int(round(size))))
-        
-        # Vẽ grid tinh tế
+        key = ('premium', self.colors['bg_top'], self.colors['bg_bottom'], self.colors['accent'], w, h)
+        layers = self._bg_layers.get(key)
+        if layers is None:
+            layers = self._build_premium_bg(w, h)
+            self._bg_layers[key] = layers
+        base, star_frames = layers
+        
+        # Nền tĩnh + một lô blit cho pha lấp lánh hiện tại của các ngôi sao
+        period = self.TWINKLE_PERIOD
+        phase = int((time.time() % period) / period * len(star_frames)) % len(star_frames)
+        self.screen.blit(base, (0, 0))
+        self.screen.blits(star_frames[phase], doreturn=False)
+
+    def _build_premium_bg(self, w, h):
+        """Dựng sẵn lớp nền tĩnh (gradient + grid) và các pha lấp lánh của ngôi sao"""
+        base = self._gradient_surface(self.colors['bg_top'], self.colors['bg_bottom'], w, h).copy()
+        
+        # Grid tinh tế (màn hình không có kênh alpha nên grid luôn hiển thị đặc)
+        grid_color = self.colors['accent'][:3]
         for i in range(0, w, 60):
-            alpha = int(15 + 10 * math.sin(time_val * 0.2 + i * 0.01))
-            pygame.draw.line(self.screen, 
-                           (*self.colors['accent'][:3], alpha), 
-                           (i, 0), (i, h), 1)
+            pygame.draw.line(base, grid_color, (i, 0), (i, h), 1)
         for i in range(0, h, 60):
-            alpha = int(15 + 10 * math.sin(time_val * 0.2 + i * 0.01))
-            pygame.draw.line(self.screen, 
-                           (*self.colors['accent'][:3], alpha), 
-                           (0, i), (w, i), 1)
+            pygame.draw.line(base, grid_color, (0, i), (w, i), 1)
+        
+        # Các ngôi sao: mỗi pha là danh sách (surface, vị trí) cho Surface.blits
+        dots = {}
+        star_frames = []
+        for k in range(self.TWINKLE_PHASES):
+            time_val = k * self.TWINKLE_PERIOD / self.TWINKLE_PHASES
+            frame = []
+            for i in range(self.STAR_COUNT):
+                x = (i * 97) % w
+                y = (i * 63) % h
+                size = 0.5 + (i % 4) * 0.5
+                radius = max(1, int(round(size)))
+                brightness = int(100 + 155 * abs(math.sin(time_val * 0.3 + i * 0.5)))
+                dot = dots.get((brightness, radius))
+                if dot is None:
+                    dot = pygame.Surface((radius * 2 + 1, radius * 2 + 1))
+                    dot.set_colorkey((0, 0, 0))
+                    pygame.draw.circle(dot, (brightness, brightness, brightness), (radius, radius), radius)
+                    dots[(brightness, radius)] = dot
+                frame.append((dot, (x - radius, y - radius)))
+            star_frames.append(frame)
+        return base, star_frames
+
+    def _gradient_surface(self, top_color, bottom_color, w, h):
+        """Surface gradient dọc kích thước (w, h), được cache theo màu và kích thước"""
+        key = ('gradient', tuple(top_color), tuple(bottom_color), w, h)
+        surf = self._bg_layers.get(key)
+        if surf is None:
+            grad = pygame.Surface((1, h))
+            for y in range(h):
+                t = y / max(1, h - 1)
+                r = int(top_color[0] * (1 - t) + bottom_color[0] * t)
+                g = int(top_color[1] * (1 - t) + bottom_color[1] * t)
+                b = int(top_color[2] * (1 - t) + bottom_color[2] * t)
+                grad.set_at((0, y), (r, g, b))
+            surf = pygame.transform.scale(grad, (w, h))
+            if pygame.display.get_surface() is not None:
+                surf = surf.convert()
+            self._bg_layers[key] = surf
+        return surf
 
     def _draw_gradient_bg(self, top_color, bottom_color):
         """Vẽ gradient background"""
         w, h = self.original_width, self.original_height
-        grad = pygame.Surface((1, h)).convert_alpha()
-        for y in range(h):
-            t = y / max(1, h - 1)
-            r = int(top_color[0] * (1 - t) + bottom_color[0] * t)
-            g = int(top_color[1] * (1 - t) + bottom_color[1] * t)
-            b = int(top_color[2] * (1 - t) + bottom_color[2] * t)
-            grad.set_at((0, y), (r, g, b))
-        grad = pygame.transform.scale(grad, (w, h))
-        self.screen.blit(grad, (0, 0))
+        self.screen.blit(self._gradient_surface(top_color, bottom_color, w, h), (0, 0))
+
+    def _cached_surface(self, key, build):
+        """Lấy surface từ bộ đệm HUD/overlay, dựng bằng build() khi đầu vào thay đổi"""
+        surf = self.hud_cache.get(key)
+        if surf is None:
+            surf = build()
+            self.hud_cache.put(key, surf)
+        return surf
+
+    def _render_text(self, font, text, antialias, color):
+        """Như font.render(text, antialias, color) nhưng lấy surface từ bộ đệm chữ"""
+        return self.text_cache.render(font, text, antialias, color)
+
+    def invalidate_background_cache(self):
+        """Xoá các lớp nền đã dựng sẵn (khi đổi theme hoặc chế độ hiển thị)"""
+        self._bg_layers.clear()
 
     def _draw_glowing_card(self, rect, color, glow_size=10, radius=10):
         """Vẽ thẻ với hiệu ứng glow"""
         x, y, w, h = rect
         glow_size = int(max(0, round(glow_size)))
         radius = int(round(radius))
-        glow_surf = pygame.Surface((w + glow_size*2, h + glow_size*2), pygame.SRCALPHA)
-        
-        for i in range(glow_size, 0, -1):
-            alpha = 80 - (i * 80 // glow_size)
-            glow_color = (*color[:3], alpha)
-            pygame.draw.rect(glow_surf, glow_color, 
-                           (glow_size-i, glow_size-i, w+i*2, h+i*2), 
-                           border_radius=radius+i)
         
+        def build():
+            glow_surf = pygame.Surface((w + glow_size*2, h + glow_size*2), pygame.SRCALPHA)
+            for i in range(glow_size, 0, -1):
+                alpha = 80 - (i * 80 // glow_size)
+                glow_color = (*color[:3], alpha)
+                pygame.draw.rect(glow_surf, glow_color, 
+                               (glow_size-i, glow_size-i, w+i*2, h+i*2), 
+                               border_radius=radius+i)
+            return glow_surf
+        
+        glow_surf = self._cached_surface(('glow', w, h, tuple(color[:3]), glow_size, radius), build)
         self.screen.blit(glow_surf, (x - glow_size, y - glow_size))
 
     def _draw_card(self, rect, color, border_color=None, radius=10):
         """Vẽ thẻ với bo góc"""
         x, y, w, h = rect
-        s = pygame.Surface((w, h), pygame.SRCALPHA)
-        pygame.draw.rect(s, color, (0, 0, w, h), border_radius=radius)
-        if border_color:
-            pygame.draw.rect(s, border_color, (0, 0, w, h), 2, border_radius=radius)
-        self.screen.blit(s, (x, y))
+        
+        def build():
+            s = pygame.Surface((w, h), pygame.SRCALPHA)
+            pygame.draw.rect(s, color, (0, 0, w, h), border_radius=radius)
+            if border_color:
+                pygame.draw.rect(s, border_color, (0, 0, w, h), 2, border_radius=radius)
+            return s
+        
+        key = ('card', w, h, tuple(color), tuple(border_color) if border_color else None, radius)
+        self.screen.blit(self._cached_surface(key, build), (x, y))
 
     def _draw_premium_button(self, rect, text, hover=False, pulse=0):
         """Vẽ nút cao cấp"""
@@ -409,7 +524,7 @@ class GameRenderer:
         
         self._draw_card((x, y, w, h), color=base_color, border_color=self.colors['accent'], radius=10)
         
-        text_surf = self.font.render(text, True, text_color)
+        text_surf = self._render_text(self.font, text, True, text_color)
         self.screen.blit(text_surf, text_surf.get_rect(center=rect.center))
         
         if hover:
@@ -433,9 +548,9 @@ class GameRenderer:
             display_text = '*' * len(text)
         
         if display_text:
-            text_surf = self.font.render(display_text, True, self.colors['hud_text'])
+            text_surf = self._render_text(self.font, display_text, True, self.colors['hud_text'])
         else:
-            text_surf = self.font.render("", True, self.colors['muted'])
+            text_surf = self._render_text(self.font, "", True, self.colors['muted'])
         
         text_rect = text_surf.get_rect(midleft=(x + 12, y + h//2))
         
@@ -490,8 +605,8 @@ class GameRenderer:
             self._draw_card((left, top, w, h), color=self.colors['card'], border_color=self.colors['accent'], radius=15)
 
             # Title
-            title_glow = self.title_font.render("FIRE TANK", True, self.colors['accent'])
-            title = self.title_font.render("FIRE TANK", True, self.colors['white'])
+            title_glow = self._render_text(self.title_font, "FIRE TANK", True, self.colors['accent'])
+            title = self._render_text(self.title_font, "FIRE TANK", True, self.colors['white'])
             for offset in [(2,2), (-2,2), (2,-2), (-2,-2)]:
                 self.screen.blit(title_glow, title_glow.get_rect(center=(cx+offset[0], top+40+offset[1])))
             self.screen.blit(title, title.get_rect(center=(cx, top+40)))
@@ -501,10 +616,12 @@ class GameRenderer:
             self._draw_premium_button(reg_rect, "REGISTER", hover_register, pulse)
 
             # Subtitle
-            subtitle = self.small_font.render("CHOOSE YOUR PATH, COMMANDER", True, self.colors['muted'])
+            subtitle = self._render_text(self.small_font, "CHOOSE YOUR PATH, COMMANDER", True, self.colors['muted'])
             self.screen.blit(subtitle, subtitle.get_rect(center=(cx, top+80)))
 
             pygame.display.flip()
+            if 'first frame' not in self.startup_timings and hasattr(self, '_init_started'):
+                self.startup_timings['first frame'] = time.perf_counter() - self._init_started
 
         return choice
 
@@ -596,7 +713,7 @@ class GameRenderer:
             self._draw_card((cx-235, 65, 470, 390), color=self.colors['card'], border_color=self.colors['accent'], radius=20)
             
             # Title
-            title = self.big_font.render("LOGIN TO BATTLE", True, self.colors['accent'])
+            title = self._render_text(self.big_font, "LOGIN TO BATTLE", True, self.colors['accent'])
             self.screen.blit(title, title.get_rect(center=(cx, 100)))
             
             # Input fields
@@ -606,19 +723,19 @@ class GameRenderer:
             # Host input
             host_rect = pygame.Rect(start_x, y0, 400, 40)
             self._draw_input_box(host_rect, host, active == 0)
-            host_label = self.small_font.render("SERVER HOST (localhost if empty)", True, self.colors['hud_text'])
+            host_label = self._render_text(self.small_font, "SERVER HOST (localhost if empty)", True, self.colors['hud_text'])
             self.screen.blit(host_label, (start_x, y0 - 20))
             
             # Username input
             user_rect = pygame.Rect(start_x, y0 + 60, 400, 40)
             self._draw_input_box(user_rect, username, active == 1)
-            user_label = self.small_font.render("USERNAME", True, self.colors['hud_text'])
+            user_label = self._render_text(self.small_font, "USERNAME", True, self.colors['hud_text'])
             self.screen.blit(user_label, (start_x, y0 + 40))
             
             # Password input
             pass_rect = pygame.Rect(start_x, y0 + 120, 400, 40)
             self._draw_input_box(pass_rect, password, active == 2, password=True)
-            pass_label = self.small_font.render("PASSWORD", True, self.colors['hud_text'])
+            pass_label = self._render_text(self.small_font, "PASSWORD", True, self.colors['hud_text'])
             self.screen.blit(pass_label, (start_x, y0 + 100))
             
             # Back button
@@ -626,7 +743,7 @@ class GameRenderer:
             self._draw_premium_button(back_rect, "BACK", False, self.pulse_animation)
             
             # Instructions
-            info = self.small_font.render("Press ENTER to submit • TAB to switch fields", True, self.colors['muted'])
+            info = self._render_text(self.small_font, "Press ENTER to submit • TAB to switch fields", True, self.colors['muted'])
             self.screen.blit(info, info.get_rect(center=(cx, y0 + 190)))
             
             pygame.display.flip()
@@ -703,7 +820,7 @@ class GameRenderer:
             self._draw_card((cx-235, 45, 470, 440), color=self.colors['card'], border_color=self.colors['accent'], radius=20)
             
             # Title
-            title = self.big_font.render("JOIN THE BATTLE", True, self.colors['accent'])
+            title = self._render_text(self.big_font, "JOIN THE BATTLE", True, self.colors['accent'])
             self.screen.blit(title, title.get_rect(center=(cx, 80)))
             
             # Input fields
@@ -720,7 +837,7 @@ class GameRenderer:
             for i, (text, label_text, is_password) in enumerate(fields):
                 rect = pygame.Rect(start_x, y0 + i * 60, 400, 40)
                 self._draw_input_box(rect, text, active == i, is_password)
-                label = self.small_font.render(label_text, True, self.colors['hud_text'])
+                label = self._render_text(self.small_font, label_text, True, self.colors['hud_text'])
                 self.screen.blit(label, (start_x, y0 + i * 60 - 20))
             
             # Back button
@@ -728,7 +845,7 @@ class GameRenderer:
             self._draw_premium_button(back_rect, "BACK", False, self.pulse_animation)
             
             # Instructions
-            info = self.small_font.render("Press ENTER to register • TAB to switch fields", True, self.colors['muted'])
+            info = self._render_text(self.small_font, "Press ENTER to register • TAB to switch fields", True, self.colors['muted'])
             self.screen.blit(info, info.get_rect(center=(cx, y0 + 250)))
             
             pygame.display.flip()
@@ -761,29 +878,16 @@ class GameRenderer:
         # ... (giữ nguyên implementation cũ)
         return self._show_register_page_custom()
 
-    def load_backgrounds(self):
-        """Load background images"""
-        background_dir = os.path.join(self.project_root, "ui")
-        background_files = ["map1.png", "map2.png", "map3.png"]
-        
-        for bg_file in background_files:
-            bg_path = os.path.join(background_dir, bg_file)
-            if os.path.exists(bg_path):
-                try:
-                    img = pygame.image.load(bg_path)
-                    try:
-                        background = img.convert_alpha()
-                    except Exception:
-                        background = img.convert()
-                    self.backgrounds.append(background)
-                except Exception as e:
-                    print(f"Error loading {bg_file}: {e}")
-                    self.create_default_background(background_files.index(bg_file))
-            else:
-                self.create_default_background(background_files.index(bg_file))
-        
-        while len(self.backgrounds) < 3:
-            self.create_default_background(len(self.backgrounds))
+    def get_background(self, map_id):
+        """Background của map, nạp lần đầu khi cần (ảnh trong ui/ hoặc nền mặc định)"""
+        bg = self.backgrounds.get(map_id)
+        if bg is None:
+            with self._timed(f'background {map_id + 1}'):
+                bg = self.assets.get_map(map_id) if self.assets else None
+                if bg is None:
+                    bg = self.create_default_background(map_id)
+            self.backgrounds[map_id] = bg
+        return bg
 
     def create_default_background(self, map_id):
         """Tạo background mặc định"""
@@ -811,12 +915,11 @@ class GameRenderer:
                               (i + 25, j + 35), (i + 15, j + 25)]
                     pygame.draw.polygon(bg, (color[0] + 20, color[1] + 20, color[2] + 20), points)
         
-        font = pygame.font.SysFont(None, 48)
-        text = font.render(f"MAP {map_id + 1}", True, self.colors['white'])
+        text = self._render_text(self.map_label_font, f"MAP {map_id + 1}", True, self.colors['white'])
         text_rect = text.get_rect(center=(self.original_width // 2, self.original_height // 2))
         bg.blit(text, text_rect)
         
-        self.backgrounds.append(bg)
+        return bg
 
     def set_map(self, map_id):
         """Thiết lập map"""
@@ -825,26 +928,36 @@ class GameRenderer:
         except Exception:
             map_id = 0
 
-        if 0 <= map_id < len(self.backgrounds):
-            self.current_map_id = map_id
-            self.current_background = self.backgrounds[map_id]
-            self.map_initialized = True
-        else:
-            if self.backgrounds:
-                self.current_map_id = 0
-                self.current_background = self.backgrounds[0]
-                self.map_initialized = True
+        if not 0 <= map_id < GameConstants.MAP_COUNT:
+            map_id = 0
+        self.current_map_id = map_id
+        self.current_background = self.get_background(map_id)
+        self.map_initialized = True
 
-        if self.current_background:
-            self.scaled_background = pygame.transform.scale(
-                self.current_background, 
-                (self.original_width, self.original_height)
-            )
+        self._untracked_frame()
+        self._apply_background()
         
         # Refresh theme if in synchronized random mode
         if getattr(self, 'random_theme_sync', False):
             self.set_theme('random')
     
+    def _display_size(self):
+        if self.screen is not None:
+            return self.screen.get_size()
+        return self.original_width, self.original_height
+
+    def _apply_background(self):
+        """Lấy nền đã scale và thumbnail của map hiện tại từ bộ đệm theo độ phân giải"""
+        if self.current_background:
+            self.scaled_background, self.map_thumbnail = self.background_cache.get(
+                self.current_map_id, self.current_background, self._display_size())
+
+    def prewarm_backgrounds(self):
+        """Dựng sẵn nền của mọi map ở độ phân giải hiện tại để đổi map giữa các vòng không bị khựng"""
+        size = self._display_size()
+        for map_id in range(GameConstants.MAP_COUNT):
+            self.background_cache.get(map_id, self.get_background(map_id), size)
+
     def get_current_map_id(self):
         """Trả về ID map hiện tại"""
         return self.current_map_id
@@ -852,29 +965,49 @@ class GameRenderer:
     def toggle_fullscreen(self):
         """Chuyển đổi chế độ fullscreen"""
         self.fullscreen = not self.fullscreen
+        self.invalidate_background_cache()
+        self._untracked_frame()
         if self.fullscreen:
-            self.screen = pygame.display.set_mode(
-                (self.original_width, self.original_height), 
-                pygame.FULLSCREEN | pygame.SCALED
-            )
+            self._set_mode(pygame.FULLSCREEN | pygame.SCALED)
         else:
-            self.screen = pygame.display.set_mode(
-                (self.original_width, self.original_height), 
-                pygame.RESIZABLE | pygame.SCALED
-            )
+            self._set_mode(pygame.RESIZABLE | pygame.SCALED)
+        if self.map_initialized:
+            self._apply_background()
+
+    def _set_mode(self, flags):
+        """Mở cửa sổ với vsync nếu driver hỗ trợ, nếu không thì mở bình thường"""
+        size = (self.original_width, self.original_height)
+        try:
+            self.screen = pygame.display.set_mode(size, flags, vsync=1)
+        except pygame.error:
+            self.screen = pygame.display.set_mode(size, flags)
 
     def _get_center(self):
         return self.original_width // 2, self.original_height // 2
 
-    def draw_background(self):
-        """Vẽ background"""
+    def draw_background(self, track=False):
+        """Vẽ background; track=True khi các vùng vẽ sau đó được ghi nhận bằng _mark_dirty"""
+        if not track:
+            self._untracked_frame()
+        if not self.map_initialized:
+            self.set_map(self.current_map_id)
         if self.scaled_background:
             # Apply screen shake
             amp = int(self.screen_shake)
+            if track and self.dirty_rects_enabled:
+                # Frame rung màn hình dịch toàn bộ nền nên frame sau phải vẽ lại toàn bộ
+                self._frame_tracked = amp == 0
+                self._partial_frame = amp == 0 and self._can_restore
+                if self._partial_frame:
+                    # Chỉ khôi phục từ nền những vùng đã vẽ ở frame trước
+                    bg = self.scaled_background
+                    self.screen.blits([(bg, r, r) for r in self._prev_dirty_rects], doreturn=False)
+                    return
             shake_x = random.randint(-amp, amp) if amp > 0 else 0
             shake_y = random.randint(-amp, amp) if amp > 0 else 0
             self.screen.blit(self.scaled_background, (shake_x, shake_y))
         else:
+            self._untracked_frame()
             self._draw_premium_bg()
 
     def draw_waiting_screen(self, game_state, ready, waiting_for_players):
@@ -882,19 +1015,24 @@ class GameRenderer:
         self.draw_background()
         
         # Overlay
-        overlay = pygame.Surface((self.original_width, self.original_height), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 150))
-        self.screen.blit(overlay, (0, 0))
+        w, h = self.original_width, self.original_height
+        
+        def build_overlay():
+            overlay = pygame.Surface((w, h), pygame.SRCALPHA)
+            overlay.fill((0, 0, 0, 150))
+            return overlay
+        
+        self.screen.blit(self._cached_surface(('waiting_overlay', w, h), build_overlay), (0, 0))
 
         cx, cy = self._get_center()
 
         # Title
-        title_text = self.title_font.render("FIRE TANK", True, self.colors['accent'])
+        title_text = self._render_text(self.title_font, "FIRE TANK", True, self.colors['accent'])
         title_rect = title_text.get_rect(center=(cx, 100))
         self.screen.blit(title_text, title_rect)
 
         # Player ID
-        id_surf = self.font.render(f"PLAYER ID: {self.player_id}", True, self.colors['hud_text'])
+        id_surf = self._render_text(self.font, f"PLAYER ID: {self.player_id}", True, self.colors['hud_text'])
         self.screen.blit(id_surf, id_surf.get_rect(center=(cx, 160)))
 
         # Status
@@ -910,18 +1048,18 @@ class GameRenderer:
         else:
             status_str = "PRESS SPACE TO READY UP"
             status_color = self.colors['accent_dark']
-        status_surf = self.font.render(status_str, True, status_color)
+        status_surf = self._render_text(self.font, status_str, True, status_color)
         self.screen.blit(status_surf, status_surf.get_rect(center=(cx, 200)))
 
         # Map preview
-        thumb_w, thumb_h = 300, 180
+        thumb_w, thumb_h = BackgroundCache.THUMB_SIZE
         thumb_x, thumb_y = cx - 350, 240
-        if self.current_background:
-            thumb = pygame.transform.smoothscale(self.current_background, (thumb_w, thumb_h))
+        thumb = self.map_thumbnail
+        if thumb is not None:
             self._draw_card((thumb_x - 10, thumb_y - 10, thumb_w + 20, thumb_h + 20), 
                           color=self.colors['card'], border_color=self.colors['card_border'])
             self.screen.blit(thumb, (thumb_x, thumb_y))
-            map_label = self.small_font.render(f"BATTLEFIELD {self.current_map_id + 1}", True, self.colors['accent'])
+            map_label = self._render_text(self.small_font, f"BATTLEFIELD {self.current_map_id + 1}", True, self.colors['accent'])
             self.screen.blit(map_label, (thumb_x + thumb_w//2 - map_label.get_width()//2, thumb_y + thumb_h + 10))
 
         # Players list
@@ -949,7 +1087,7 @@ class GameRenderer:
             
             # Initial
             letter = name[0].upper() if name else '?'
-            letter_surf = self.small_font.render(letter, True, self.colors['card'])
+            letter_surf = self._render_text(self.small_font, letter, True, self.colors['card'])
             self.screen.blit(letter_surf, letter_surf.get_rect(center=(x + icon_size//2, py)))
             
             # Ready indicator
@@ -957,7 +1095,7 @@ class GameRenderer:
             pygame.draw.circle(self.screen, tick_color, (x + icon_size - 8, py + icon_size//2 - 8), 6)
             
             # Name
-            name_surf = self.small_font.render(name, True, self.colors['hud_text'])
+            name_surf = self._render_text(self.small_font, name, True, self.colors['hud_text'])
             self.screen.blit(name_surf, (x + (icon_size - name_surf.get_width())//2, py + icon_size//2 + 10))
 
         # Connection progress
@@ -974,13 +1112,13 @@ class GameRenderer:
                 pygame.draw.rect(self.screen, self.colors['accent'], 
                                (bar_x, bar_y, fill_w, bar_h), border_radius=10)
         
-        pct_text = self.small_font.render(f"{connected}/{total_needed} COMBATANTS READY", True, self.colors['hud_text'])
+        pct_text = self._render_text(self.small_font, f"{connected}/{total_needed} COMBATANTS READY", True, self.colors['hud_text'])
         self.screen.blit(pct_text, pct_text.get_rect(center=(cx, bar_y + bar_h//2)))
 
         # Controls
         controls_x = cx + 200
         controls_y = 240
-        heading = self.font.render("CONTROLS", True, self.colors['accent'])
+        heading = self._render_text(self.font, "CONTROLS", True, self.colors['accent'])
         self.screen.blit(heading, (controls_x - heading.get_width()//2, controls_y))
         
         controls = [
@@ -993,76 +1131,36 @@ class GameRenderer:
         ]
         
         for i, control in enumerate(controls):
-            text = self.small_font.render(control, True, self.colors['hud_text'])
+            text = self._render_text(self.small_font, control, True, self.colors['hud_text'])
             self.screen.blit(text, (controls_x - 120, controls_y + 40 + i * 25))
 
+    def _tank_palette(self, is_player):
+        """Bảng màu (base, dark, highlight, logo) của xe tăng theo theme hiện tại"""
+        if is_player:
+            return (self.colors['player'], self.colors['player_dark'],
+                    self.colors['accent'], self.colors['accent'])
+        return (self.colors['enemy'], self.colors['enemy_dark'],
+                self.colors['accent_dark'], self.colors['muted'])
+
     def draw_tank(self, x, y, angle, is_player):
-        """Vẽ xe tăng bằng các khối hình học"""
-        tank_size = 40
-        tank_width = tank_size
-        tank_height = tank_size * 0.6
-        
-        # Màu sắc: xanh cho player, đỏ cho enemy
-        base_color = self.colors['player'] if is_player else self.colors['enemy']
-        dark_color = self.colors['player_dark'] if is_player else self.colors['enemy_dark']
-        highlight_color = self.colors['accent'] if is_player else self.colors['accent_dark']
-        
-        # Vẽ thân xe (hình chữ nhật bo góc)
-        body_rect = pygame.Rect(
-            int(x - tank_width/2), int(y - tank_height/2),
-            int(tank_width), int(tank_height)
-        )
-        pygame.draw.rect(self.screen, base_color, body_rect, border_radius=8)
-        pygame.draw.rect(self.screen, dark_color, body_rect, 2, border_radius=8)
-        
-        # Vẽ tháp pháo (hình tròn)
-        turret_radius = tank_size * 0.25
-        pygame.draw.circle(self.screen, base_color, (int(x), int(y)), int(turret_radius))
-        pygame.draw.circle(self.screen, dark_color, (int(x), int(y)), int(turret_radius), 2)
-        
-        # Vẽ nòng súng
-        barrel_length = tank_size * 0.8
-        end_x = x + barrel_length * math.cos(math.radians(angle))
-        end_y = y + barrel_length * math.sin(math.radians(angle))
-        
-        # Vẽ nòng súng dày hơn với gradient màu
-        barrel_width = tank_size * 0.15
-        barrel_vector = pygame.Vector2(barrel_length * math.cos(math.radians(angle)), 
-                                     barrel_length * math.sin(math.radians(angle)))
-        perpendicular = pygame.Vector2(-barrel_vector.y, barrel_vector.x).normalize() * (barrel_width/2)
-        barrel_points = [
-            (x + perpendicular.x, y + perpendicular.y),
-            (x - perpendicular.x, y - perpendicular.y),
-            (end_x - perpendicular.x, end_y - perpendicular.y),
-            (end_x + perpendicular.x, end_y + perpendicular.y)
-        ]
-        pygame.draw.polygon(self.screen, dark_color, barrel_points)
-        
-        # Vẽ viền sáng cho nòng súng
-        pygame.draw.polygon(self.screen, highlight_color, barrel_points, 1)
-        
-        # Vẽ các chi tiết trang trí trên thân xe
-        detail_color = highlight_color
-        # Vẽ đường kẻ ngang
-        pygame.draw.line(self.screen, detail_color, 
-                        (x - tank_width/3, y - tank_height/4),
-                        (x + tank_width/3, y - tank_height/4), 2)
-        pygame.draw.line(self.screen, detail_color, 
-                        (x - tank_width/3, y + tank_height/4),
-                        (x + tank_width/3, y + tank_height/4), 2)
-        
-        # Vẽ logo nhỏ trên tháp pháo
-        logo_color = self.colors['accent'] if is_player else self.colors['muted']
-        pygame.draw.circle(self.screen, logo_color, (int(x), int(y)), int(turret_radius/2))
-        pygame.draw.circle(self.screen, dark_color, (int(x), int(y)), int(turret_radius/2), 1)
-
-    def draw_game_state(self, game_state):
-        """Vẽ trạng thái game"""
+        """Vẽ xe tăng từ sprite đã dựng sẵn theo góc"""
+        sprite = self.tank_sprites.get(self._tank_palette(is_player), angle)
+        half = TankSpriteCache.HALF
+        self._mark_dirty(self.screen.blit(sprite, (int(x) - half, int(y) - half)))
+
+    def draw_game_state(self, game_state, bullets=None):
+        """Vẽ trạng thái game; bullets là danh sách (x, y) do client mô phỏng,
+        None thì lấy vị trí đạn có sẵn trong game_state"""
         if not game_state:
             return
         
-        self.draw_background()
-        self.particles.draw(self.screen)
+        profiler = self.profiler
+        with profiler.stage('background'):
+            self.draw_background(track=True)
+        with profiler.stage('particles'):
+            particle_rects = self.particles.draw(self.screen, track=self.dirty_rects_enabled)
+        if particle_rects:
+            self._dirty_rects.extend(particle_rects)
         
         # Vẽ tank và đạn
         for pid, player in game_state['players'].items():
@@ -1070,12 +1168,22 @@ class GameRenderer:
             angle = player['angle']
             is_player = (str(pid) == str(self.player_id))
             
-            self.draw_tank(x, y, angle, is_player)
-            self._draw_health_bar(x, y, player, is_player)
-        
-        for bullet in game_state['bullets']:
-            x, y = bullet['x'], bullet['y']
-            self._draw_bullet(x, y)
+            with profiler.stage('tanks'):
+                self.draw_tank(x, y, angle, is_player)
+            with profiler.stage('health_bars'):
+                self._draw_health_bar(x, y, player, is_player)
+        
+        with profiler.stage('bullets'):
+            if bullets is None:
+                bullets = [(b['x'], b['y']) for b in game_state.get('bullets', ())]
+            for x, y in bullets:
+                self._draw_bullet(x, y)
+
+    def draw_profiler_overlay(self):
+        """Vẽ overlay của profiler (nếu đang bật) lên trên cùng"""
+        rect = self.profiler.draw_overlay(self.screen, self.small_font)
+        if rect is not None:
+            self._mark_dirty(rect)
 
     def _draw_health_bar(self, x, y, player, is_player):
         """Vẽ thanh máu"""
@@ -1118,22 +1226,25 @@ class GameRenderer:
         
         # Text
         hp_text = f"{int(hp_percent * 100)}%"
-        text_surf = self.small_font.render(hp_text, True, self.colors['hud_text'])
+        text_surf = self._render_text(self.small_font, hp_text, True, self.colors['hud_text'])
         self.screen.blit(text_surf, (bar_x + bar_w//2 - text_surf.get_width()//2, 
                                    bar_y + bar_h//2 - text_surf.get_height()//2))
         
         # Name
         name = player.get('name', f'Player {player.get("id", "")}')
         name_color = self.colors['player'] if is_player else self.colors['hud_text']
-        name_surf = self.small_font.render(name, True, name_color)
+        name_surf = self._render_text(self.small_font, name, True, name_color)
         name_rect = name_surf.get_rect(center=(x, bar_y - 15))
         self.screen.blit(name_surf, name_rect)
+        
+        bar_rect = pygame.Rect(int(bar_x) - 3, int(bar_y) - 3, bar_w + 6, bar_h + 6)
+        self._mark_dirty(bar_rect.union(name_rect))
 
     def _draw_bullet(self, x, y):
         """Vẽ đạn"""
         radius = 6
         # Only draw a minimal bullet dot (no glow/trail)
-        pygame.draw.circle(self.screen, self.colors['energy'], (int(x), int(y)), radius)
+        self._mark_dirty(pygame.draw.circle(self.screen, self.colors['energy'], (int(x), int(y)), radius))
 
     def draw_hud(self, ammo_count, max_ammo, reloading, reload_start_time, last_fire_time, game_over):
         """Vẽ HUD"""
@@ -1141,9 +1252,14 @@ class GameRenderer:
         hud_x, hud_y = 20, 20
 
         # Background
-        hud_bg = pygame.Surface((hud_w, hud_h), pygame.SRCALPHA)
-        hud_bg.fill((*self.colors['hud_bg'][:3], 200))
-        self.screen.blit(hud_bg, (hud_x, hud_y))
+        hud_color = (*self.colors['hud_bg'][:3], 200)
+        
+        def build_bg():
+            hud_bg = pygame.Surface((hud_w, hud_h), pygame.SRCALPHA)
+            hud_bg.fill(hud_color)
+            return hud_bg
+        
+        self.screen.blit(self._cached_surface(('hud_bg', hud_w, hud_h, hud_color), build_bg), (hud_x, hud_y))
         
         # Border
         pygame.draw.rect(self.screen, self.colors['accent'], 
@@ -1152,25 +1268,31 @@ class GameRenderer:
         base_x, base_y = hud_x + 20, hud_y + 20
 
         # Ammo
-        ammo_text = self.small_font.render("AMMO", True, self.colors['hud_text'])
+        ammo_text = self._render_text(self.small_font, "AMMO", True, self.colors['hud_text'])
         self.screen.blit(ammo_text, (base_x, base_y - 18))
         
         # Bullet indicators
         bullet_r, bullet_gap = 6, 4
-        for i in range(max_ammo):
-            bx = base_x + i * (bullet_r * 2 + bullet_gap)
-            by = base_y
-            center = (bx + bullet_r, by + bullet_r)
-            
-            if i < ammo_count:
-                pygame.draw.circle(self.screen, self.colors['accent'], center, bullet_r)
-                pygame.draw.circle(self.screen, self.colors['energy'], center, bullet_r-2)
-            else:
-                pygame.draw.circle(self.screen, self.colors['muted'], center, bullet_r)
-                pygame.draw.circle(self.screen, self.colors['card_border'], center, bullet_r-2)
+        colors = self.colors
+        
+        def build_pips():
+            pips = pygame.Surface((max(1, max_ammo * (bullet_r * 2 + bullet_gap)), bullet_r * 2), pygame.SRCALPHA)
+            for i in range(max_ammo):
+                center = (i * (bullet_r * 2 + bullet_gap) + bullet_r, bullet_r)
+                if i < ammo_count:
+                    pygame.draw.circle(pips, colors['accent'], center, bullet_r)
+                    pygame.draw.circle(pips, colors['energy'], center, bullet_r-2)
+                else:
+                    pygame.draw.circle(pips, colors['muted'], center, bullet_r)
+                    pygame.draw.circle(pips, colors['card_border'], center, bullet_r-2)
+            return pips
+        
+        key = ('ammo_pips', ammo_count, max_ammo, colors['accent'], colors['energy'],
+               colors['muted'], colors['card_border'])
+        self.screen.blit(self._cached_surface(key, build_pips), (base_x, base_y))
         
         # Ammo count
-        ammo_count_text = self.font.render(f"{ammo_count}/{max_ammo}", True, self.colors['accent'])
+        ammo_count_text = self._render_text(self.font, f"{ammo_count}/{max_ammo}", True, self.colors['accent'])
         self.screen.blit(ammo_count_text, (base_x + 220, base_y))
 
         # Fire cooldown
@@ -1184,29 +1306,36 @@ class GameRenderer:
         else:
             status = "PRESS R TO RELOAD" if ammo_count == 0 and not game_over else "READY"
             color = self.colors['yellow'] if ammo_count == 0 else self.colors['green']
-            status_text = self.small_font.render(status, True, color)
+            status_text = self._render_text(self.small_font, status, True, color)
             self.screen.blit(status_text, (base_x + 210, base_y + 55))
 
         # Map info
-        map_text = self.font.render(f"MAP {self.current_map_id + 1}", True, self.colors['accent'])
-        self.screen.blit(map_text, (self.original_width - 150, hud_y + 20))
+        map_text = self._render_text(self.font, f"MAP {self.current_map_id + 1}", True, self.colors['accent'])
+        self._mark_dirty(self.screen.blit(map_text, (self.original_width - 150, hud_y + 20)))
+        self._mark_dirty(pygame.Rect(hud_x, hud_y, hud_w, hud_h))
 
     def _draw_cooldown_bar(self, x, y, width, height, progress, ready_text, cooldown_text):
         """Vẽ thanh cooldown"""
         # Background
         pygame.draw.rect(self.screen, self.colors['card_border'], (x, y, width, height), border_radius=6)
         
-        # Fill
-        if progress > 0:
-            fill_w = int(width * progress)
+        # Fill (gradient dựng sẵn theo độ rộng đã lấp đầy, tức mức tiến độ theo từng pixel)
+        fill_w = int(width * progress) if progress > 0 else 0
+        if fill_w > 0:
+            accent, energy = self.colors['accent'], self.colors['energy']
+            
+            def build_fill():
+                fill = pygame.Surface((fill_w, height))
+                for i in range(fill_w):
+                    ratio = i / fill_w
+                    r = int(accent[0] * ratio + energy[0] * (1-ratio))
+                    g = int(accent[1] * ratio + energy[1] * (1-ratio))
+                    b = int(accent[2] * ratio + energy[2] * (1-ratio))
+                    pygame.draw.rect(fill, (r, g, b), (i, 0, 1, height))
+                return fill
             
-            # Gradient
-            for i in range(fill_w):
-                ratio = i / fill_w
-                r = int(self.colors['accent'][0] * ratio + self.colors['energy'][0] * (1-ratio))
-                g = int(self.colors['accent'][1] * ratio + self.colors['energy'][1] * (1-ratio))
-                b = int(self.colors['accent'][2] * ratio + self.colors['energy'][2] * (1-ratio))
-                pygame.draw.rect(self.screen, (r, g, b), (x + i, y, 1, height))
+            fill = self._cached_surface(('cooldown_fill', fill_w, height, accent, energy), build_fill)
+            self.screen.blit(fill, (x, y))
         
         # Border
         pygame.draw.rect(self.screen, self.colors['accent'], (x, y, width, height), 1, border_radius=6)
@@ -1214,19 +1343,25 @@ class GameRenderer:
         # Text
         text = ready_text if progress >= 1.0 else cooldown_text
         color = self.colors['green'] if progress >= 1.0 else self.colors['muted']
-        text_surf = self.small_font.render(text, True, color)
+        text_surf = self._render_text(self.small_font, text, True, color)
         self.screen.blit(text_surf, (x + width + 10, y))
 
     def draw_game_over(self, winner_id, winner_name, waiting_for_restart):
         """Vẽ màn hình kết thúc game"""
+        self._untracked_frame()
         center_x, center_y = self._get_center()
 
         # Overlay
-        overlay = pygame.Surface((self.original_width, self.original_height), pygame.SRCALPHA)
-        for i in range(self.original_height):
-            alpha = int(200 * (i / self.original_height))
-            pygame.draw.line(overlay, (0, 0, 0, alpha), (0, i), (self.original_width, i))
-        self.screen.blit(overlay, (0, 0))
+        w, h = self.original_width, self.original_height
+        
+        def build_overlay():
+            overlay = pygame.Surface((w, h), pygame.SRCALPHA)
+            for i in range(h):
+                alpha = int(200 * (i / h))
+                pygame.draw.line(overlay, (0, 0, 0, alpha), (0, i), (w, i))
+            return overlay
+        
+        self.screen.blit(self._cached_surface(('game_over_overlay', w, h), build_overlay), (0, 0))
 
         box_w, box_h = 700, 350
         left, top = center_x - box_w//2, center_y - box_h//2
@@ -1254,15 +1389,15 @@ class GameRenderer:
                 details_text = f"{winner_name} was victorious"
 
         # Title
-        title_surf = self.big_font.render("BATTLE REPORT", True, self.colors['accent'])
+        title_surf = self._render_text(self.big_font, "BATTLE REPORT", True, self.colors['accent'])
         self.screen.blit(title_surf, title_surf.get_rect(center=(center_x, top + 60)))
 
         # Result
-        result_surf = self.big_font.render(result_text, True, result_color)
+        result_surf = self._render_text(self.big_font, result_text, True, result_color)
         self.screen.blit(result_surf, result_surf.get_rect(center=(center_x, top + 130)))
 
         # Details
-        details_surf = self.font.render(details_text, True, self.colors['hud_text'])
+        details_surf = self._render_text(self.font, details_text, True, self.colors['hud_text'])
         self.screen.blit(details_surf, details_surf.get_rect(center=(center_x, top + 180)))
 
         # Instructions
@@ -1273,17 +1408,146 @@ class GameRenderer:
             restart_text = "PRESS [T] TO DEPLOY AGAIN"
             restart_color = self.colors['accent']
 
-        restart_surf = self.font.render(restart_text, True, restart_color)
+        restart_surf = self._render_text(self.font, restart_text, True, restart_color)
         self.screen.blit(restart_surf, restart_surf.get_rect(center=(center_x, top + 230)))
 
         # Stats hint
-        stats_text = self.small_font.render("COMBAT STATISTICS AVAILABLE IN BARRACKS", True, self.colors['muted'])
+        stats_text = self._render_text(self.small_font, "COMBAT STATISTICS AVAILABLE IN BARRACKS", True, self.colors['muted'])
         self.screen.blit(stats_text, stats_text.get_rect(center=(center_x, top + 280)))
 
     def update_display(self):
         """Cập nhật màn hình"""
-        pygame.display.flip()
+        if self.dirty_rects_enabled and self._partial_frame:
+            # Cập nhật vùng cũ (đã xoá) và vùng mới (vừa vẽ)
+            pygame.display.update(self._prev_dirty_rects + self._dirty_rects)
+        else:
+            pygame.display.flip()
+        
+        if self.dirty_rects_enabled:
+            self._can_restore = self._frame_tracked
+            self._prev_dirty_rects = self._dirty_rects
+            self._dirty_rects = []
+            self._partial_frame = False
+            self._frame_tracked = False
 
     def cleanup(self):
         """Dọn dẹp tài nguyên"""
-        pygame.quit()
\ No newline at end of file
+        pygame.quit()
+
+class ReplayViewer:
+    """Xem lại log trận (python main.py replay FILE --view): state do ReplayRunner mô phỏng lại,
+    tua qua keyframe nên nhảy tới bất kỳ thời điểm nào cũng chỉ mô phỏng lại tối đa một khoảng keyframe.
+    SPACE tạm dừng, trái/phải lùi/tiến 5 giây, 0-9 nhảy tới 0%-90%, +/- đổi tốc độ, ESC thoát"""
+    TICK_RATE = 60
+    SEEK_STEP = 300
+    SPEEDS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0)
+
+    def __init__(self, path, renderer=None):
+        from server.replay import ReplayRunner
+        self.runner = ReplayRunner(path)
+        self.renderer = renderer or GameRenderer(os.path.basename(path))
+        self.position = float(self.runner.tick)
+        self.speed_index = self.SPEEDS.index(1.0)
+        self.paused = False
+        self.running = True
+
+    def seek(self, tick):
+        """Nhảy tới tick (giới hạn trong phạm vi của log)"""
+        runner = self.runner
+        tick = max(runner.first_tick, min(int(tick), runner.last_tick))
+        runner.seek(tick)
+        self.position = float(runner.tick)
+
+    def handle_events(self):
+        runner = self.runner
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
+                    self.running = False
+                elif event.key == pygame.K_SPACE:
+                    self.paused = not self.paused
+                elif event.key == pygame.K_LEFT:
+                    self.seek(runner.tick - self.SEEK_STEP)
+                elif event.key == pygame.K_RIGHT:
+                    self.seek(runner.tick + self.SEEK_STEP)
+                elif pygame.K_0 <= event.key <= pygame.K_9:
+                    fraction = (event.key - pygame.K_0) / 10.0
+                    self.seek(runner.first_tick + (runner.last_tick - runner.first_tick) * fraction)
+                elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                    self.speed_index = min(self.speed_index + 1, len(self.SPEEDS) - 1)
+                elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                    self.speed_index = max(self.speed_index - 1, 0)
+                elif event.key == pygame.K_F11:
+                    self.renderer.toggle_fullscreen()
+
+    def advance(self, dt):
+        """Chạy mô phỏng theo thời gian thực (nhân tốc độ phát)"""
+        runner = self.runner
+        if self.paused:
+            return
+        self.position += dt * self.TICK_RATE * self.SPEEDS[self.speed_index]
+        if int(self.position) > runner.tick:
+            runner.seek(int(self.position))
+        if runner.finished or runner.tick >= runner.last_tick:
+            self.position = float(runner.tick)
+            self.paused = True
+
+    def draw_timeline(self):
+        """Thanh thời gian ở cuối màn hình: vị trí hiện tại, các keyframe và tốc độ phát"""
+        renderer = self.renderer
+        runner = self.runner
+        screen = renderer.screen
+        width, height = screen.get_size()
+        span = max(1, runner.last_tick - runner.first_tick)
+        bar = pygame.Rect(20, height - 30, width - 40, 8)
+        pygame.draw.rect(screen, renderer.colors['muted'], bar, border_radius=4)
+        done = bar.copy()
+        done.width = int(bar.width * (runner.tick - runner.first_tick) / span)
+        pygame.draw.rect(screen, renderer.colors['accent'], done, border_radius=4)
+        for key_tick in runner.reader.index_ticks:
+            x = bar.x + int(bar.width * (key_tick - runner.first_tick) / span)
+            pygame.draw.line(screen, renderer.colors['hud_text'], (x, bar.y - 3), (x, bar.bottom + 2))
+
+        seconds = (runner.tick - runner.first_tick) / self.TICK_RATE
+        total = span / self.TICK_RATE
+        status = "PAUSED" if self.paused else f"x{self.SPEEDS[self.speed_index]:g}"
+        label = f"{int(seconds // 60)}:{int(seconds % 60):02d} / {int(total // 60)}:{int(total % 60):02d}  tick {runner.tick}  {status}"
+        text = renderer._render_text(renderer.small_font, label, True, renderer.colors['hud_text'])
+        screen.blit(text, (bar.x, bar.y - text.get_height() - 6))
+
+    def draw(self):
+        renderer = self.renderer
+        game_state = self.runner.engine.get_game_state()
+        map_id = game_state.get('map_id')
+        if map_id is not None and renderer.get_current_map_id() != map_id:
+            renderer.set_map(map_id)
+        renderer.draw_game_state(game_state)
+        self.draw_timeline()
+        renderer.update_display()
+
+    def run(self, start_tick=None):
+        renderer = self.renderer
+        renderer.initialize()
+        pygame.display.set_caption(f"Fire Tank - Replay {renderer.player_name}")
+        # Tô màu phe mình cho player đầu tiên trong log
+        players = self.runner.reader.initial_state.get('players', [])
+        renderer.player_id = players[0]['id'] if players else None
+        if start_tick is not None:
+            self.seek(start_tick)
+
+        clock = pygame.time.Clock()
+        last_time = time.perf_counter()
+        while self.running:
+            now = time.perf_counter()
+            dt = now - last_time
+            last_time = now
+            self.handle_events()
+            self.advance(dt)
+            renderer.update_animations(dt)
+            self.draw()
+            clock.tick(self.TICK_RATE)
+
+        self.runner.close()
+        renderer.cleanup()
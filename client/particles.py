@@ -0,0 +1,82 @@
+# Kho particle dạng struct-of-arrays dùng NumPy cho ParticleSystem
+import numpy as np
+
+# Thứ tự các hàng dữ liệu trong ParticlePool.data
+X, Y, VX, VY, LIFE, MAX_LIFE, SIZE, R, G, B, A, FADE = range(12)
+FIELD_COUNT = 12
+
+
+class ParticlePool:
+    """Kho particle dung lượng cố định: mỗi trường là một hàng liên tục trong mảng 2D.
+
+    Particle mới được gom vào hàng chờ và nạp theo lô ở lần update/draw kế tiếp.
+    Dữ liệu luôn được giữ theo thứ tự tuổi (cũ nhất ở đầu), nên khi vượt ngân sách
+    chỉ cần bỏ phần đầu mảng (loại particle cũ nhất trước).
+    """
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = np.zeros((FIELD_COUNT, capacity), dtype=np.float64)
+        self.count = 0
+        self.evicted = 0
+        self._pending = []
+
+    def add(self, x, y, vx, vy, lifetime, size, color, fade=True):
+        """Thêm particle; color có thể là (r, g, b) hoặc (r, g, b, a)"""
+        alpha = color[3] if len(color) == 4 else -1
+        self._pending.append((x, y, vx, vy, lifetime, lifetime, size,
+                              color[0], color[1], color[2], alpha, 1.0 if fade else 0.0))
+
+    def flush(self):
+        """Nạp các particle đang chờ vào mảng, loại particle cũ nhất nếu vượt dung lượng"""
+        pending = self._pending
+        if not pending:
+            return
+        self._pending = []
+
+        new = np.array(pending, dtype=np.float64).T
+        m = new.shape[1]
+        if m > self.capacity:
+            self.evicted += m - self.capacity
+            new = new[:, m - self.capacity:]
+            m = self.capacity
+
+        n = self.count
+        overflow = n + m - self.capacity
+        if overflow > 0:
+            self.data[:, :n - overflow] = self.data[:, overflow:n]
+            n -= overflow
+            self.evicted += overflow
+
+        self.data[:, n:n + m] = new
+        self.count = n + m
+
+    def update(self, dt):
+        """Cập nhật vị trí và thời gian sống, sau đó nén các particle còn sống về đầu mảng"""
+        self.flush()
+        n = self.count
+        if n == 0:
+            return
+
+        d = self.data
+        step = dt * 60
+        d[X, :n] += d[VX, :n] * step
+        d[Y, :n] += d[VY, :n] * step
+        d[LIFE, :n] -= dt
+
+        alive = d[LIFE, :n] > 0
+        k = int(np.count_nonzero(alive))
+        if k < n:
+            d[:, :k] = d[:, :n][:, alive]
+            self.count = k
+
+    def view(self):
+        """Trả về mảng (FIELD_COUNT, count) của các particle đang sống (không sao chép)"""
+        self.flush()
+        return self.data[:, :self.count]
+
+    def clear(self):
+        self._pending = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count + len(self._pending)
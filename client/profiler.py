@@ -0,0 +1,209 @@
+# Đo thời gian từng giai đoạn của frame phía client, overlay trong game và xuất CSV/JSON
+import csv
+import gc
+import json
+import time
+from collections import deque
+
+import pygame
+
+from common.stats import percentile
+
+
+class _NullStage:
+    """Stage rỗng dùng khi profiler tắt để không tốn chi phí đo"""
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stages = self.profiler._current
+        stages[self.name] = stages.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class FrameProfiler:
+    """Ghi thời gian mỗi frame theo giai đoạn (cộng dồn nếu gọi nhiều lần trong frame),
+    thời gian dừng của GC và tuổi của snapshot mạng đang vẽ.
+
+    Khi tắt, stage() trả về một context rỗng dùng chung nên gần như không tốn chi phí.
+    frames chỉ giữ history frame gần nhất cho overlay; enable(record=True) giữ thêm toàn bộ phiên để xuất.
+    """
+    OVERLAY_REFRESH = 0.25
+
+    def __init__(self, history=1800):
+        self.enabled = False
+        self.overlay_visible = False
+        self.frames = deque(maxlen=history)
+        self.recording = False
+        self.recorded = []
+        self.stage_names = []
+        self._current = {}
+        self._gc_time = 0.0
+        self._gc_start = None
+        self._snapshot_age = None
+        self._overlay = None
+        self._overlay_at = 0.0
+
+    def enable(self, record=False):
+        """record=True: giữ mọi frame từ lúc này để export() (không giới hạn như frames)"""
+        if record:
+            self.recording = True
+        if not self.enabled:
+            self.enabled = True
+            gc.callbacks.append(self._on_gc)
+
+    def disable(self):
+        if self.enabled:
+            self.enabled = False
+            if self._on_gc in gc.callbacks:
+                gc.callbacks.remove(self._on_gc)
+
+    def toggle_overlay(self):
+        """Bật/tắt overlay; profiler tự bật ghi khi overlay hiện"""
+        self.overlay_visible = not self.overlay_visible
+        if self.overlay_visible:
+            self.enable()
+        elif not self.recording:
+            # Không ai cần số liệu nữa: gỡ callback GC, stage() lại thành context rỗng
+            self.disable()
+        self._overlay = None
+
+    def _on_gc(self, phase, info):
+        if phase == 'start':
+            self._gc_start = time.perf_counter()
+        elif self._gc_start is not None:
+            self._gc_time += time.perf_counter() - self._gc_start
+            self._gc_start = None
+
+    def stage(self, name):
+        """Context manager đo một giai đoạn: with profiler.stage('draw_hud'): ..."""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def set_snapshot_age(self, age):
+        """Tuổi (giây) của snapshot mạng được vẽ trong frame này"""
+        self._snapshot_age = age
+
+    def end_frame(self, frame_time):
+        """Chốt số liệu của frame vừa xong (frame_time tính bằng giây)"""
+        if not self.enabled:
+            return
+        stages = self._current
+        for name in stages:
+            if name not in self.stage_names:
+                self.stage_names.append(name)
+        frame = {
+            'frame_ms': frame_time * 1000.0,
+            'stages': {k: v * 1000.0 for k, v in stages.items()},
+            'gc_ms': self._gc_time * 1000.0,
+            'snapshot_age_ms': None if self._snapshot_age is None else self._snapshot_age * 1000.0,
+        }
+        self.frames.append(frame)
+        if self.recording:
+            self.recorded.append(frame)
+        self._current = {}
+        self._gc_time = 0.0
+
+    def reset(self):
+        self.frames.clear()
+        self.recorded = []
+        self.stage_names = []
+        self._current = {}
+        self._gc_time = 0.0
+
+    def _session(self):
+        """Các frame được xuất: cả phiên nếu đang ghi, không thì các frame gần nhất"""
+        return self.recorded if self.recording else list(self.frames)
+
+    def summary(self, frames=None):
+        """Thống kê (ms): p50/p95/p99/max thời gian frame, trung bình/p95/p99 từng giai đoạn, GC và tuổi snapshot"""
+        frames = self._session() if frames is None else list(frames)
+        frame_ms = [f['frame_ms'] for f in frames]
+        result = {
+            'frames': len(frames),
+            'frame_ms': {
+                'p50': percentile(frame_ms, 50),
+                'p95': percentile(frame_ms, 95),
+                'p99': percentile(frame_ms, 99),
+                'max': max(frame_ms) if frame_ms else 0.0,
+            },
+            'stages': {},
+        }
+        for name in self.stage_names:
+            values = [f['stages'].get(name, 0.0) for f in frames]
+            result['stages'][name] = {
+                'mean': sum(values) / len(values) if values else 0.0,
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+            }
+        gc_ms = [f['gc_ms'] for f in frames]
+        result['gc_ms'] = {'total': sum(gc_ms), 'max': max(gc_ms) if gc_ms else 0.0,
+                           'frames_with_gc': sum(1 for v in gc_ms if v > 0)}
+        ages = [f['snapshot_age_ms'] for f in frames if f['snapshot_age_ms'] is not None]
+        result['snapshot_age_ms'] = {'p50': percentile(ages, 50), 'p95': percentile(ages, 95),
+                                     'max': max(ages) if ages else 0.0}
+        return result
+
+    def export(self, path):
+        """Xuất dữ liệu từng frame: .json (kèm summary) hoặc CSV cho các đuôi khác"""
+        if path.lower().endswith('.json'):
+            with open(path, 'w') as f:
+                json.dump({'summary': self.summary(), 'frames': self._session()}, f, indent=2)
+            return
+
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', 'frame_ms'] + self.stage_names + ['gc_ms', 'snapshot_age_ms'])
+            for i, frame in enumerate(self._session()):
+                age = frame['snapshot_age_ms']
+                writer.writerow([i, f"{frame['frame_ms']:.3f}"]
+                                + [f"{frame['stages'].get(name, 0.0):.3f}" for name in self.stage_names]
+                                + [f"{frame['gc_ms']:.3f}", '' if age is None else f"{age:.1f}"])
+
+    def draw_overlay(self, screen, font):
+        """Vẽ bảng số liệu ở góc phải trên; nội dung chỉ dựng lại mỗi OVERLAY_REFRESH giây.
+        Trả về Rect đã vẽ (hoặc None)"""
+        if not self.overlay_visible:
+            return None
+        now = time.perf_counter()
+        if self._overlay is None or now - self._overlay_at >= self.OVERLAY_REFRESH:
+            self._overlay = self._build_overlay(font)
+            self._overlay_at = now
+        rect = self._overlay.get_rect(topright=(screen.get_width() - 10, 10))
+        return screen.blit(self._overlay, rect)
+
+    def _build_overlay(self, font):
+        s = self.summary(self.frames)
+        fm = s['frame_ms']
+        lines = [f"frame p50 {fm['p50']:.1f}  p95 {fm['p95']:.1f}  p99 {fm['p99']:.1f} ms"]
+        for name, st in s['stages'].items():
+            lines.append(f"{name:<12} {st['mean']:6.2f}  p99 {st['p99']:6.2f}")
+        lines.append(f"gc max {s['gc_ms']['max']:.2f} ms ({s['gc_ms']['frames_with_gc']} frames)")
+        lines.append(f"snapshot age p95 {s['snapshot_age_ms']['p95']:.0f} ms")
+
+        rendered = [font.render(line, True, (230, 230, 230)) for line in lines]
+        width = max(r.get_width() for r in rendered) + 16
+        line_h = font.get_linesize()
+        panel = pygame.Surface((width, line_h * len(rendered) + 12), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 170))
+        for i, r in enumerate(rendered):
+            panel.blit(r, (8, 6 + i * line_h))
+        return panel
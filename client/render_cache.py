@@ -0,0 +1,224 @@
+# Các bộ đệm surface dùng chung cho GameRenderer
+from collections import OrderedDict
+
+import pygame
+
+from common.vectors import ANGLE_STEP, UNIT_VECTORS, quantize_angle
+
+
+class LRUCache:
+    """Bộ đệm LRU đơn giản có đếm hit/miss"""
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        item = self._items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return item
+
+    def put(self, key, value):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def clear(self):
+        self._items.clear()
+
+    def stats(self):
+        """Trả về số liệu hit/miss và kích thước hiện tại"""
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self._items)}
+
+    def __len__(self):
+        return len(self._items)
+
+
+class TankSpriteCache:
+    """Bộ đệm sprite xe tăng đã vẽ sẵn theo từng bước góc"""
+    TANK_SIZE = 40
+    # Nửa cạnh sprite: đủ chứa nòng súng dài 0.8 * TANK_SIZE ở mọi góc
+    HALF = 36
+
+    def __init__(self, maxsize=256):
+        self.cache = LRUCache(maxsize)
+
+    def get(self, palette, angle):
+        """Lấy sprite cho bảng màu (base, dark, highlight, logo) và góc (độ)"""
+        index = quantize_angle(angle)
+        key = (palette, index)
+        sprite = self.cache.get(key)
+        if sprite is None:
+            sprite = self.render(palette, index)
+            self.cache.put(key, sprite)
+        return sprite
+
+    def prewarm(self, palette):
+        """Vẽ sẵn tất cả các góc cho một kiểu xe tăng"""
+        for index in range(len(UNIT_VECTORS)):
+            self.get(palette, index * ANGLE_STEP)
+
+    def clear(self):
+        self.cache.clear()
+
+    def render(self, palette, index):
+        """Vẽ xe tăng bằng các khối hình học lên một surface SRCALPHA"""
+        base_color, dark_color, highlight_color, logo_color = palette
+        size = self.HALF * 2
+        surf = pygame.Surface((size, size), pygame.SRCALPHA)
+        x = y = self.HALF
+
+        tank_size = self.TANK_SIZE
+        tank_width = tank_size
+        tank_height = tank_size * 0.6
+
+        # Thân xe (hình chữ nhật bo góc)
+        body_rect = pygame.Rect(
+            int(x - tank_width/2), int(y - tank_height/2),
+            int(tank_width), int(tank_height)
+        )
+        pygame.draw.rect(surf, base_color, body_rect, border_radius=8)
+        pygame.draw.rect(surf, dark_color, body_rect, 2, border_radius=8)
+
+        # Tháp pháo
+        turret_radius = tank_size * 0.25
+        pygame.draw.circle(surf, base_color, (x, y), int(turret_radius))
+        pygame.draw.circle(surf, dark_color, (x, y), int(turret_radius), 2)
+
+        # Nòng súng
+        barrel_length = tank_size * 0.8
+        dx, dy = UNIT_VECTORS[index]
+        end_x = x + barrel_length * dx
+        end_y = y + barrel_length * dy
+        barrel_width = tank_size * 0.15
+        perpendicular = pygame.Vector2(-dy, dx) * (barrel_width/2)
+        barrel_points = [
+            (x + perpendicular.x, y + perpendicular.y),
+            (x - perpendicular.x, y - perpendicular.y),
+            (end_x - perpendicular.x, end_y - perpendicular.y),
+            (end_x + perpendicular.x, end_y + perpendicular.y)
+        ]
+        pygame.draw.polygon(surf, dark_color, barrel_points)
+        pygame.draw.polygon(surf, highlight_color, barrel_points, 1)
+
+        # Chi tiết trang trí trên thân xe
+        pygame.draw.line(surf, highlight_color,
+                         (x - tank_width/3, y - tank_height/4),
+                         (x + tank_width/3, y - tank_height/4), 2)
+        pygame.draw.line(surf, highlight_color,
+                         (x - tank_width/3, y + tank_height/4),
+                         (x + tank_width/3, y + tank_height/4), 2)
+
+        # Logo nhỏ trên tháp pháo
+        pygame.draw.circle(surf, logo_color, (x, y), int(turret_radius/2))
+        pygame.draw.circle(surf, dark_color, (x, y), int(turret_radius/2), 1)
+
+        # Chuyển sang định dạng pixel của màn hình nếu đã có display
+        if pygame.display.get_surface() is not None:
+            surf = surf.convert_alpha()
+        return surf
+
+
+class GlyphCache:
+    """Bộ đệm hình tròn SRCALPHA đã vẽ sẵn theo (màu, bán kính, mức alpha)"""
+    # 16 mức alpha: 0, 17, 34, ..., 255
+    ALPHA_STEP = 17
+
+    def __init__(self, maxsize=2048):
+        self.cache = LRUCache(maxsize)
+
+    def _bucket(self, alpha):
+        alpha = max(0, min(255, int(alpha)))
+        return int(round(alpha / self.ALPHA_STEP)) * self.ALPHA_STEP
+
+    def circle(self, color, radius, alpha):
+        """Hình tròn đặc bán kính radius trên surface (2r x 2r)"""
+        if len(color) == 4:
+            alpha = color[3]
+        key = ('circle', tuple(color[:3]), radius, self._bucket(alpha))
+        surf = self.cache.get(key)
+        if surf is None:
+            surf = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
+            pygame.draw.circle(surf, (*key[1], key[3]), (radius, radius), radius)
+            self.cache.put(key, surf)
+        return surf
+
+    def explosion(self, color, radius, alpha):
+        """Quả cầu nổ kèm vòng sóng xung kích, alpha sóng = 150/255 alpha chính"""
+        key = ('explosion', tuple(color[:3]), radius, self._bucket(alpha))
+        surf = self.cache.get(key)
+        if surf is None:
+            alpha = key[3]
+            surf = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
+            pygame.draw.circle(surf, (*key[1], alpha), (radius, radius), radius)
+            wave_color = (min(255, color[0] + 50),
+                          min(255, color[1] + 30),
+                          max(0, color[2] - 50),
+                          alpha * 150 // 255)
+            pygame.draw.circle(surf, wave_color, (radius, radius), int(radius * 1.3), 3)
+            self.cache.put(key, surf)
+        return surf
+
+    def clear(self):
+        self.cache.clear()
+
+
+class TextCache:
+    """Bộ đệm surface chữ theo (font, text, color, antialias)"""
+    def __init__(self, maxsize=512):
+        self.cache = LRUCache(maxsize)
+
+    def render(self, font, text, antialias, color):
+        """Cùng thứ tự tham số với font.render"""
+        key = (font, text, antialias, tuple(color))
+        surf = self.cache.get(key)
+        if surf is None:
+            surf = font.render(text, antialias, color)
+            self.cache.put(key, surf)
+        return surf
+
+    def stats(self):
+        return self.cache.stats()
+
+    def clear(self):
+        self.cache.clear()
+
+
+class BackgroundCache:
+    """Bộ đệm nền map theo (map, độ phân giải): bản đã scale đúng kích thước màn hình
+    và ảnh thu nhỏ cho màn hình chờ, cả hai đã convert sang định dạng pixel của display"""
+    THUMB_SIZE = (300, 180)
+
+    def __init__(self, maxsize=8):
+        self.cache = LRUCache(maxsize)
+
+    def get(self, map_id, source, size):
+        """Trả về (nền đã scale, thumbnail) cho map ở độ phân giải size"""
+        key = (map_id, id(source), tuple(size))
+        entry = self.cache.get(key)
+        if entry is None:
+            scaled = pygame.transform.scale(source, size)
+            thumb = pygame.transform.smoothscale(source, self.THUMB_SIZE)
+            entry = (self._convert(scaled), self._convert(thumb))
+            self.cache.put(key, entry)
+        return entry
+
+    def _convert(self, surf):
+        """Nền đục hoàn toàn dùng convert() (blit nhanh hơn), còn lại giữ kênh alpha"""
+        if pygame.display.get_surface() is None:
+            return surf
+        w, h = surf.get_size()
+        if not surf.get_flags() & pygame.SRCALPHA:
+            return surf.convert()
+        if pygame.mask.from_surface(surf, 254).count() == w * h:
+            return surf.convert()
+        return surf.convert_alpha()
+
+    def clear(self):
+        self.cache.clear()
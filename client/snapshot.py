@@ -0,0 +1,30 @@
+# Bàn giao game state từ thread mạng sang vòng lặp chính
+import time
+from collections import namedtuple
+
+# Một bản game state đã nhận: state (dict), thời điểm nhận và số thứ tự
+Snapshot = namedtuple('Snapshot', ['state', 'received_at', 'sequence'])
+
+
+class SnapshotBuffer:
+    """Bộ đệm đôi không khoá cho một writer (thread UDP) và một reader (vòng lặp chính).
+
+    Writer ghi vào slot sau rồi đổi chỉ số slot trước; phép gán chỉ số là nguyên tử
+    dưới GIL nên reader luôn thấy một Snapshot hoàn chỉnh, không bao giờ thấy state
+    đang được ghi dở.
+    """
+    def __init__(self):
+        self._slots = [None, None]
+        self._front = 0
+        self._sequence = 0
+
+    def publish(self, state):
+        """Gọi từ thread mạng khi có game state mới"""
+        self._sequence += 1
+        back = 1 - self._front
+        self._slots[back] = Snapshot(state, time.time(), self._sequence)
+        self._front = back
+
+    def latest(self):
+        """Snapshot mới nhất (hoặc None nếu chưa nhận được gì)"""
+        return self._slots[self._front]
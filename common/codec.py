@@ -0,0 +1,245 @@
+# Lớp mã hoá dùng chung cho client và server: chọn codec lúc chạy, thống nhất qua bắt tay TCP
+import json
+import struct
+
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+
+try:
+    import msgspec
+    HAVE_MSGSPEC = True
+except ImportError:
+    HAVE_MSGSPEC = False
+
+# Lỗi mà decode() có thể gây ra với dữ liệu hỏng (mọi codec); RecursionError khi mảng/dict lồng quá sâu
+DECODE_ERRORS = (ValueError, TypeError, IndexError, struct.error, RecursionError)
+if HAVE_MSGSPEC:
+    # msgspec.DecodeError không kế thừa ValueError
+    DECODE_ERRORS += (msgspec.DecodeError,)
+
+
+class JsonCodec:
+    """JSON của thư viện chuẩn (mặc định, client/server cũ chỉ hiểu codec này)"""
+    name = 'json'
+    # Byte đầu hợp lệ của một message (object) - dùng để loại gói rác trước khi giải mã
+    lead_bytes = frozenset(b'{')
+
+    def encode(self, obj):
+        return json.dumps(obj, separators=(',', ':')).encode()
+
+    def decode(self, data):
+        return json.loads(str(data, 'utf-8'))
+
+
+class OrjsonCodec:
+    """JSON qua orjson (C/Rust): cùng định dạng với JsonCodec nhưng nhanh hơn nhiều"""
+    name = 'orjson'
+    lead_bytes = frozenset(b'{')
+
+    def encode(self, obj):
+        return orjson.dumps(obj)
+
+    def decode(self, data):
+        return orjson.loads(data)
+
+
+class MsgspecCodec:
+    """MessagePack qua msgspec: nhị phân, nhỏ hơn JSON và mã hoá/giải mã bằng C"""
+    name = 'msgpack'
+    # fixmap, map16, map32
+    lead_bytes = frozenset(range(0x80, 0x90)) | {0xde, 0xdf}
+
+    def __init__(self):
+        self._encoder = msgspec.msgpack.Encoder()
+        self._decoder = msgspec.msgpack.Decoder()
+
+    def encode(self, obj):
+        return self._encoder.encode(obj)
+
+    def decode(self, data):
+        return self._decoder.decode(data)
+
+
+# Chuỗi hay gặp trong message của game (khoá và giá trị), mã hoá bằng 1 byte trong BinaryCodec.
+# Chỉ được thêm vào cuối để không đổi chỉ số đã dùng; tối đa 64 chuỗi
+BINARY_STRINGS = (
+    'id', 'x', 'y', 'angle', 'hp', 'ammo', 'name', 'ready', 'fire', 'reload', 'ammo_update',
+    'tick', 'players', 'bullet_events', 'bullets', 'game_over', 'winner_id', 'map_id',
+    's', 'd', 'hit', 'wall', 'end', 'reset', 'owner', 'speed', 'vx', 'vy', 'type', 'token',
+)
+
+_NONE, _FALSE, _TRUE = 0x00, 0x01, 0x02
+_I8, _I16, _I32, _I64, _F64 = 0x03, 0x04, 0x05, 0x06, 0x07
+_STR8, _STR16, _LIST8, _LIST16, _DICT8, _DICT16 = 0x08, 0x09, 0x0A, 0x0B, 0x0C, 0x0D
+_KNOWN = 0x40   # 0x40-0x7F: chuỗi thứ n trong BINARY_STRINGS
+_FIXINT = 0x80  # 0x80-0xFF: số nguyên 0..127
+
+_S_I8, _S_I16, _S_I32, _S_I64 = struct.Struct('<b'), struct.Struct('<h'), struct.Struct('<i'), struct.Struct('<q')
+_S_F64, _S_U16 = struct.Struct('<d'), struct.Struct('<H')
+# Tag và giá trị đóng gói cùng một lần pack
+_P_F64, _P_I8, _P_I16 = struct.Struct('<Bd'), struct.Struct('<Bb'), struct.Struct('<Bh')
+_P_I32, _P_I64, _P_U16 = struct.Struct('<Bi'), struct.Struct('<Bq'), struct.Struct('<BH')
+_FIXINTS = [bytes((_FIXINT | i,)) for i in range(128)]
+_NONE_B, _FALSE_B, _TRUE_B = bytes((_NONE,)), bytes((_FALSE,)), bytes((_TRUE,))
+
+
+class BinaryCodec:
+    """Định dạng nhị phân tự mô tả dựng bằng struct: mỗi giá trị có 1 byte tag, số nguyên nhỏ
+    và các chuỗi trong BINARY_STRINGS chỉ tốn 1 byte. Giữ nguyên kiểu int/float/bool/None như JSON"""
+    name = 'binary'
+    lead_bytes = frozenset((_DICT8, _DICT16))
+
+    def __init__(self):
+        self._known = {s: bytes((_KNOWN | i,)) for i, s in enumerate(BINARY_STRINGS)}
+
+    def encode(self, obj):
+        parts = []
+        self._encode(obj, parts.append)
+        return b''.join(parts)
+
+    def _encode(self, obj, out):
+        kind = type(obj)
+        if kind is str:
+            known = self._known.get(obj)
+            if known is not None:
+                out(known)
+                return
+            data = obj.encode('utf-8')
+            if len(data) < 256:
+                out(bytes((_STR8, len(data))))
+            else:
+                out(_P_U16.pack(_STR16, len(data)))
+            out(data)
+        elif kind is float:
+            out(_P_F64.pack(_F64, obj))
+        elif kind is int:
+            if 0 <= obj < 128:
+                out(_FIXINTS[obj])
+            elif -128 <= obj < 128:
+                out(_P_I8.pack(_I8, obj))
+            elif -32768 <= obj < 32768:
+                out(_P_I16.pack(_I16, obj))
+            elif -2147483648 <= obj < 2147483648:
+                out(_P_I32.pack(_I32, obj))
+            else:
+                out(_P_I64.pack(_I64, obj))
+        elif kind is dict:
+            count = len(obj)
+            out(bytes((_DICT8, count)) if count < 256 else _P_U16.pack(_DICT16, count))
+            encode = self._encode
+            for key, value in obj.items():
+                encode(key, out)
+                encode(value, out)
+        elif kind is list or kind is tuple:
+            count = len(obj)
+            out(bytes((_LIST8, count)) if count < 256 else _P_U16.pack(_LIST16, count))
+            encode = self._encode
+            for value in obj:
+                encode(value, out)
+        elif obj is None:
+            out(_NONE_B)
+        elif kind is bool:
+            out(_TRUE_B if obj else _FALSE_B)
+        else:
+            raise TypeError(f"BinaryCodec không mã hoá được kiểu {kind.__name__}")
+
+    def decode(self, data):
+        value, offset = self._decode(data, 0)
+        if offset != len(data):
+            raise ValueError("Dữ liệu thừa sau message")
+        return value
+
+    def _decode(self, data, offset):
+        tag = data[offset]
+        offset += 1
+        if tag >= _FIXINT:
+            return tag & 0x7F, offset
+        if tag >= _KNOWN:
+            return BINARY_STRINGS[tag & 0x3F], offset
+        if tag == _F64:
+            return _S_F64.unpack_from(data, offset)[0], offset + 8
+        if tag == _STR8 or tag == _STR16:
+            if tag == _STR8:
+                length = data[offset]
+                offset += 1
+            else:
+                length = _S_U16.unpack_from(data, offset)[0]
+                offset += 2
+            end = offset + length
+            if end > len(data):
+                raise ValueError("Chuỗi bị cắt cụt")
+            return str(data[offset:end], 'utf-8'), end
+        if tag == _DICT8 or tag == _DICT16:
+            if tag == _DICT8:
+                count = data[offset]
+                offset += 1
+            else:
+                count = _S_U16.unpack_from(data, offset)[0]
+                offset += 2
+            result = {}
+            decode = self._decode
+            for _ in range(count):
+                key, offset = decode(data, offset)
+                result[key], offset = decode(data, offset)
+            return result, offset
+        if tag == _LIST8 or tag == _LIST16:
+            if tag == _LIST8:
+                count = data[offset]
+                offset += 1
+            else:
+                count = _S_U16.unpack_from(data, offset)[0]
+                offset += 2
+            result = []
+            decode = self._decode
+            for _ in range(count):
+                value, offset = decode(data, offset)
+                result.append(value)
+            return result, offset
+        if tag == _NONE:
+            return None, offset
+        if tag == _FALSE:
+            return False, offset
+        if tag == _TRUE:
+            return True, offset
+        if tag == _I8:
+            return _S_I8.unpack_from(data, offset)[0], offset + 1
+        if tag == _I16:
+            return _S_I16.unpack_from(data, offset)[0], offset + 2
+        if tag == _I32:
+            return _S_I32.unpack_from(data, offset)[0], offset + 4
+        if tag == _I64:
+            return _S_I64.unpack_from(data, offset)[0], offset + 8
+        raise ValueError(f"Tag không hợp lệ: {tag:#x}")
+
+
+def _available():
+    codecs = {'json': JsonCodec(), 'binary': BinaryCodec()}
+    if HAVE_ORJSON:
+        codecs['orjson'] = OrjsonCodec()
+    if HAVE_MSGSPEC:
+        codecs['msgpack'] = MsgspecCodec()
+    return codecs
+
+
+CODECS = _available()
+JSON = CODECS['json']
+# Thứ tự ưu tiên mặc định khi client đề xuất: codec C trước, JSON thuần Python cuối cùng
+# (binary nhỏ hơn JSON nhưng mã hoá bằng Python nên chỉ dùng khi được chọn rõ ràng)
+DEFAULT_PREFERENCE = [name for name in ('msgpack', 'orjson', 'json') if name in CODECS]
+
+
+def get_codec(name):
+    """Codec theo tên; tên không biết (hoặc chưa cài thư viện) thì dùng JSON"""
+    return CODECS.get(name, JSON)
+
+
+def negotiate(offered):
+    """Server chọn codec đầu tiên trong danh sách client đề xuất mà mình hỗ trợ"""
+    if isinstance(offered, list):
+        for name in offered:
+            if isinstance(name, str) and name in CODECS:
+                return CODECS[name]
+    return JSON
@@ -19,6 +19,7 @@ class GameConstants:
     SCREEN_HEIGHT = 600
     TCP_PORT = 5555
     UDP_PORT = 5556
+    METRICS_PORT = 9108  # HTTP /metrics của server (chỉ lắng nghe 127.0.0.1)
     MAX_PLAYERS = 2
     FIRE_COOLDOWN = 0.5
     RELOAD_DURATION = 7.0
@@ -0,0 +1,12 @@
+# Hàm thống kê nhỏ dùng chung cho profiler và benchmark
+
+
+def percentile(values, q):
+    """Phân vị q (0-100) theo nội suy tuyến tính; 0.0 nếu không có dữ liệu"""
+    if not values:
+        return 0.0
+    data = sorted(values)
+    pos = (len(data) - 1) * q / 100.0
+    lo = int(pos)
+    hi = min(lo + 1, len(data) - 1)
+    return data[lo] + (data[hi] - data[lo]) * (pos - lo)
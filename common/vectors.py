@@ -0,0 +1,21 @@
+# Bảng vector đơn vị dựng sẵn cho các góc xoay của xe tăng và đạn
+import math
+
+# Góc xoay thay đổi theo bước 5 độ (xem TankGame.handle_movement)
+ANGLE_STEP = 5
+ANGLE_STEPS = 360 // ANGLE_STEP
+
+UNIT_VECTORS = tuple(
+    (math.cos(math.radians(i * ANGLE_STEP)), math.sin(math.radians(i * ANGLE_STEP)))
+    for i in range(ANGLE_STEPS)
+)
+
+
+def quantize_angle(angle):
+    """Trả về chỉ số bước góc gần nhất (0..ANGLE_STEPS-1) của góc tính bằng độ"""
+    return int(round(angle / ANGLE_STEP)) % ANGLE_STEPS
+
+
+def unit_vector(angle):
+    """Lấy (cos, sin) của góc (độ) từ bảng dựng sẵn thay vì gọi math.cos/math.sin"""
+    return UNIT_VECTORS[int(round(angle / ANGLE_STEP)) % ANGLE_STEPS]
@@ -11,6 +11,8 @@ CREATE TABLE IF NOT EXISTS players (
     total_damage_dealt INT DEFAULT 0,
     total_shots_fired INT DEFAULT 0,
     accuracy DECIMAL(5,2) DEFAULT 0.0,
+    rating DOUBLE DEFAULT 1500,
+    rated_games INT DEFAULT 0,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     last_login TIMESTAMP NULL
@@ -50,4 +52,5 @@ CREATE TABLE IF NOT EXISTS player_stats (
 -- Thêm index để tối ưu truy vấn
 CREATE INDEX idx_players_username ON players(username);
 CREATE INDEX idx_game_sessions_created ON game_sessions(created_at);
-CREATE INDEX idx_player_stats_player ON player_stats(player_id);
\ No newline at end of file
+CREATE INDEX idx_player_stats_player ON player_stats(player_id);
+CREATE INDEX idx_players_rating ON players(rating);
\ No newline at end of file
@@ -5,22 +5,37 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 def main():
     if len(sys.argv) < 2:
-        print("Usage: python main.py [server|client]")
+        print("Usage: python main.py [server [--record DIR] [--metrics-port N]|client|bench-engine|replay FILE]")
         return
 
     mode = sys.argv[1]
     
     if mode == "server":
         from server.server import TankServer
-        server = TankServer()
+        from common.messages import GameConstants
+        record_dir = None
+        if "--record" in sys.argv[2:]:
+            index = sys.argv.index("--record")
+            record_dir = sys.argv[index + 1] if index + 1 < len(sys.argv) else "recordings"
+        metrics_port = GameConstants.METRICS_PORT
+        if "--metrics-port" in sys.argv[2:]:
+            index = sys.argv.index("--metrics-port")
+            metrics_port = int(sys.argv[index + 1])
+        server = TankServer(record_dir=record_dir, metrics_port=metrics_port)
         server.start()
     elif mode == "client":
         from client.client import TankGame
         game = TankGame()
         game.connect()
         game.run()
+    elif mode == "bench-engine":
+        from benchmarks.engine_bench import main as bench_engine
+        sys.exit(bench_engine(sys.argv[2:]))
+    elif mode == "replay":
+        from server.replay import main as replay
+        sys.exit(replay(sys.argv[2:]))
     else:
-        print("Invalid mode. Use 'server' or 'client'")
+        print("Invalid mode. Use 'server', 'client', 'bench-engine' or 'replay'")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
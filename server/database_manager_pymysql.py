@@ -120,6 +120,8 @@ class DatabaseManager:
                         total_damage_dealt INT DEFAULT 0,
                         total_shots_fired INT DEFAULT 0,
                         accuracy DECIMAL(5,2) DEFAULT 0.0,
+                        rating DOUBLE DEFAULT 1500,
+                        rated_games INT DEFAULT 0,
                         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                         updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
                         last_login TIMESTAMP NULL
@@ -174,6 +176,34 @@ class DatabaseManager:
         except pymysql.Error as e:
             print(f" Lỗi tạo tables: {e}")
 
+        self._migrate_rating_columns()
+
+    def _migrate_rating_columns(self):
+        """Thêm cột rating cho CSDL tạo trước khi có ghép trận (dùng information_schema, chạy được cả MySQL lẫn MariaDB)"""
+        columns = (("rating", "DOUBLE DEFAULT 1500"), ("rated_games", "INT DEFAULT 0"))
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute(
+                    """SELECT COLUMN_NAME FROM information_schema.COLUMNS
+                       WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'players'"""
+                )
+                existing = {row['COLUMN_NAME'] for row in cursor.fetchall()}
+                for name, definition in columns:
+                    if name not in existing:
+                        cursor.execute(f"ALTER TABLE players ADD COLUMN {name} {definition}")
+                        print(f" Đã thêm cột players.{name}")
+
+                cursor.execute(
+                    """SELECT 1 FROM information_schema.STATISTICS
+                       WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'players'
+                         AND INDEX_NAME = 'idx_players_rating'"""
+                )
+                if not cursor.fetchone():
+                    cursor.execute("CREATE INDEX idx_players_rating ON players(rating)")
+            self.connection.commit()
+        except pymysql.Error as e:
+            print(f" Lỗi thêm cột rating: {e}")
+
     def hash_password(self, password: str) -> str:
         """Hash mật khẩu với salt"""
         salt = secrets.token_hex(16)
@@ -322,6 +352,37 @@ class DatabaseManager:
         except pymysql.Error as e:
             print(f"Error updating player stats: {e}")
 
+    def get_player_rating(self, player_id: int) -> Tuple[float, int]:
+        """Lấy rating và số trận đã tính rating (mặc định cho người chơi mới hoặc khi lỗi CSDL)"""
+        if not self.connection:
+            return 1500.0, 0
+
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.execute("SELECT rating, rated_games FROM players WHERE id = %s", (player_id,))
+                row = cursor.fetchone()
+            if not row or row['rating'] is None:
+                return 1500.0, 0
+            return float(row['rating']), int(row['rated_games'] or 0)
+        except pymysql.Error as e:
+            print(f"Error getting player rating: {e}")
+            return 1500.0, 0
+
+    def update_ratings(self, ratings: List[Tuple[int, float]]):
+        """Lưu rating mới sau một trận cho từng (player_id, rating) trong một transaction"""
+        if not self.connection:
+            return
+
+        try:
+            with self.connection.cursor() as cursor:
+                cursor.executemany(
+                    "UPDATE players SET rating = %s, rated_games = rated_games + 1 WHERE id = %s",
+                    [(rating, player_id) for player_id, rating in ratings]
+                )
+            self.connection.commit()
+        except pymysql.Error as e:
+            print(f"Error updating ratings: {e}")
+
     def get_player_profile(self, player_id: int) -> Optional[Dict]:
         """Lấy thông tin profile người chơi"""
         if not self.connection:
@@ -332,7 +393,7 @@ class DatabaseManager:
                 cursor.execute(
                     """SELECT id, username, name, games_played, games_won, 
                               total_damage_dealt, total_shots_fired, accuracy,
-                              created_at, last_login
+                              rating, rated_games, created_at, last_login
                        FROM players WHERE id = %s""",
                     (player_id,)
                 )
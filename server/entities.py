@@ -0,0 +1,68 @@
+# Bản ghi thực thể gọn (__slots__) cho GameEngine: trạng thái mô phỏng tách khỏi thông tin kết nối
+from common.messages import GameConstants
+
+
+class PlayerState:
+    """Trạng thái mô phỏng của một player (các trường nóng được đọc/ghi mỗi tick)"""
+    __slots__ = ('x', 'y', 'angle', 'hp', 'ammo', 'ready', 'name')
+
+    def __init__(self, x, y, name):
+        self.x = x
+        self.y = y
+        self.angle = 0
+        self.hp = GameConstants.PLAYER_HP
+        self.ammo = GameConstants.MAX_AMMO
+        self.ready = False
+        self.name = name
+
+    def reset(self, x, y):
+        """Đặt lại vị trí và chỉ số khi bắt đầu ván mới"""
+        self.x = x
+        self.y = y
+        self.angle = 0
+        self.hp = GameConstants.PLAYER_HP
+        self.ammo = GameConstants.MAX_AMMO
+        self.ready = False
+
+
+class PlayerConnection:
+    """Thông tin kết nối của player, không tham gia mô phỏng"""
+    __slots__ = ('tcp_socket', 'udp_address')
+
+    def __init__(self, tcp_socket, udp_address):
+        self.tcp_socket = tcp_socket
+        self.udp_address = udp_address
+
+
+class PlayerStats:
+    """Thống kê trong trận của player"""
+    __slots__ = ('damage_dealt', 'shots_fired', 'shots_hit', 'reloads_count', 'survival_time')
+
+    def __init__(self):
+        self.damage_dealt = 0
+        self.shots_fired = 0
+        self.shots_hit = 0
+        self.reloads_count = 0
+        self.survival_time = 0
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Bullet:
+    """Một viên đạn: vận tốc (vx, vy) được tính một lần khi bắn"""
+    __slots__ = ('id', 'x', 'y', 'angle', 'speed', 'vx', 'vy', 'owner', 'tick')
+
+    def __init__(self, bullet_id, x, y, angle, speed, vx, vy, owner, tick):
+        self.id = bullet_id
+        self.x = x
+        self.y = y
+        self.angle = angle
+        self.speed = speed
+        self.vx = vx
+        self.vy = vy
+        self.owner = owner
+        self.tick = tick
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
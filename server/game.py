@@ -1,12 +1,64 @@
+import functools
 import math
+import os
+import threading
 import time
 import random 
+from collections import deque
 from common.messages import GameConstants
+from common.vectors import unit_vector
+from server.entities import Bullet, PlayerConnection, PlayerState, PlayerStats
+from server.match_log import MatchRecorder
+
+# Các trường của player được gửi cho client trong game_state
+PUBLIC_PLAYER_FIELDS = ('x', 'y', 'angle', 'hp', 'ammo', 'name', 'ready')
+
+# Bán kính va chạm đạn - xe tăng (so sánh bình phương khoảng cách)
+HIT_RADIUS_SQ = 25 * 25
+
+
+def _is_number(value):
+    return (type(value) is int or type(value) is float) and math.isfinite(value)
+
+
+def _valid_input(message):
+    """Input từ mạng có đúng kiểu dữ liệu không (tránh một gói hỏng làm lỗi cả tick)"""
+    if 'x' in message and 'y' in message and 'angle' in message:
+        if not (_is_number(message['x']) and _is_number(message['y']) and _is_number(message['angle'])):
+            return False
+    if 'ammo_update' in message:
+        ammo = message['ammo_update']
+        if type(ammo) is not int or not 0 <= ammo <= GameConstants.MAX_AMMO:
+            return False
+    return True
+
+
+def _synchronized(method):
+    """Chạy method dưới khoá của engine: input từ thread UDP/TCP không xen vào giữa một tick,
+    nên thứ tự ghi trong log trận đúng bằng thứ tự thực thi"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
 class GameEngine:
+    # Số tick giữ lại sự kiện đạn cho các consumer đọc chậm
+    EVENT_HISTORY_TICKS = 120
+    # Mỗi snapshot gửi lại sự kiện đạn của chừng này tick gần nhất để chịu được mất gói UDP
+    REPLICATION_WINDOW = 30
+    # Khoảng cách giữa các keyframe trong log trận (5 giây): tua chỉ cần mô phỏng lại tối đa chừng này tick
+    KEYFRAME_INTERVAL = 300
+    # Số input tối đa chờ trong hàng đợi của mỗi player; đầy thì bỏ input cũ nhất
+    INPUT_QUEUE_LIMIT = 32
+
     def __init__(self):
+        # player_id -> PlayerState (mô phỏng) và PlayerConnection (socket, địa chỉ UDP)
         self.players = {}
+        self.connections = {}
         self.bullets = []
+        # game_state được cập nhật tại chỗ: players chứa dict công khai của từng player
+        # (tạo một lần), bullets là các dict công khai được tái sử dụng theo vị trí
         self.game_state = {
             'players': {}, 
             'bullets': [], 
@@ -14,12 +66,29 @@ class GameEngine:
             'winner_id': None,
             'map_id': 0 
         }
+        self._bullet_view_pool = []
+        self.tick = 0
+        self.next_bullet_id = 1
+        # Tick gần nhất mỗi trường công khai của player thay đổi (cờ dirty theo trường)
+        self.field_ticks = {}
+        # Sự kiện (tick, loại, dữ liệu): 'spawn' -> (bullet_id, x, y, angle, owner),
+        # 'despawn' -> (bullet_id, lý do, player trúng đạn), 'leave' -> player_id
+        self.events = deque()
         self.ready_players = set()
         self.restart_requests = set()
         self.game_started = False
         self.current_session_id = None
         self.game_start_time = 0
-        self.player_stats = {}  # Theo dõi thống kê player
+        self.player_stats = {}  # Theo dõi thống kê player (PlayerStats)
+        
+        self.lock = threading.RLock()
+        # Input chờ áp dụng ở đầu tick kế tiếp (deque giới hạn, tự bỏ phần tử cũ nhất khi đầy)
+        self.input_queues = {}
+        self.input_drops = {}
+        self.input_batch = {}  # số input mỗi player đã áp dụng ở tick gần nhất
+        # Ghi log trận (server/match_log.py): record_dir khác None thì mỗi trận tự ghi một file
+        self.recorder = None
+        self.record_dir = None
         
         # Random map ngay khi khởi tạo
         self.current_map = random.randint(0, GameConstants.MAP_COUNT - 1)
@@ -41,106 +110,169 @@ class GameEngine:
         print(f"Map selected. Old map: {old_map}, New map: {self.current_map}")
 
 
+    @_synchronized
     def add_player(self, player_id, udp_address, tcp_socket, player_name="Player"):
         """Thêm player mới vào game"""
         
         # Spawn player dựa trên SỐ LƯỢNG player
         spawn_x = 100 if len(self.players) == 0 else 700
         
-        self.players[player_id] = {
-            'tcp_socket': tcp_socket,
-            'udp_address': udp_address,
-            'x': spawn_x, 
-            'y': 300,
-            'angle': 0,
-            'hp': GameConstants.PLAYER_HP,
-            'ammo': GameConstants.MAX_AMMO,
-            'ready': False,
-            'name': f"{player_name} ({player_id})" 
-        }
+        player = PlayerState(spawn_x, 300, f"{player_name} ({player_id})")
+        self.players[player_id] = player
+        self.connections[player_id] = PlayerConnection(tcp_socket, udp_address)
+        
+        # Bản công khai trong game_state: không sửa tại chỗ dict đã phát ra, luôn thay bằng dict mới
+        players = dict(self.game_state['players'])
+        players[player_id] = {f: getattr(player, f) for f in PUBLIC_PLAYER_FIELDS}
+        self.game_state['players'] = players
+        self.field_ticks[player_id] = {f: self.tick for f in PUBLIC_PLAYER_FIELDS}
         
         # Khởi tạo stats
-        self.player_stats[player_id] = {
-            'damage_dealt': 0,
-            'shots_fired': 0,
-            'shots_hit': 0,
-            'reloads_count': 0,
-            'survival_time': 0
-        }
+        self.player_stats[player_id] = PlayerStats()
+        self.input_queues[player_id] = deque(maxlen=self.INPUT_QUEUE_LIMIT)
+        self.input_drops.setdefault(player_id, 0)
+        if self.recorder:
+            self.recorder.join(player_id, player_name)
         
+    @_synchronized
     def update_player_name(self, player_id, name):
         """Cập nhật tên người chơi sau khi xác thực"""
         if player_id in self.players:
-            self.players[player_id]['name'] = name
+            self.players[player_id].name = name
+            if self.recorder:
+                self.recorder.name(player_id, name)
 
+    def set_player_udp_address(self, player_id, address):
+        """Cập nhật địa chỉ UDP của player (phòng khi bị thay đổi)"""
+        connection = self.connections.get(player_id)
+        if connection is not None:
+            connection.udp_address = address
 
+
+    @_synchronized
+    def queue_input(self, player_id, message):
+        """Đưa input vào hàng đợi của player; được áp dụng theo thứ tự ở đầu tick kế tiếp"""
+        queue = self.input_queues.get(player_id)
+        if queue is None:
+            return False
+        if not _valid_input(message):
+            self.input_drops[player_id] += 1
+            return False
+        if len(queue) == queue.maxlen:
+            self.input_drops[player_id] += 1
+        queue.append(message)
+        return True
+
+    def _apply_inputs(self):
+        """Áp dụng toàn bộ input đang chờ, từng player theo thứ tự nhận"""
+        batch = self.input_batch
+        batch.clear()
+        players = self.players
+        recorder = self.recorder
+        for player_id, queue in self.input_queues.items():
+            if not queue:
+                continue
+            batch[player_id] = len(queue)
+            player = players[player_id]
+            while queue:
+                message = queue.popleft()
+                try:
+                    if recorder:
+                        recorder.input(player_id, message)
+                    self._apply_input(player_id, player, message)
+                except Exception as e:
+                    # Bỏ input lỗi, không để nó chặn input của player khác và cả tick
+                    self.input_drops[player_id] += 1
+                    print(f"Bỏ input lỗi của player {player_id}: {e}")
+
+    @_synchronized
     def process_player_message(self, player_id, message):
-        """Xử lý message từ player và cập nhật thống kê"""
-        if player_id not in self.players:
+        """Áp dụng ngay một message của player (không qua hàng đợi) và cập nhật thống kê"""
+        if player_id not in self.players or not _valid_input(message):
             return
-        
-        player = self.players[player_id]
-        
+        if self.recorder:
+            self.recorder.input(player_id, message)
+        self._apply_input(player_id, self.players[player_id], message)
+
+    def _apply_input(self, player_id, player, message):
         # Cập nhật vị trí
         if 'x' in message and 'y' in message and 'angle' in message:
-            player['x'] = max(20, min(GameConstants.SCREEN_WIDTH - 20, message['x']))
-            player['y'] = max(20, min(GameConstants.SCREEN_HEIGHT - 20, message['y']))
-            player['angle'] = message['angle']
+            player.x = max(20, min(GameConstants.SCREEN_WIDTH - 20, message['x']))
+            player.y = max(20, min(GameConstants.SCREEN_HEIGHT - 20, message['y']))
+            player.angle = message['angle']
         
         # Xử lý bắn đạn
-        if message.get('fire') and player['ammo'] > 0 and not self.game_state['game_over']:
-            player['ammo'] -= 1
-            self.bullets.append({
-                'x': player['x'],
-                'y': player['y'],
-                'angle': player['angle'],
-                'speed': GameConstants.BULLET_SPEED,
-                'owner': player_id
-            })
+        if message.get('fire') and player.ammo > 0 and not self.game_state['game_over']:
+            player.ammo -= 1
+            # Vector vận tốc được tính một lần khi bắn, không tính lại mỗi tick
+            dx, dy = unit_vector(player.angle)
+            speed = GameConstants.BULLET_SPEED
+            # Tick đầu tiên viên đạn bay là tick kế tiếp
+            bullet = Bullet(self.next_bullet_id, player.x, player.y, player.angle, speed,
+                            dx * speed, dy * speed, player_id, self.tick + 1)
+            self.next_bullet_id += 1
+            self.bullets.append(bullet)
+            self.events.append((bullet.tick, 'spawn', (bullet.id, bullet.x, bullet.y,
+                                                       bullet.angle, player_id)))
             if player_id in self.player_stats: 
-                self.player_stats[player_id]['shots_fired'] += 1
+                self.player_stats[player_id].shots_fired += 1
         
         # Xử lý reload (do client tự quản lý)
         if message.get('reload'):
             if player_id in self.player_stats:
-                self.player_stats[player_id]['reloads_count'] += 1
+                self.player_stats[player_id].reloads_count += 1
         
         # Cập nhật ammo (khi client reload xong)
         if 'ammo_update' in message:
-            player['ammo'] = message['ammo_update']
+            player.ammo = message['ammo_update']
 
     def _check_collisions(self):
         """Kiểm tra va chạm đạn với người chơi và theo dõi sát thương"""
-        for bullet in self.bullets[:]:
+        bullets = self.bullets
+        # Chỉ xét các viên đạn có từ đầu tick
+        count = len(bullets)
+        keep = 0
+        for i in range(count):
+            bullet = bullets[i]
+            hit = False
+            bx, by, owner = bullet.x, bullet.y, bullet.owner
             for pid, player in self.players.items():
-                if pid != bullet['owner']:
-                    distance = math.sqrt((bullet['x'] - player['x'])**2 + 
-                                         (bullet['y'] - player['y'])**2)
-                    if distance < 25:  # Va chạm
-                        player['hp'] -= GameConstants.BULLET_DAMAGE
+                if pid != owner:
+                    dx = bx - player.x
+                    dy = by - player.y
+                    if dx * dx + dy * dy < HIT_RADIUS_SQ:  # Va chạm
+                        player.hp -= GameConstants.BULLET_DAMAGE
                         
-                        owner = bullet.get('owner')
                         if owner in self.player_stats:
                             owner_stats = self.player_stats[owner]
-                            owner_stats['damage_dealt'] += GameConstants.BULLET_DAMAGE
-                            owner_stats['shots_hit'] += 1
+                            owner_stats.damage_dealt += GameConstants.BULLET_DAMAGE
+                            owner_stats.shots_hit += 1
                         
-                        if bullet in self.bullets:
-                            self.bullets.remove(bullet)
+                        hit = True
+                        self._despawn(bullet, 'hit', pid)
                         
-                        if player['hp'] <= 0:
-                            self._end_game(winner_id=bullet['owner'])
+                        if player.hp <= 0:
+                            self._end_game(winner_id=owner)
                         break 
+            if not hit:
+                bullets[keep] = bullet
+                keep += 1
+        # Nén danh sách tại chỗ, giữ nguyên đạn do thread UDP thêm vào
+        del bullets[keep:count]
+
+    def _despawn(self, bullet, reason, target=None):
+        """Ghi sự kiện đạn biến mất: 'hit' (kèm player trúng đạn), 'wall', 'end' hoặc 'reset'"""
+        self.events.append((self.tick, 'despawn', (bullet.id, reason, target)))
 
     def get_player_stats(self, player_id):
         """Lấy thống kê của player"""
         if player_id not in self.player_stats:
-            self.player_stats[player_id] = { 'damage_dealt': 0, 'shots_fired': 0, 'shots_hit': 0, 'reloads_count': 0, 'survival_time': 0 }
+            self.player_stats[player_id] = PlayerStats()
             
-        stats = self.player_stats[player_id].copy()
+        stats = self.player_stats[player_id].to_dict()
         
         if player_id in self.players:
-            stats['final_hp'] = self.players[player_id]['hp']
+            stats['final_hp'] = self.players[player_id].hp
         else:
             stats['final_hp'] = 0 
             
@@ -157,17 +289,28 @@ class GameEngine:
             return 0
             
         stats = self.player_stats[player_id]
-        score = (stats['damage_dealt'] * 2 + 
-                 stats['shots_hit'] * 10 + 
-                 self.players[player_id]['hp'])
+        score = (stats.damage_dealt * 2 + 
+                 stats.shots_hit * 10 + 
+                 self.players[player_id].hp)
         return score
 
     
 
+    @_synchronized
     def remove_player(self, player_id):
         """Xóa player khỏi game"""
         if player_id in self.players:
             del self.players[player_id]
+            self.input_queues.pop(player_id, None)
+            self.input_batch.pop(player_id, None)
+            self.events.append((self.tick, 'leave', player_id))
+            if self.recorder:
+                self.recorder.leave(player_id)
+        self.connections.pop(player_id, None)
+        if player_id in self.game_state['players']:
+            self.game_state['players'] = {pid: view for pid, view in self.game_state['players'].items()
+                                          if pid != player_id}
+        self.field_ticks.pop(player_id, None)
         if player_id in self.player_stats:
             del self.player_stats[player_id] 
             
@@ -182,11 +325,14 @@ class GameEngine:
             print(f"Player {player_id} disconnected from lobby.")
 
 
+    @_synchronized
     def set_player_ready(self, player_id):
         """Đánh dấu player đã ready"""
         if player_id in self.players:
-            self.players[player_id]['ready'] = True
+            self.players[player_id].ready = True
             self.ready_players.add(player_id)
+            if self.recorder:
+                self.recorder.ready(player_id)
             print(f"Players ready: {self.ready_players}") 
 
     def check_game_start(self):
@@ -197,6 +343,7 @@ class GameEngine:
                 all_players_ready and
                 not self.game_started)
 
+    @_synchronized
     def start_game(self):
         """Bắt đầu game mới"""
         # Chọn map mới khi bắt đầu game (random)
@@ -208,27 +355,136 @@ class GameEngine:
         self.game_state['winner_id'] = None
         self.game_start_time = time.time() # Đặt thời gian bắt đầu
         print("GameEngine: Game is starting! (map_id={})".format(self.current_map))
+        
+        if self.recorder:
+            self.recorder.start(self.current_map)
+        elif self.record_dir:
+            name = f"match_{time.strftime('%Y%m%d_%H%M%S')}_{self.tick}.ftml"
+            self.start_recording(os.path.join(self.record_dir, name))
 
-    
+    def start_recording(self, path):
+        """Bắt đầu ghi log trận từ trạng thái hiện tại"""
+        self.stop_recording()
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            self.recorder = MatchRecorder(path, self.export_state())
+            print(f"Đang ghi log trận: {path}")
+        except OSError as e:
+            print(f"Không thể ghi log trận {path}: {e}")
+            self.recorder = None
+
+    def stop_recording(self):
+        """Kết thúc log trận (không chờ thread ghi để không chặn tick)"""
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+
+    def export_state(self):
+        """Toàn bộ trạng thái mô phỏng dưới dạng dict JSON được (dùng làm điểm bắt đầu của log trận)"""
+        return {
+            'tick': self.tick,
+            'next_bullet_id': self.next_bullet_id,
+            'map_id': self.current_map,
+            'game_started': self.game_started,
+            # survival_time tính theo giờ thực: lưu thời gian đã chơi thay cho mốc thời gian
+            'elapsed': time.time() - self.game_start_time if self.game_started else 0,
+            'game_over': self.game_state['game_over'],
+            'winner_id': self.game_state['winner_id'],
+            'players': [
+                {'id': pid, 'x': p.x, 'y': p.y, 'angle': p.angle, 'hp': p.hp, 'ammo': p.ammo,
+                 'ready': p.ready, 'name': p.name,
+                 'stats': self.player_stats[pid].to_dict() if pid in self.player_stats else None}
+                for pid, p in self.players.items()
+            ],
+            'bullets': [b.to_dict() for b in self.bullets],
+            'ready_players': list(self.ready_players),
+            'restart_requests': list(self.restart_requests),
+        }
+
+    @_synchronized
+    def load_state(self, state):
+        """Khôi phục trạng thái mô phỏng từ export_state() (player không có kết nối)"""
+        self.players.clear()
+        self.connections.clear()
+        self.input_queues.clear()
+        self.player_stats.clear()
+        self.field_ticks.clear()
+        self.events.clear()
+        self.tick = state['tick']
+        self.next_bullet_id = state['next_bullet_id']
+        self.current_map = state['map_id']
+        self.game_state['map_id'] = self.current_map
+        self.game_started = state['game_started']
+        self.game_start_time = time.time() - state.get('elapsed', 0)
+        self.game_state['game_over'] = state['game_over']
+        self.game_state['winner_id'] = state['winner_id']
+        views = {}
+        for data in state['players']:
+            pid = data['id']
+            player = PlayerState(data['x'], data['y'], data['name'])
+            player.angle, player.hp, player.ammo, player.ready = data['angle'], data['hp'], data['ammo'], data['ready']
+            self.players[pid] = player
+            self.connections[pid] = PlayerConnection(None, None)
+            self.input_queues[pid] = deque(maxlen=self.INPUT_QUEUE_LIMIT)
+            stats = PlayerStats()
+            for field, value in (data.get('stats') or {}).items():
+                setattr(stats, field, value)
+            self.player_stats[pid] = stats
+            views[pid] = {f: getattr(player, f) for f in PUBLIC_PLAYER_FIELDS}
+            self.field_ticks[pid] = {f: self.tick for f in PUBLIC_PLAYER_FIELDS}
+        self.game_state['players'] = views
+        self.bullets[:] = [Bullet(b['id'], b['x'], b['y'], b['angle'], b['speed'], b['vx'], b['vy'],
+                                  b['owner'], b['tick']) for b in state['bullets']]
+        self.ready_players = set(state['ready_players'])
+        self.restart_requests = set(state['restart_requests'])
+
+    @_synchronized
     def update_game(self):
         """Cập nhật logic game chính"""
+        # Input nhận được từ tick trước được áp dụng trước khi sang tick mới,
+        # giống như khi chúng được xử lý ngay lúc nhận
+        self._apply_inputs()
+        self.tick += 1
+        if self.recorder:
+            self.recorder.tick(self.tick)
         if self.game_started and not self.game_state['game_over']:
             self._update_bullets()
             self._check_collisions()
+        
+        # Trận đã kết thúc thì đạn không bay tiếp nữa: xoá để client cũng ngừng mô phỏng
+        if self.game_state['game_over'] and self.bullets:
+            self._clear_bullets('end')
+        if self.recorder:
+            if self.game_state['game_over']:
+                self.stop_recording()
+            elif self.tick % self.KEYFRAME_INTERVAL == 0:
+                self.recorder.keyframe(self.tick, self.export_state())
             
         self._update_game_state()
 
+    def _clear_bullets(self, reason):
+        for bullet in self.bullets:
+            self._despawn(bullet, reason)
+        self.bullets.clear()
+
 
     def _update_bullets(self):
         """Cập nhật vị trí đạn và kiểm tra va chạm tường"""
-        for bullet in self.bullets[:]:
-            bullet['x'] += bullet['speed'] * math.cos(math.radians(bullet['angle']))
-            bullet['y'] += bullet['speed'] * math.sin(math.radians(bullet['angle']))
+        bullets = self.bullets
+        width, height = GameConstants.SCREEN_WIDTH, GameConstants.SCREEN_HEIGHT
+        count = len(bullets)
+        keep = 0
+        for i in range(count):
+            bullet = bullets[i]
+            x = bullet.x = bullet.x + bullet.vx
+            y = bullet.y = bullet.y + bullet.vy
             
-            if (bullet['x'] < 0 or bullet['x'] > GameConstants.SCREEN_WIDTH or 
-                bullet['y'] < 0 or bullet['y'] > GameConstants.SCREEN_HEIGHT):
-                if bullet in self.bullets:
-                    self.bullets.remove(bullet)
+            if x < 0 or x > width or y < 0 or y > height:
+                self._despawn(bullet, 'wall')
+            else:
+                bullets[keep] = bullet
+                keep += 1
+        del bullets[keep:count]
 
     
     def _end_game(self, winner_id):
@@ -243,37 +499,100 @@ class GameEngine:
         # Cập nhật stats lần cuối
         for pid in self.players.keys():
             if pid in self.player_stats:
-                self.player_stats[pid]['survival_time'] = int(time.time() - self.game_start_time)
+                self.player_stats[pid].survival_time = int(time.time() - self.game_start_time)
 
 
     def _update_game_state(self):
-        """Cập nhật game state từ player data"""
-        self.game_state['players'] = {}
+        """Đồng bộ các trường công khai đã thay đổi của player vào game_state.
+
+        Copy-on-write: player có trường đổi được thay bằng dict mới (kéo theo dict players mới), player
+        đứng yên giữ nguyên dict cũ. Dict đã phát ra không bao giờ bị sửa nên get_snapshot() đưa thẳng
+        ra ngoài khoá được mà không cần chép."""
+        views = self.game_state['players']
+        tick = self.tick
+        updated = None
         for pid, player in self.players.items():
-            self.game_state['players'][pid] = {
-                'x': player['x'],
-                'y': player['y'], 
-                'angle': player['angle'],
-                'hp': player['hp'],
-                'ammo': player['ammo'],
-                'name': player.get('name', f"Player {pid}"), 
-                'ready': player.get('ready', False) 
-            }
-        self.game_state['bullets'] = self.bullets.copy()
+            view = views[pid]
+            changed = self.field_ticks[pid]
+            fresh = None
+            for field in PUBLIC_PLAYER_FIELDS:
+                value = getattr(player, field)
+                if view[field] != value:
+                    if fresh is None:
+                        fresh = dict(view)
+                    fresh[field] = value
+                    changed[field] = tick
+            if fresh is not None:
+                if updated is None:
+                    updated = dict(views)
+                updated[pid] = fresh
+        if updated is not None:
+            self.game_state['players'] = updated
         self.game_state['map_id'] = self.current_map
+        
+        # Bỏ các sự kiện quá cũ
+        events = self.events
+        oldest = tick - self.EVENT_HISTORY_TICKS
+        while events and events[0][0] < oldest:
+            events.popleft()
+
+    def _sync_bullet_views(self):
+        """game_state['bullets'] giữ dict công khai theo vị trí trong danh sách đạn và tái sử dụng
+        chúng qua các tick: viên đạn vẫn ở chỗ cũ chỉ cần ghi lại x, y"""
+        views = self.game_state['bullets']
+        pool = self._bullet_view_pool
+        bullets = self.bullets
+        count = len(bullets)
+        while len(pool) < count:
+            pool.append({})
+        for i in range(count):
+            bullet = bullets[i]
+            view = pool[i]
+            if view.get('id') != bullet.id:
+                view['id'] = bullet.id
+                view['angle'] = bullet.angle
+                view['speed'] = bullet.speed
+                view['vx'] = bullet.vx
+                view['vy'] = bullet.vy
+                view['owner'] = bullet.owner
+                view['tick'] = bullet.tick
+            view['x'] = bullet.x
+            view['y'] = bullet.y
+            if i < len(views):
+                views[i] = view
+            else:
+                views.append(view)
+        del views[count:]
+
+    def changes_since(self, tick):
+        """Các thay đổi sau tick: trường player đã đổi và sự kiện đạn/player.
+        Trả về {'tick', 'players': {pid: {field: value}}, 'events': [...]}"""
+        players = {}
+        views = self.game_state['players']
+        for pid, changed in self.field_ticks.items():
+            fields = {f: views[pid][f] for f, t in changed.items() if t > tick}
+            if fields:
+                players[pid] = fields
+        events = [e for e in self.events if e[0] > tick]
+        return {'tick': self.tick, 'players': players, 'events': events}
 
+    @_synchronized
     def handle_restart_request(self, player_id):
         """Xử lý yêu cầu restart từ player"""
         self.restart_requests.add(player_id)
         return len(self.restart_requests) >= len(self.players) and len(self.players) > 0
 
 
+    @_synchronized
     def restart_game(self):
         """Khởi động lại game"""
         self.game_started = False
         self.ready_players.clear()
         self.restart_requests.clear()
-        self.bullets.clear()
+        self._clear_bullets('reset')
+        # Input còn chờ thuộc về ván cũ (đằng nào cũng bị reset ghi đè)
+        for queue in self.input_queues.values():
+            queue.clear()
         self.game_state['game_over'] = False
         self.game_state['winner_id'] = None
         self.player_stats.clear()
@@ -285,31 +604,71 @@ class GameEngine:
         # Đặt lại vị trí và số liệu thống kê của người chơi
         player_count = 0
         for pid, player in self.players.items():
-            player['x'] = 100 if player_count == 0 else 700 
-            player['y'] = 300
-            player['angle'] = 0
-            player['hp'] = GameConstants.PLAYER_HP
-            player['ammo'] = GameConstants.MAX_AMMO
-            player['ready'] = False
+            player.reset(100 if player_count == 0 else 700, 300)
             player_count += 1
             
             # Tạo lại số liệu thống kê
-            self.player_stats[pid] = {
-                'damage_dealt': 0,
-                'shots_fired': 0,
-                'shots_hit': 0,
-                'reloads_count': 0,
-                'survival_time': 0
-            }
+            self.player_stats[pid] = PlayerStats()
+        
+        if self.recorder:
+            self.recorder.restart(self.current_map)
+
+    @_synchronized
+    def reset_room(self):
+        """Phòng vừa trống (người còn lại quay về hàng đợi): bỏ trạng thái của trận cũ
+        để cặp kế tiếp bắt đầu từ màn hình chờ chứ không phải từ kết quả của trận trước"""
+        self.stop_recording()
+        self.game_started = False
+        self.ready_players.clear()
+        self.restart_requests.clear()
+        self._clear_bullets('reset')
+        for queue in self.input_queues.values():
+            queue.clear()
+        self.game_state['game_over'] = False
+        self.game_state['winner_id'] = None
+        self.player_stats.clear()
+        self.current_session_id = None
+        self.game_start_time = 0
 
     def get_game_state(self):
-        """Lấy current game state"""
+        """Lấy current game state đầy đủ, kể cả vị trí từng viên đạn (cùng một dict qua các tick)"""
+        self._sync_bullet_views()
         return self.game_state
 
+    @_synchronized
+    def get_snapshot(self):
+        """State gửi cho client mỗi tick: player và các sự kiện đạn trong REPLICATION_WINDOW tick
+        gần nhất thay cho vị trí đạn, nên kích thước không tăng theo số đạn đang bay.
+
+        Sự kiện: ['s', tick, id, x, y, angle, owner] (tick = tick đầu tiên đạn bay; client tính
+        vận tốc từ angle bằng cùng bảng unit_vector) và ['d', tick, id, lý do, player trúng đạn].
+        players là dict copy-on-write của _update_game_state (không bị sửa sau khi phát ra) nên được
+        đưa thẳng ra, mã hoá ngoài khoá vẫn an toàn khi thread TCP thêm/xoá player."""
+        oldest = self.tick - self.REPLICATION_WINDOW
+        bullet_events = []
+        for tick, kind, data in reversed(self.events):
+            if tick <= oldest:
+                break
+            if kind == 'spawn':
+                bullet_events.append(['s', tick, *data])
+            elif kind == 'despawn':
+                bullet_events.append(['d', tick, *data])
+        bullet_events.reverse()
+        state = self.game_state
+        return {
+            'tick': self.tick,
+            'players': state['players'],
+            'bullet_events': bullet_events,
+            'game_over': state['game_over'],
+            'winner_id': state['winner_id'],
+            'map_id': state['map_id'],
+        }
+
     def get_player_udp_address(self, player_id):
         """Lấy UDP address của player"""
-        return self.players[player_id]['udp_address'] if player_id in self.players else None
+        connection = self.connections.get(player_id)
+        return connection.udp_address if connection is not None else None
 
     def get_all_tcp_sockets(self):
         """Lấy tất cả TCP sockets của players"""
-        return [player['tcp_socket'] for player in self.players.values()]
\ No newline at end of file
+        return [connection.tcp_socket for connection in self.connections.values()]
\ No newline at end of file
@@ -0,0 +1,250 @@
+# Nhận input UDP theo lô: mỗi tick đọc hết các datagram đang chờ bằng recvfrom_into vào bộ đệm dựng sẵn
+import hmac
+import socket
+import threading
+import time
+
+from common.codec import JSON
+
+# Input của client chỉ vài chục byte; datagram dài hơn mức này bị coi là cắt cụt/không hợp lệ
+MAX_DATAGRAM = 1024
+# Ngắn hơn mức này thì không codec nào chứa nổi một input có 'id'
+MIN_DATAGRAM = 4
+# Bộ đệm nhận của kernel: đủ chứa vài giây input khi tick bị chậm
+RCVBUF_SIZE = 4 * 1024 * 1024
+
+
+class _Route:
+    """Địa chỉ UDP đã đăng ký của một player, kèm codec đã thống nhất và token bucket"""
+    __slots__ = ('player_id', 'codec', 'tokens', 'updated')
+
+    def __init__(self, player_id, codec, burst, now):
+        self.player_id = player_id
+        self.codec = codec
+        self.tokens = burst
+        self.updated = now
+
+
+def _take_token(bucket, rate, burst, now):
+    tokens = bucket.tokens + (now - bucket.updated) * rate
+    bucket.updated = now
+    if tokens < 1.0:
+        bucket.tokens = tokens
+        return False
+    bucket.tokens = (burst if tokens > burst else tokens) - 1.0
+    return True
+
+
+def _token_matches(expected, message):
+    token = message.get('token')
+    return expected is not None and type(token) is str and hmac.compare_digest(token, expected)
+
+
+class UdpIngest:
+    """Đọc không chặn mọi datagram đang chờ trên socket.
+
+    Mỗi lần drain() nhận tối đa POOL_SIZE datagram vào các bộ đệm cấp phát sẵn (không tạo bytes mới
+    cho mỗi gói), sau đó mới giải mã cả lô; lặp lại tới khi socket rỗng hoặc hết MAX_PER_DRAIN gói
+    để một đợt flood không chiếm hết thời gian của tick (phần còn lại vẫn nằm trong bộ đệm kernel).
+
+    Trước khi giải mã, mỗi gói được lọc theo địa chỉ nguồn: chỉ địa chỉ đã đăng ký qua TCP (tra dict O(1)),
+    trong giới hạn token bucket của địa chỉ đó và có kích thước/byte đầu hợp lệ. Gói từ IP lạ bị bỏ
+    mà không tốn thời gian parse và không tạo trạng thái gì cho địa chỉ đó. Gói từ cổng mới của một IP
+    đã biết chỉ được nhận (và chuyển route) khi mang đúng token phiên của player.
+    """
+    POOL_SIZE = 256
+    MAX_PER_DRAIN = 4096
+    # Token bucket cho mỗi địa chỉ đã đăng ký: client gửi ~60 gói/giây (vị trí) cộng bắn/nạp đạn
+    RATE_LIMIT = 180.0
+    RATE_BURST = 90.0
+    # Gói từ cổng lạ của một IP đã biết (NAT đổi cổng): ít gói hơn nhiều vì phải giải mã mới biết là ai
+    REBIND_RATE = 10.0
+    REBIND_BURST = 5.0
+
+    def __init__(self, sock, packets=None, bytes_in=None, decode_errors=None, truncated=None,
+                 errors=None, batch_sizes=None, rejected=None, on_rebind=None):
+        self.sock = sock
+        # Địa chỉ -> _Route; IP -> ({player đăng ký từ IP đó: (codec, token)}, bucket dùng chung khi đổi cổng)
+        self.routes = {}
+        self.hosts = {}
+        self.on_rebind = on_rebind
+        # drain() chỉ tra cứu (không khoá); thêm/xoá route từ thread TCP và tick được tuần tự hoá
+        self._routes_lock = threading.Lock()
+        sock.setblocking(False)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, RCVBUF_SIZE)
+        except OSError as e:
+            print(f"Không thể tăng SO_RCVBUF: {e}")
+        self.rcvbuf = sock.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF)
+
+        # Dư một byte: nhận đủ MAX_DATAGRAM + 1 byte nghĩa là datagram đã bị cắt
+        self._buffers = [bytearray(MAX_DATAGRAM + 1) for _ in range(self.POOL_SIZE)]
+        self._views = [memoryview(b) for b in self._buffers]
+        self._sizes = [0] * self.POOL_SIZE
+        self._addresses = [None] * self.POOL_SIZE
+
+        self.packets = packets
+        self.bytes_in = bytes_in
+        self.decode_errors = decode_errors
+        self.truncated = truncated
+        self.errors = errors
+        self.batch_sizes = batch_sizes
+        self.rejected = rejected
+
+    def register(self, player_id, address, codec=JSON, token=None):
+        """Địa chỉ UDP mà player khai báo khi đăng nhập qua TCP, codec đã thống nhất và token phiên
+        (gửi cho client trong bắt tay TCP). Không có token thì player không thể đổi cổng"""
+        with self._routes_lock:
+            self._unregister(player_id)
+            now = time.monotonic()
+            self.routes[address] = _Route(player_id, codec, self.RATE_BURST, now)
+            host = self.hosts.get(address[0])
+            if host is None:
+                host = self.hosts[address[0]] = ({}, _Route(None, None, self.REBIND_BURST, now))
+            host[0][player_id] = (codec, token)
+
+    def unregister(self, player_id):
+        with self._routes_lock:
+            self._unregister(player_id)
+
+    def _unregister(self, player_id):
+        for address in [a for a, route in self.routes.items() if route.player_id == player_id]:
+            del self.routes[address]
+        for ip in [ip for ip, (players, _) in self.hosts.items() if player_id in players]:
+            players = self.hosts[ip][0]
+            players.pop(player_id, None)
+            if not players:
+                del self.hosts[ip]
+
+    def _rebind(self, player_id, address, codec):
+        """Player gửi từ cổng mới (NAT): chuyển route sang địa chỉ mới"""
+        with self._routes_lock:
+            old = [a for a, route in self.routes.items() if route.player_id == player_id]
+            route = self.routes.pop(old[0]) if old else _Route(player_id, codec, self.RATE_BURST, time.monotonic())
+            for stale in old[1:]:
+                del self.routes[stale]
+            self.routes[address] = route
+        if self.on_rebind is not None:
+            self.on_rebind(player_id, address)
+
+    def _receive(self, limit):
+        """Nhận vào các bộ đệm của pool, trả về số datagram đã nhận (dừng khi socket rỗng)"""
+        recv_into = self.sock.recvfrom_into
+        views, sizes, addresses = self._views, self._sizes, self._addresses
+        count = 0
+        while count < limit:
+            try:
+                sizes[count], addresses[count] = recv_into(views[count])
+            except (BlockingIOError, InterruptedError):
+                break
+            except ConnectionResetError:
+                # Windows báo ICMP port unreachable của lần gửi trước qua recvfrom
+                continue
+            except OSError:
+                if self.errors is not None:
+                    self.errors.inc(1, 'in')
+                break
+            count += 1
+        return count
+
+    def drain(self):
+        """Danh sách (player_id, message) của mọi input hợp lệ đang chờ"""
+        batch = []
+        received = received_bytes = truncated = invalid = 0
+        unknown = limited = malformed = mismatched = 0
+        views, sizes, addresses = self._views, self._sizes, self._addresses
+        routes, hosts = self.routes, self.hosts
+        buffers = self._buffers
+        rate, burst = self.RATE_LIMIT, self.RATE_BURST
+        now = time.monotonic()
+        while received < self.MAX_PER_DRAIN:
+            count = self._receive(min(self.POOL_SIZE, self.MAX_PER_DRAIN - received))
+            for i in range(count):
+                size = sizes[i]
+                received_bytes += size
+                address = addresses[i]
+
+                # Lọc theo địa chỉ nguồn trước mọi bước giải mã
+                route = routes.get(address)
+                if route is not None:
+                    if not _take_token(route, rate, burst, now):
+                        limited += 1
+                        continue
+                else:
+                    host = hosts.get(address[0])
+                    if host is None:
+                        unknown += 1
+                        continue
+                    if not _take_token(host[1], self.REBIND_RATE, self.REBIND_BURST, now):
+                        limited += 1
+                        continue
+
+                if size > MAX_DATAGRAM:
+                    truncated += 1
+                    continue
+                if size < MIN_DATAGRAM:
+                    malformed += 1
+                    continue
+                lead = buffers[i][0]
+                if route is not None:
+                    codec = route.codec
+                    if lead not in codec.lead_bytes:
+                        malformed += 1
+                        continue
+                else:
+                    codec = next((c for c, _ in host[0].values() if lead in c.lead_bytes), None)
+                    if codec is None:
+                        malformed += 1
+                        continue
+                try:
+                    # Giải mã thẳng từ bộ đệm, không tạo bản sao bytes trung gian
+                    message = codec.decode(views[i][:size])
+                except Exception:
+                    # Mọi lỗi giải mã (kể cả RecursionError với mảng lồng sâu) chỉ làm hỏng gói này,
+                    # không được làm mất cả lô hay bỏ qua tick
+                    invalid += 1
+                    continue
+                if not isinstance(message, dict):
+                    invalid += 1
+                    continue
+
+                player_id = message.get('id')
+                if route is not None:
+                    if player_id != route.player_id:
+                        # Địa chỉ của player này nhưng khai id khác: không cho điều khiển player khác
+                        mismatched += 1
+                        continue
+                elif type(player_id) is str and player_id in host[0] and _token_matches(host[0][player_id][1], message):
+                    # Chỉ chuyển route khi gói mang đúng token phiên: cùng IP (cùng NAT) chưa đủ để nhận là player này
+                    self._rebind(player_id, address, host[0][player_id][0])
+                else:
+                    mismatched += 1
+                    continue
+                batch.append((player_id, message))
+            received += count
+            if count < self.POOL_SIZE:
+                break
+
+        # Cập nhật metric một lần cho cả lô
+        if received:
+            if self.packets is not None:
+                self.packets.inc(received, 'in')
+            if self.bytes_in is not None:
+                self.bytes_in.inc(received_bytes, 'in')
+            if truncated and self.truncated is not None:
+                self.truncated.inc(truncated)
+            if invalid and self.decode_errors is not None:
+                self.decode_errors.inc(invalid)
+            rejected = self.rejected
+            if rejected is not None:
+                if unknown:
+                    rejected.inc(unknown, 'unknown_address')
+                if limited:
+                    rejected.inc(limited, 'rate_limited')
+                if malformed:
+                    rejected.inc(malformed, 'malformed')
+                if mismatched:
+                    rejected.inc(mismatched, 'id_mismatch')
+        if self.batch_sizes is not None:
+            self.batch_sizes.observe(received)
+        return batch
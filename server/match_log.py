@@ -0,0 +1,320 @@
+# Ghi log trận đấu dạng nhị phân chỉ-ghi-thêm (input + ranh giới tick) để phát lại bằng cách mô phỏng lại.
+# Định kỳ có keyframe (toàn bộ state) và cuối file là bảng chỉ mục keyframe để tua tới tick bất kỳ.
+import bisect
+import json
+import mmap
+import queue
+import struct
+import threading
+import time
+
+MAGIC = b'FTML'
+VERSION = 2
+INDEX_MAGIC = b'FTIX'
+
+# Loại bản ghi (1 byte) và phần dữ liệu theo sau
+REC_TICK = 1      # u32 tick (ghi ở đầu update_game, sau khi tăng tick)
+REC_INPUT = 2     # u8 player, u8 cờ, [f64 x, f64 y, f64 angle], [i32 ammo]
+REC_JOIN = 3      # u8 player, chuỗi player_id, chuỗi tên
+REC_LEAVE = 4     # u8 player
+REC_READY = 5     # u8 player
+REC_START = 6     # u8 map
+REC_RESTART = 7   # u8 map
+REC_NAME = 8      # u8 player, chuỗi tên
+REC_END = 9       # kết thúc bản ghi, theo sau là bảng chỉ mục
+REC_KEYFRAME = 10 # u32 tick, u32 độ dài, JSON export_state() sau khi mô phỏng xong tick đó
+
+# Cờ của REC_INPUT
+INPUT_POS = 1
+INPUT_FIRE = 2
+INPUT_RELOAD = 4
+INPUT_AMMO = 8
+
+_HEADER = struct.Struct('<4sHI')
+_TICK = struct.Struct('<BI')
+_INPUT = struct.Struct('<BBB')
+_POS = struct.Struct('<ddd')
+_AMMO = struct.Struct('<i')
+_BYTE2 = struct.Struct('<BB')
+_STR_LEN = struct.Struct('<H')
+_KEYFRAME = struct.Struct('<BII')
+# Mục chỉ mục: tick, offset bản ghi kế tiếp (chỗ chạy tiếp), offset và độ dài JSON state
+_INDEX_ENTRY = struct.Struct('<IQQI')
+# Cuối file: offset bảng chỉ mục, số mục, tick cuối cùng, INDEX_MAGIC
+_FOOTER = struct.Struct('<QII4s')
+
+
+def _pack_str(value):
+    data = str(value).encode('utf-8')
+    return _STR_LEN.pack(len(data)) + data
+
+
+class MatchRecorder:
+    """Ghi log trận vào file: thread tick chỉ đóng gói bản ghi và đẩy vào hàng đợi,
+    một thread riêng gom các bản ghi và ghi xuống đĩa theo lô"""
+    FLUSH_INTERVAL = 0.5
+
+    def __init__(self, path, initial_state):
+        self.path = path
+        self.records = 0
+        self.last_tick = initial_state.get('tick', 0)
+        self._players = {}
+        self._queue = queue.SimpleQueue()
+        self._file = open(path, 'wb')
+        header = json.dumps(initial_state).encode('utf-8')
+        self._file.write(_HEADER.pack(MAGIC, VERSION, len(header)) + header)
+        # State ban đầu là keyframe đầu tiên
+        body = _HEADER.size + len(header)
+        self._keyframes = [(self.last_tick, body, _HEADER.size, len(header))]
+        for index, player in enumerate(initial_state.get('players', [])):
+            self._players[player['id']] = index
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, daemon=True)
+        self._thread.start()
+
+    def _index(self, player_id):
+        index = self._players.get(player_id)
+        if index is None:
+            index = self._players[player_id] = len(self._players)
+        return index
+
+    def _put(self, data):
+        if not self._closed:
+            self.records += 1
+            self._queue.put(data)
+
+    def tick(self, tick):
+        self.last_tick = tick
+        self._put(_TICK.pack(REC_TICK, tick))
+
+    def keyframe(self, tick, state):
+        """Ghi toàn bộ state; JSON được mã hoá ở thread ghi để không tốn thời gian của tick"""
+        # Kèm bảng chỉ số player của log để đọc tiếp được từ keyframe này
+        ids = sorted(self._players, key=self._players.get)
+        self._put((tick, dict(state, log_players=ids)))
+
+    def input(self, player_id, message):
+        """Ghi lại một input đã được chấp nhận (chỉ các trường ảnh hưởng tới mô phỏng)"""
+        flags = 0
+        tail = b''
+        if 'x' in message and 'y' in message and 'angle' in message:
+            flags |= INPUT_POS
+            tail += _POS.pack(message['x'], message['y'], message['angle'])
+        if message.get('fire'):
+            flags |= INPUT_FIRE
+        if message.get('reload'):
+            flags |= INPUT_RELOAD
+        if 'ammo_update' in message:
+            flags |= INPUT_AMMO
+            tail += _AMMO.pack(int(message['ammo_update']))
+        self._put(_INPUT.pack(REC_INPUT, self._index(player_id), flags) + tail)
+
+    def join(self, player_id, name):
+        self._put(_BYTE2.pack(REC_JOIN, self._index(player_id)) + _pack_str(player_id) + _pack_str(name))
+
+    def leave(self, player_id):
+        self._put(_BYTE2.pack(REC_LEAVE, self._index(player_id)))
+
+    def ready(self, player_id):
+        self._put(_BYTE2.pack(REC_READY, self._index(player_id)))
+
+    def name(self, player_id, name):
+        self._put(_BYTE2.pack(REC_NAME, self._index(player_id)) + _pack_str(name))
+
+    def start(self, map_id):
+        self._put(_BYTE2.pack(REC_START, map_id))
+
+    def restart(self, map_id):
+        self._put(_BYTE2.pack(REC_RESTART, map_id))
+
+    def pending(self):
+        """Số bản ghi đang chờ thread ghi"""
+        return self._queue.qsize()
+
+    def close(self, wait=False):
+        """Ghi REC_END và dừng thread ghi; wait=False để không chặn thread tick"""
+        if self._closed:
+            return
+        self._queue.put(bytes([REC_END]))
+        self._closed = True
+        self._queue.put(None)
+        if wait:
+            self._thread.join()
+
+    def _encode_keyframe(self, offset, tick, state):
+        data = json.dumps(state).encode('utf-8')
+        self._keyframes.append((tick, offset + _KEYFRAME.size + len(data), offset + _KEYFRAME.size, len(data)))
+        return _KEYFRAME.pack(REC_KEYFRAME, tick, len(data)) + data
+
+    def _write_index(self, f, offset):
+        index = b''.join(_INDEX_ENTRY.pack(*entry) for entry in self._keyframes)
+        f.write(index + _FOOTER.pack(offset, len(self._keyframes), self.last_tick, INDEX_MAGIC))
+
+    def _writer(self):
+        f = self._file
+        offset = f.tell()
+        last_flush = time.monotonic()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=self.FLUSH_INTERVAL)
+                except queue.Empty:
+                    f.flush()
+                    last_flush = time.monotonic()
+                    continue
+                batch = []
+                while item is not None:
+                    if isinstance(item, tuple):
+                        item = self._encode_keyframe(offset, *item)
+                    batch.append(item)
+                    offset += len(item)
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                if batch:
+                    f.write(b''.join(batch))
+                if item is None:
+                    self._write_index(f, offset)
+                    break
+                now = time.monotonic()
+                if now - last_flush >= self.FLUSH_INTERVAL:
+                    f.flush()
+                    last_flush = now
+        except OSError as e:
+            print(f"Lỗi ghi log trận {self.path}: {e}")
+        finally:
+            f.close()
+
+
+class MatchReader:
+    """Đọc file log trận qua mmap: chỉ những trang được đọc tới mới được nạp vào bộ nhớ,
+    tua tới một tick chỉ cần tìm nhị phân trong bảng chỉ mục keyframe"""
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: không phải file log trận")
+        if version not in (1, VERSION):
+            raise ValueError(f"{path}: phiên bản log {version} không được hỗ trợ")
+        start = _HEADER.size
+        self.initial_state = json.loads(self.data[start:start + header_len].decode('utf-8'))
+        self.body_offset = start + header_len
+        self.player_ids = [p['id'] for p in self.initial_state.get('players', [])]
+        self._load_index(start, header_len)
+
+    def close(self):
+        self.data.close()
+
+    def _load_index(self, header_start, header_len):
+        """Đọc bảng chỉ mục cuối file; file ghi dở (không có chỉ mục) thì quét một lượt để dựng lại"""
+        data = self.data
+        if len(data) >= self.body_offset + _FOOTER.size:
+            index_offset, count, last_tick, magic = _FOOTER.unpack_from(data, len(data) - _FOOTER.size)
+            if magic == INDEX_MAGIC and index_offset + count * _INDEX_ENTRY.size + _FOOTER.size == len(data):
+                self.index = [_INDEX_ENTRY.unpack_from(data, index_offset + i * _INDEX_ENTRY.size)
+                              for i in range(count)]
+                self.index_ticks = [entry[0] for entry in self.index]
+                self.last_tick = last_tick
+                return
+
+        first_tick = self.initial_state.get('tick', 0)
+        self.index = [(first_tick, self.body_offset, header_start, header_len)]
+        self.last_tick = first_tick
+        player_ids = list(self.player_ids)
+        for kind, value, offset in self._iter(self.body_offset):
+            if kind == REC_TICK:
+                self.last_tick = value
+            elif kind == REC_KEYFRAME:
+                tick, state_offset, length = value
+                self.index.append((tick, offset, state_offset, length))
+        # Quét xong thì đặt lại để records() ánh xạ player từ đầu
+        self.player_ids = player_ids
+        self.index_ticks = [entry[0] for entry in self.index]
+
+    def keyframe_tick(self, tick):
+        """Tick của keyframe gần nhất có tick <= tick"""
+        return self.index_ticks[max(0, bisect.bisect_right(self.index_ticks, tick) - 1)]
+
+    def find_keyframe(self, tick):
+        """Keyframe gần nhất có tick <= tick: (tick, state, offset để đọc tiếp) - O(log n)"""
+        i = max(0, bisect.bisect_right(self.index_ticks, tick) - 1)
+        key_tick, resume, state_offset, length = self.index[i]
+        state = json.loads(self.data[state_offset:state_offset + length].decode('utf-8'))
+        return key_tick, state, resume
+
+    def _read_str(self, offset):
+        (length,) = _STR_LEN.unpack_from(self.data, offset)
+        offset += _STR_LEN.size
+        return self.data[offset:offset + length].decode('utf-8'), offset + length
+
+    def records(self, offset=None, state=None):
+        """Sinh (loại, dữ liệu) theo thứ tự ghi từ offset (mặc định đầu phần thân);
+        state là keyframe ứng với offset. Dừng ở REC_END hoặc khi file bị cắt cụt"""
+        if state is None:
+            state = self.initial_state
+        self.player_ids = state.get('log_players') or [p['id'] for p in state.get('players', [])]
+        for kind, value, _ in self._iter(self.body_offset if offset is None else offset):
+            yield kind, value
+
+    def _iter(self, offset):
+        data = self.data
+        end = len(data)
+        try:
+            while offset < end:
+                kind = data[offset]
+                offset += 1
+                if kind == REC_TICK:
+                    (tick,) = struct.unpack_from('<I', data, offset)
+                    offset += 4
+                    yield kind, tick, offset
+                elif kind == REC_INPUT:
+                    index, flags = data[offset], data[offset + 1]
+                    offset += 2
+                    message = {}
+                    if flags & INPUT_POS:
+                        message['x'], message['y'], message['angle'] = _POS.unpack_from(data, offset)
+                        offset += _POS.size
+                    if flags & INPUT_FIRE:
+                        message['fire'] = True
+                    if flags & INPUT_RELOAD:
+                        message['reload'] = True
+                    if flags & INPUT_AMMO:
+                        (message['ammo_update'],) = _AMMO.unpack_from(data, offset)
+                        offset += _AMMO.size
+                    yield kind, (self.player_ids[index], message), offset
+                elif kind == REC_JOIN:
+                    index = data[offset]
+                    player_id, offset = self._read_str(offset + 1)
+                    name, offset = self._read_str(offset)
+                    while len(self.player_ids) <= index:
+                        self.player_ids.append(None)
+                    self.player_ids[index] = player_id
+                    yield kind, (player_id, name), offset
+                elif kind in (REC_LEAVE, REC_READY):
+                    offset += 1
+                    yield kind, self.player_ids[data[offset - 1]], offset
+                elif kind == REC_NAME:
+                    player_id = self.player_ids[data[offset]]
+                    name, offset = self._read_str(offset + 1)
+                    yield kind, (player_id, name), offset
+                elif kind in (REC_START, REC_RESTART):
+                    offset += 1
+                    yield kind, data[offset - 1], offset
+                elif kind == REC_KEYFRAME:
+                    tick, length = struct.unpack_from('<II', data, offset)
+                    offset += 8
+                    if offset + length > end:
+                        return
+                    state_offset = offset
+                    offset += length
+                    yield kind, (tick, state_offset, length), offset
+                elif kind == REC_END:
+                    return
+                else:
+                    raise ValueError(f"Bản ghi không hợp lệ (loại {kind}) tại byte {offset - 1}")
+        except (struct.error, IndexError):
+            # File đang ghi dở hoặc server dừng đột ngột: bỏ bản ghi cuối không đầy đủ
+            return
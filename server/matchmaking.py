@@ -0,0 +1,188 @@
+# Ghép trận theo rating: hàng đợi chia bucket theo rating, tìm đối thủ bằng tìm kiếm nhị phân trên các bucket
+import bisect
+import threading
+import time
+from collections import deque
+
+from common.stats import percentile
+
+# Elo: rating khởi điểm và hệ số K (người mới thay đổi nhanh hơn cho tới khi đủ số trận)
+DEFAULT_RATING = 1500.0
+K_FACTOR = 20.0
+K_PROVISIONAL = 40.0
+PROVISIONAL_GAMES = 30
+
+# Thời gian chờ trong hàng đợi (giây)
+WAIT_BUCKETS = (0.5, 1, 2, 5, 10, 15, 20, 30, 45, 60, 120)
+# Chênh lệch rating của cặp được ghép
+GAP_BUCKETS = (10, 25, 50, 100, 150, 200, 300, 400, 600)
+
+
+def expected_score(rating, opponent):
+    """Xác suất thắng kỳ vọng theo Elo"""
+    return 1.0 / (1.0 + 10.0 ** ((opponent - rating) / 400.0))
+
+
+def elo_update(rating_a, rating_b, score_a, games_a=0, games_b=0):
+    """Rating mới của hai người sau một trận; score_a = 1 (A thắng), 0.5 (hoà) hoặc 0 (A thua)"""
+    expected_a = expected_score(rating_a, rating_b)
+    k_a = K_PROVISIONAL if games_a < PROVISIONAL_GAMES else K_FACTOR
+    k_b = K_PROVISIONAL if games_b < PROVISIONAL_GAMES else K_FACTOR
+    return (rating_a + k_a * (score_a - expected_a),
+            rating_b + k_b * (expected_a - score_a))
+
+
+class _Ticket:
+    __slots__ = ('player_id', 'rating', 'key', 'enqueued')
+
+    def __init__(self, player_id, rating, key, enqueued):
+        self.player_id = player_id
+        self.rating = rating
+        self.key = key
+        self.enqueued = enqueued
+
+
+class Matchmaker:
+    """Hàng đợi ghép trận theo rating.
+
+    Người chơi nằm trong bucket rộng BUCKET_WIDTH điểm; danh sách khoá của các bucket không rỗng được giữ
+    đã sắp xếp nên tìm đối thủ chỉ cần bisect tới bucket của mình rồi đi ra hai bên tới hết cửa sổ tìm kiếm
+    (mỗi bucket chỉ xét người chờ lâu nhất). Cửa sổ rộng dần theo thời gian chờ và bỏ giới hạn sau MAX_WAIT
+    giây. match() duyệt theo thứ tự vào hàng đợi nên người chờ lâu được ghép trước.
+    """
+    BUCKET_WIDTH = 25.0
+    BASE_WINDOW = 50.0
+    # Điểm rating cửa sổ nới thêm mỗi giây chờ
+    WIDEN_RATE = 10.0
+    MAX_WINDOW = 400.0
+    # Chờ quá lâu thì ghép với bất kỳ ai
+    MAX_WAIT = 60.0
+    # Số lần chờ gần nhất dùng để tính phân vị
+    RECENT_WAITS = 1024
+
+    def __init__(self, wait_times=None, rating_gaps=None, matches=None):
+        # player_id -> _Ticket theo thứ tự vào hàng đợi
+        self.tickets = {}
+        # Khoá bucket -> {player_id: _Ticket}; keys là các khoá không rỗng, đã sắp xếp
+        self.buckets = {}
+        self.keys = []
+        self.recent_waits = deque(maxlen=self.RECENT_WAITS)
+        self.wait_times = wait_times
+        self.rating_gaps = rating_gaps
+        self.matches = matches
+        # enqueue/cancel từ các thread TCP, match() từ vòng lặp game
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.tickets)
+
+    def __contains__(self, player_id):
+        return player_id in self.tickets
+
+    def window(self, waited):
+        """Chênh lệch rating tối đa chấp nhận được sau waited giây chờ"""
+        if waited >= self.MAX_WAIT:
+            return float('inf')
+        return min(self.MAX_WINDOW, self.BASE_WINDOW + self.WIDEN_RATE * waited)
+
+    def enqueue(self, player_id, rating=DEFAULT_RATING, now=None):
+        """Đưa player vào hàng đợi (vào lại thì tính thời gian chờ từ đầu)"""
+        now = time.monotonic() if now is None else now
+        key = int(rating // self.BUCKET_WIDTH)
+        with self._lock:
+            self._remove(player_id)
+            ticket = self.tickets[player_id] = _Ticket(player_id, rating, key, now)
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = {}
+                bisect.insort(self.keys, key)
+            bucket[player_id] = ticket
+
+    def cancel(self, player_id):
+        """Rời hàng đợi; False nếu player không có trong hàng đợi"""
+        with self._lock:
+            return self._remove(player_id) is not None
+
+    def _remove(self, player_id):
+        ticket = self.tickets.pop(player_id, None)
+        if ticket is None:
+            return None
+        bucket = self.buckets[ticket.key]
+        del bucket[player_id]
+        if not bucket:
+            del self.buckets[ticket.key]
+            del self.keys[bisect.bisect_left(self.keys, ticket.key)]
+        return ticket
+
+    def _find_opponent(self, ticket, window):
+        """Đối thủ gần rating nhất trong cửa sổ (xét người chờ lâu nhất của mỗi bucket), hoặc None"""
+        keys, buckets, width = self.keys, self.buckets, self.BUCKET_WIDTH
+        own = ticket.key
+        # Bucket của chính mình luôn có trong keys: đi ra hai bên từ đó theo khoảng cách khoá tăng dần
+        right = bisect.bisect_left(keys, own)
+        left = right - 1
+        best, best_gap = None, window
+        while left >= 0 or right < len(keys):
+            if right < len(keys) and (left < 0 or keys[right] - own <= own - keys[left]):
+                key = keys[right]
+                right += 1
+            else:
+                key = keys[left]
+                left -= 1
+            # Rating trong bucket cách mình ít nhất (khoảng cách khoá - 1) * width
+            if (abs(key - own) - 1) * width > best_gap:
+                break
+            for candidate in buckets[key].values():
+                if candidate is not ticket:
+                    gap = abs(candidate.rating - ticket.rating)
+                    if gap <= best_gap:
+                        best, best_gap = candidate, gap
+                    break
+        return best
+
+    def match(self, now=None, limit=None):
+        """Ghép các cặp đang chờ (tối đa limit cặp), người chờ lâu trước; trả về danh sách (player_a, player_b)"""
+        now = time.monotonic() if now is None else now
+        pairs = []
+        waits = []
+        gaps = []
+        with self._lock:
+            for ticket in list(self.tickets.values()):
+                if limit is not None and len(pairs) >= limit:
+                    break
+                if self.tickets.get(ticket.player_id) is not ticket:
+                    # Đã được ghép với người chờ lâu hơn trong lượt này
+                    continue
+                opponent = self._find_opponent(ticket, self.window(now - ticket.enqueued))
+                if opponent is None:
+                    continue
+                self._remove(ticket.player_id)
+                self._remove(opponent.player_id)
+                pairs.append((ticket.player_id, opponent.player_id))
+                waits.append(now - ticket.enqueued)
+                waits.append(now - opponent.enqueued)
+                gaps.append(abs(ticket.rating - opponent.rating))
+            self.recent_waits.extend(waits)
+
+        # Cập nhật metric ngoài khoá
+        if self.wait_times is not None:
+            for waited in waits:
+                self.wait_times.observe(waited)
+        if self.rating_gaps is not None:
+            for gap in gaps:
+                self.rating_gaps.observe(gap)
+        if pairs and self.matches is not None:
+            self.matches.inc(len(pairs))
+        return pairs
+
+    def wait_percentiles(self, quantiles=(50, 90, 99)):
+        """{phân vị: giây} của các lần chờ gần nhất"""
+        waits = list(self.recent_waits)
+        return {q: percentile(waits, q) for q in quantiles}
+
+    def oldest_wait(self, now=None):
+        """Thời gian chờ của người đang chờ lâu nhất (0 nếu hàng đợi rỗng)"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            ticket = next(iter(self.tickets.values()), None)
+        return now - ticket.enqueued if ticket is not None else 0.0
@@ -0,0 +1,246 @@
+# Số liệu vận hành của server ở định dạng text của Prometheus, phục vụ qua HTTP (chỉ dùng thư viện chuẩn)
+import bisect
+import functools
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Thời lượng tick (giây): ngân sách một tick ở 60Hz là ~16.7ms
+TICK_BUCKETS = (0.0005, 0.001, 0.002, 0.004, 0.008, 0.0125, 0.0167, 0.025, 0.05, 0.1, 0.25)
+# Thời gian truy vấn CSDL (giây)
+DB_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(n, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+                     for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Bộ đếm chỉ tăng, có thể chia theo nhãn; func (nếu có) trả về dict {nhãn: số} do nơi khác đếm"""
+    kind = 'counter'
+
+    def __init__(self, name, help_text, func=None, labels=()):
+        super().__init__(name, help_text, labels)
+        self.func = func
+        self._values = {}
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = self.header()
+        if self.func is not None:
+            try:
+                items = sorted(((k,) if not isinstance(k, tuple) else k, v) for k, v in self.func().items())
+            except Exception:
+                return lines
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        if not items and not self.label_names:
+            items = [((), 0)]
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Giá trị tức thời; func (nếu có) được gọi lúc scrape, trả về số hoặc dict {nhãn: số}"""
+    kind = 'gauge'
+
+    def __init__(self, name, help_text, func=None, labels=()):
+        super().__init__(name, help_text, labels)
+        self.func = func
+        self._values = {}
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+    def render(self):
+        lines = self.header()
+        if self.func is not None:
+            try:
+                result = self.func()
+            except Exception:
+                # State đang thay đổi ở thread khác: bỏ qua lần scrape này
+                return lines
+            items = [((k,) if not isinstance(k, tuple) else k, v) for k, v in result.items()] \
+                if isinstance(result, dict) else [((), result)]
+        else:
+            with self._lock:
+                items = list(self._values.items())
+        for labels, value in sorted(items):
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Histogram với các mốc cố định; observe() là O(log số mốc)"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, buckets, labels=()):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # [số lần theo từng mốc (chưa cộng dồn) + mốc +Inf, tổng]
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def time(self, *labels):
+        """Context manager đo thời gian một đoạn code"""
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = self.header()
+        with self._lock:
+            items = sorted((labels, (list(counts), total)) for labels, (counts, total) in self._series.items())
+        names = self.label_names + ('le',)
+        for labels, (counts, total) in items:
+            running = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                running += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {running}")
+            label_text = _format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {running}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ('histogram', 'labels', 'start')
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+        return False
+
+
+class MetricsRegistry:
+    """Tập các metric của một tiến trình, render theo thứ tự đăng ký"""
+    def __init__(self):
+        self.metrics = []
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, func=None, labels=()):
+        return self._add(Counter(name, help_text, func, labels))
+
+    def gauge(self, name, help_text, func=None, labels=()):
+        return self._add(Gauge(name, help_text, func, labels))
+
+    def histogram(self, name, help_text, buckets, labels=()):
+        return self._add(Histogram(name, help_text, buckets, labels))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def instrument_methods(obj, method_names, histogram, errors=None):
+    """Bọc các method của obj (trên chính instance) để đo thời gian vào histogram theo nhãn tên method"""
+    for name in method_names:
+        method = getattr(obj, name, None)
+        if method is None:
+            continue
+
+        def make_wrapper(method, name):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return method(*args, **kwargs)
+                except Exception:
+                    if errors is not None:
+                        errors.inc(1, name)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - start, name)
+            return wrapper
+
+        setattr(obj, name, make_wrapper(method, name))
+
+
+class MetricsServer:
+    """Endpoint HTTP /metrics chạy ở thread nền"""
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        self.registry = registry
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] not in ('/metrics', '/'):
+                    self.send_error(404)
+                    return
+                body = registry_ref.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # Không in mỗi lần scrape
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
@@ -0,0 +1,149 @@
+# Phát lại log trận (server/match_log.py) bằng cách mô phỏng lại trên GameEngine không có mạng
+# Chạy: python main.py replay match.ftml [--tick N] [--view] [--cprofile out.pstats]
+import argparse
+import contextlib
+import cProfile
+import json
+import os
+import time
+
+from server.game import GameEngine
+from server.match_log import (MatchReader, REC_INPUT, REC_JOIN, REC_LEAVE, REC_NAME,
+                              REC_READY, REC_RESTART, REC_START, REC_TICK)
+
+
+class ReplayRunner:
+    """Nạp state ban đầu từ header rồi áp lần lượt các bản ghi; engine chạy đúng các lời gọi
+    như server đã chạy nên state ở mỗi tick trùng với trận gốc"""
+    def __init__(self, path):
+        self.reader = MatchReader(path)
+        self.engine = GameEngine()
+        self.engine.load_state(self.reader.initial_state)
+        self._records = self.reader.records()
+        self.finished = False
+
+    @property
+    def tick(self):
+        return self.engine.tick
+
+    @property
+    def first_tick(self):
+        return self.reader.index_ticks[0]
+
+    @property
+    def last_tick(self):
+        return self.reader.last_tick
+
+    def close(self):
+        self._records = iter(())
+        self.reader.close()
+
+    def seek(self, tick):
+        """Tới state sau tick đã cho: nạp keyframe gần nhất (tìm nhị phân) rồi mô phỏng phần còn lại.
+        Tua tiến trong cùng một khoảng keyframe thì chạy tiếp từ state hiện tại"""
+        if tick < self.engine.tick or self.reader.keyframe_tick(tick) > self.engine.tick:
+            _, state, offset = self.reader.find_keyframe(tick)
+            self.engine.load_state(state)
+            self._records = self.reader.records(offset, state)
+            self.finished = False
+        if tick > self.engine.tick:
+            return self.run_to(tick)
+        return True
+
+    def _apply(self, kind, data):
+        engine = self.engine
+        if kind == REC_TICK:
+            engine.update_game()
+            if engine.tick != data:
+                raise ValueError(f"Log lệch tick: engine {engine.tick}, log {data}")
+        elif kind == REC_INPUT:
+            player_id, message = data
+            engine.process_player_message(player_id, message)
+        elif kind == REC_JOIN:
+            player_id, name = data
+            engine.add_player(player_id, None, None, name)
+        elif kind == REC_LEAVE:
+            engine.remove_player(data)
+        elif kind == REC_READY:
+            engine.set_player_ready(data)
+        elif kind == REC_NAME:
+            player_id, name = data
+            engine.update_player_name(player_id, name)
+        elif kind in (REC_START, REC_RESTART):
+            if kind == REC_START:
+                engine.start_game()
+            else:
+                engine.restart_game()
+            # Map được chọn ngẫu nhiên trên server: dùng đúng map đã ghi
+            engine.current_map = data
+            engine.game_state['map_id'] = data
+
+    def step(self):
+        """Áp bản ghi tiếp theo; False khi đã hết log"""
+        if self.finished:
+            return False
+        record = next(self._records, None)
+        if record is None:
+            self.finished = True
+            return False
+        # GameEngine in log khi đổi map/kết thúc trận
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            self._apply(*record)
+        return True
+
+    def run_to(self, tick):
+        """Mô phỏng tới hết tick đã cho (hoặc tới cuối log)"""
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for record in self._records:
+                self._apply(*record)
+                if record[0] == REC_TICK and record[1] >= tick:
+                    return True
+        self.finished = True
+        return False
+
+    def run(self):
+        """Mô phỏng toàn bộ log, trả về số tick đã chạy"""
+        start_tick = self.engine.tick
+        self.run_to(float('inf'))
+        return self.engine.tick - start_tick
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='main.py replay', description="Re-simulate a recorded match log")
+    parser.add_argument('path', help='Match log (.ftml) written by the server with --record')
+    parser.add_argument('--tick', type=int, help='Stop at this server tick and print the state')
+    parser.add_argument('--cprofile', metavar='PATH', help='Profile the re-simulation and write pstats to PATH')
+    parser.add_argument('--view', action='store_true', help='Open the replay viewer window (seek with arrows/number keys)')
+    args = parser.parse_args(argv)
+
+    if args.view:
+        from client.gui import ReplayViewer
+        ReplayViewer(args.path).run(args.tick)
+        return 0
+
+    runner = ReplayRunner(args.path)
+    first_tick = runner.tick
+    profile = cProfile.Profile() if args.cprofile else None
+    if profile:
+        profile.enable()
+    start = time.perf_counter()
+    if args.tick is not None:
+        runner.seek(args.tick)
+    else:
+        runner.run()
+    elapsed = time.perf_counter() - start
+    if profile:
+        profile.disable()
+        profile.dump_stats(args.cprofile)
+
+    ticks = runner.tick - first_tick
+    state = runner.engine.get_game_state()
+    print(json.dumps(state, indent=2))
+    print(f"Replay: ticks {first_tick}..{runner.tick}, {ticks / elapsed if elapsed > 0 else 0.0:.0f} ticks/sec")
+    if profile:
+        print(f"  pstats: {args.cprofile}")
+    return 0
+
+
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,54 @@
 import socket
 import threading
 import json
+import secrets
 import time
 from server.game import GameEngine
 from server.database_manager_pymysql import DatabaseManager
+from server.ingest import UdpIngest
+from server.matchmaking import GAP_BUCKETS, WAIT_BUCKETS, Matchmaker, elo_update
+from server.metrics import DB_BUCKETS, TICK_BUCKETS, MetricsRegistry, MetricsServer, instrument_methods
+from common.codec import JSON, negotiate
 from common.messages import MessageTypes, GameConstants
 
+# Các method của DatabaseManager được đo thời gian truy vấn
+DB_METHODS = ('register_player', 'authenticate_player', 'create_game_session', 'update_game_result',
+              'update_player_stats', 'get_player_profile', 'get_leaderboard', 'get_player_rating', 'update_ratings')
+TICK_BUDGET = 1 / 60
+# Số datagram đọc được trong một lần drain
+INGEST_BATCH_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096)
+# Số người tối đa trong hàng đợi ghép trận và chu kỳ ghép (giây)
+MATCHMAKING_QUEUE_LIMIT = 1000
+MATCHMAKING_INTERVAL = 0.25
+
 class TankServer:
-    def __init__(self):
+    def __init__(self, record_dir=None, metrics_port=GameConstants.METRICS_PORT):
         self.tcp_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.host = '0.0.0.0'
         self.tcp_port = GameConstants.TCP_PORT
         self.udp_port = GameConstants.UDP_PORT
         self.game_engine = GameEngine()
+        # Ghi log mỗi trận vào record_dir để phát lại bằng: python main.py replay <file>
+        self.game_engine.record_dir = record_dir
         self.database = DatabaseManager()
         self.running = True
         self.player_authenticated = {}
         self.game_sessions = {}
+        # Codec UDP đã thống nhất với từng player lúc đăng nhập
+        self.player_codecs = {}
+        # Rating của hai người trong trận đang chơi, để cập nhật Elo khi trận kết thúc
+        self.current_match = None
+        self._next_matchmaking = 0.0
+        self.metrics_port = metrics_port
+        self.metrics_server = None
+        self._setup_metrics()
+        self.ingest = UdpIngest(self.udp_socket, packets=self.udp_packets, bytes_in=self.udp_bytes,
+                                decode_errors=self.udp_decode_errors, truncated=self.udp_truncated,
+                                errors=self.udp_errors, batch_sizes=self.udp_batch_size,
+                                rejected=self.udp_rejected, on_rebind=self.game_engine.set_player_udp_address)
+        self.matchmaker = Matchmaker(wait_times=self.matchmaking_wait, rating_gaps=self.matchmaking_gap,
+                                     matches=self.matchmaking_matches)
         
         self.tcp_socket.bind((self.host, self.tcp_port))
         self.udp_socket.bind((self.host, self.udp_port))
@@ -25,6 +56,55 @@ class TankServer:
         
         print(f"Server started on {self.host}:{self.tcp_port} (TCP) and {self.host}:{self.udp_port} (UDP)")
 
+    def _setup_metrics(self):
+        """Đăng ký các metric; gauge được tính lúc scrape nên không tốn gì cho tick"""
+        engine = self.game_engine
+        m = self.metrics = MetricsRegistry()
+        self.tick_duration = m.histogram('tank_tick_duration_seconds',
+                                         'Server tick duration by stage (update, broadcast, total)',
+                                         TICK_BUCKETS, labels=('stage',))
+        self.tick_overruns = m.counter('tank_tick_overruns_total', 'Ticks that exceeded the 1/60 s budget')
+        self.udp_packets = m.counter('tank_udp_packets_total', 'UDP datagrams by direction', labels=('direction',))
+        self.udp_bytes = m.counter('tank_udp_bytes_total', 'UDP payload bytes by direction', labels=('direction',))
+        self.udp_decode_errors = m.counter('tank_udp_decode_errors_total', 'UDP datagrams that were not a JSON object')
+        self.udp_truncated = m.counter('tank_udp_truncated_total', 'UDP datagrams dropped for exceeding the datagram size limit')
+        self.udp_batch_size = m.histogram('tank_udp_drain_batch_size', 'UDP datagrams read per tick drain',
+                                          INGEST_BATCH_BUCKETS)
+        self.udp_rejected = m.counter('tank_udp_rejected_total',
+                                      'UDP datagrams rejected before decoding or for a wrong player id',
+                                      labels=('reason',))
+        self.udp_errors = m.counter('tank_udp_socket_errors_total', 'UDP socket errors by direction', labels=('direction',))
+        m.gauge('tank_players', 'Players connected to the game engine', lambda: len(engine.players))
+        m.gauge('tank_authenticated_players', 'Players with an authenticated TCP session',
+                lambda: len(self.player_authenticated))
+        m.gauge('tank_rooms_active', 'Rooms with a match in progress (this server hosts one room)',
+                lambda: 1 if engine.game_started else 0)
+        m.gauge('tank_bullets', 'Bullets in flight', lambda: len(engine.bullets))
+        m.gauge('tank_engine_tick', 'Current simulation tick', lambda: engine.tick)
+        m.gauge('tank_engine_event_queue_depth', 'Replication events held by the engine', lambda: len(engine.events))
+        m.gauge('tank_udp_rcvbuf_bytes', 'Kernel receive buffer size of the UDP socket', lambda: self.ingest.rcvbuf)
+        m.gauge('tank_input_batch_size', 'Inputs applied for each player in the last tick',
+                lambda: dict(engine.input_batch), labels=('player',))
+        m.gauge('tank_input_queue_depth', 'Inputs waiting in each player queue',
+                lambda: {pid: len(q) for pid, q in list(engine.input_queues.items())}, labels=('player',))
+        m.counter('tank_input_dropped_total', 'Oldest inputs dropped from a full player queue',
+                  lambda: dict(engine.input_drops), labels=('player',))
+        m.gauge('tank_match_log_queue_depth', 'Match log records waiting for the writer thread',
+                lambda: engine.recorder.pending() if engine.recorder else 0)
+        self.matchmaking_wait = m.histogram('tank_matchmaking_wait_seconds', 'Time players spent in the matchmaking queue',
+                                            WAIT_BUCKETS)
+        self.matchmaking_gap = m.histogram('tank_matchmaking_rating_gap', 'Rating difference of matched pairs', GAP_BUCKETS)
+        self.matchmaking_matches = m.counter('tank_matchmaking_matches_total', 'Pairs formed by the matchmaker')
+        m.gauge('tank_matchmaking_queue_size', 'Players waiting in the matchmaking queue', lambda: len(self.matchmaker))
+        m.gauge('tank_matchmaking_oldest_wait_seconds', 'Wait time of the longest-waiting queued player',
+                lambda: self.matchmaker.oldest_wait())
+        m.gauge('tank_matchmaking_wait_quantile_seconds', 'Queue time percentiles over the most recent matches',
+                lambda: {str(q / 100): v for q, v in self.matchmaker.wait_percentiles().items()}, labels=('quantile',))
+        self.db_latency = m.histogram('tank_db_query_duration_seconds', 'DatabaseManager call duration by method',
+                                      DB_BUCKETS, labels=('method',))
+        self.db_errors = m.counter('tank_db_errors_total', 'DatabaseManager calls that raised', labels=('method',))
+        instrument_methods(self.database, DB_METHODS, self.db_latency, self.db_errors)
+
     def handle_tcp_client(self, client_socket, address):
         """Xử lý kết nối TCP từ client với xác thực"""
         player_id = None
@@ -70,10 +150,16 @@ class TankServer:
                 auth_success, player_db_id, message = self.database.authenticate_player(username, password)
             
             if auth_success and player_db_id:
+                # Client mới gửi danh sách codec theo thứ tự ưu tiên; client cũ không gửi thì dùng JSON
+                codec = negotiate(auth_info.get('codecs'))
+                # Client gửi kèm token trong gói UDP; server chỉ cho đổi cổng UDP (NAT) khi token khớp
+                udp_token = secrets.token_hex(8)
                 response = json.dumps({
                     'type': 'auth_response',
                     'success': True,
                     'player_id': player_db_id,
+                    'codec': codec.name,
+                    'udp_token': udp_token,
                     'message': 'Authentication successful'
                 })
                 client_socket.send(response.encode())
@@ -86,14 +172,23 @@ class TankServer:
 
                 if data.startswith("UDP_PORT:"):
                     udp_port = int(data.split(":")[1])
-                    # Thêm player vào game, truyền cả username
-                    self.game_engine.add_player(player_id, (address[0], udp_port), client_socket, username)
+                    rating, rated_games = self.database.get_player_rating(player_db_id)
+                    self.player_codecs[player_id] = codec
+                    self.ingest.register(player_id, (address[0], udp_port), codec, udp_token)
 
                     self.player_authenticated[player_id] = {
                         'db_id': player_db_id,
-                        'username': username
+                        'username': username,
+                        'udp_address': (address[0], udp_port),
+                        'socket': client_socket,
+                        'rating': rating,
+                        'rated_games': rated_games,
+                        'ready': False
                     }
                     print(f" Player {player_id} UDP port registered: {udp_port}")
+                    # Vào hàng đợi; run_matchmaking() đưa vào phòng khi ghép được đối thủ
+                    self.matchmaker.enqueue(player_id, rating)
+                    print(f" Player {player_id} queued for matchmaking (rating {rating:.0f})")
                     
                     client_socket.send(MessageTypes.WAITING_FOR_PLAYERS.encode())
 
@@ -115,6 +210,8 @@ class TankServer:
                             continue
 
                         if data == MessageTypes.READY:
+                            # Người còn trong hàng đợi: nhớ lại để đánh dấu ready khi vào phòng
+                            self.player_authenticated[player_id]['ready'] = True
                             self.game_engine.set_player_ready(player_id)
                             print(f"Player {player_id} is ready")
                             if self.game_engine.check_game_start():
@@ -131,7 +228,7 @@ class TankServer:
                         elif data == 'RELOAD':
                             print(f"Player {player_id} requested reload via TCP fallback")
                             try:
-                                self.game_engine.process_player_message(player_id, {'reload': True})
+                                self.game_engine.queue_input(player_id, {'reload': True})
                             except Exception as e:
                                 print(f"Error processing TCP reload for {player_id}: {e}")
                 else:
@@ -155,7 +252,14 @@ class TankServer:
         finally:
             if player_id:
                 print(f"Disconnecting player {player_id}...")
-                self.game_engine.remove_player(player_id)
+                self.matchmaker.cancel(player_id)
+                with self.game_engine.lock:
+                    seated = player_id in self.game_engine.players
+                    self.game_engine.remove_player(player_id)
+                    if seated:
+                        self._requeue_room()
+                self.ingest.unregister(player_id)
+                self.player_codecs.pop(player_id, None)
                 if player_id in self.player_authenticated:
                     del self.player_authenticated[player_id]
             client_socket.close()
@@ -183,6 +287,10 @@ class TankServer:
                 player1_db_id, player2_db_id, self.game_engine.current_map
             )
             self.game_engine.current_session_id = session_id
+            self.current_match = {pid: (self.player_authenticated[pid]['db_id'],
+                                        self.player_authenticated[pid]['rating'],
+                                        self.player_authenticated[pid]['rated_games'])
+                                  for pid in players}
         
         self.game_engine.start_game()
         print("Starting game with 2 players!")
@@ -256,6 +364,70 @@ class TankServer:
         
         # Logic _end_game gốc của GameEngine đã được gọi bên trong nó
 
+    def _rate_match(self, winner_id):
+        """Cập nhật Elo của hai người trong trận vừa kết thúc (hoà nếu không có người thắng)"""
+        match, self.current_match = self.current_match, None
+        (player_a, (db_a, rating_a, games_a)), (player_b, (db_b, rating_b, games_b)) = match.items()
+        score_a = 1.0 if winner_id == player_a else 0.0 if winner_id == player_b else 0.5
+        new_a, new_b = elo_update(rating_a, rating_b, score_a, games_a, games_b)
+        self.database.update_ratings([(db_a, new_a), (db_b, new_b)])
+        # Người đã thoát thì lần đăng nhập sau đọc lại từ CSDL
+        for player_id, rating in ((player_a, new_a), (player_b, new_b)):
+            info = self.player_authenticated.get(player_id)
+            if info is not None:
+                info['rating'] = rating
+                info['rated_games'] += 1
+        print(f"Rating: {player_a} {rating_a:.0f} -> {new_a:.0f}, {player_b} {rating_b:.0f} -> {new_b:.0f}")
+
+    def _requeue_room(self):
+        """Một người vừa rời phòng: người còn lại quay về hàng đợi (một lần) để được ghép theo rating"""
+        engine = self.game_engine
+        # Trận bị bỏ dở đã kết thúc trong remove_player (người còn lại thắng): tính rating ngay,
+        # vì phòng trống thì broadcast_game_state không chạy tới đoạn tính rating
+        if self.current_match is not None and engine.game_state['game_over']:
+            self._rate_match(engine.game_state['winner_id'])
+        self.current_match = None
+        for player_id in list(engine.players):
+            engine.remove_player(player_id)
+            info = self.player_authenticated.get(player_id)
+            if info is not None:
+                # Phải gửi READY lại ở phòng mới (client quay về màn hình chờ khi nhận WAITING_FOR_PLAYERS)
+                info['ready'] = False
+                self.matchmaker.enqueue(player_id, info['rating'])
+                try:
+                    info['socket'].send(MessageTypes.WAITING_FOR_PLAYERS.encode())
+                except Exception:
+                    pass
+        engine.reset_room()
+
+    def run_matchmaking(self):
+        """Khi phòng trống, đưa cặp đầu tiên mà hàng đợi ghép được vào phòng (gọi từ vòng lặp game)"""
+        now = time.monotonic()
+        if now < self._next_matchmaking:
+            return
+        self._next_matchmaking = now + MATCHMAKING_INTERVAL
+        engine = self.game_engine
+        if engine.game_started or engine.players:
+            return
+
+        for pair in self.matchmaker.match(now, limit=1):
+            # Cùng khoá với đường ngắt kết nối: người thoát lúc đang ghép thì hoặc không được xếp vào phòng, hoặc được xử lý như rời phòng
+            with engine.lock:
+                infos = [self.player_authenticated.get(player_id) for player_id in pair]
+                if None in infos:
+                    # Một người vừa thoát sau khi được ghép: người còn lại chờ tiếp
+                    for player_id, info in zip(pair, infos):
+                        if info is not None:
+                            self.matchmaker.enqueue(player_id, info['rating'])
+                    continue
+                for player_id, info in zip(pair, infos):
+                    engine.add_player(player_id, info['udp_address'], info['socket'], info['username'])
+                    if info['ready']:
+                        engine.set_player_ready(player_id)
+            print(f"Matched {pair[0]} ({infos[0]['rating']:.0f}) vs {pair[1]} ({infos[1]['rating']:.0f})")
+            if engine.check_game_start():
+                self.start_game()
+
     def get_opponent_id(self, player_id):
         """Lấy ID của đối thủ"""
         players = list(self.game_engine.players.keys())
@@ -264,52 +436,56 @@ class TankServer:
         return players[1] if str(players[0]) == str(player_id) else players[0]
 
     def handle_udp_data(self):
-        """Xử lý dữ liệu UDP từ clients"""
-        while self.running:
-            try:
-                data, address = self.udp_socket.recvfrom(1024)
-                message = json.loads(data.decode())
-                player_id = message.get('id')
-                
-                if player_id in self.game_engine.players:
-                    # Cập nhật địa chỉ UDP (phòng khi bị thay đổi)
-                    self.game_engine.players[player_id]['udp_address'] = address
-                    
-                    if self.game_engine.game_started:
-                        self.game_engine.process_player_message(player_id, message)
-                    
-            except Exception as e:
-                pass
+        """Xử lý toàn bộ input UDP đang chờ (gọi ở đầu mỗi tick); ingest chỉ trả về input
+        từ đúng địa chỉ đã đăng ký của player"""
+        batch = self.ingest.drain()
+        if self.game_engine.game_started:
+            for player_id, message in batch:
+                self.game_engine.queue_input(player_id, message)
 
     def broadcast_game_state(self):
         """Gửi game state tới tất cả players"""
         if not self.game_engine.players:
             return
             
-        # Yêu cầu game_engine build state mới nhất
-        game_state = self.game_engine.get_game_state()
+        # Snapshot mới nhất: player và sự kiện đạn (client tự mô phỏng đường bay)
+        game_state = self.game_engine.get_snapshot()
         
         # Kiểm tra nếu game vừa kết thúc, gọi _end_game để lưu stats
         if game_state['game_over'] and self.game_engine.game_started:
             # game_started flag vẫn là True, nghĩa là _end_game chưa được gọi
             self._end_game(game_state['winner_id'])
             # GameEngine sẽ set game_started = False
+        if game_state['game_over'] and self.current_match is not None:
+            self._rate_match(game_state['winner_id'])
             
         
-        game_data = json.dumps(game_state).encode()
+        # Mỗi codec đang dùng chỉ mã hoá snapshot một lần
+        encoded = {}
         
         for player_id in list(self.game_engine.players.keys()):
             udp_address = self.game_engine.get_player_udp_address(player_id)
             if udp_address:
+                codec = self.player_codecs.get(player_id, JSON)
+                game_data = encoded.get(codec.name)
+                if game_data is None:
+                    game_data = encoded[codec.name] = codec.encode(game_state)
                 try:
                     self.udp_socket.sendto(game_data, udp_address)
+                    self.udp_packets.inc(1, 'out')
+                    self.udp_bytes.inc(len(game_data), 'out')
                 except Exception as e:
+                    self.udp_errors.inc(1, 'out')
                     print(f"Lỗi broadcast UDP: {e}")
 
     def restart_game(self):
         """Khởi động lại game"""
         print("Restarting game...")
         self.game_engine.restart_game()
+        # Client đặt lại trạng thái ready khi nhận RESTART
+        for player_id in self.game_engine.players:
+            if player_id in self.player_authenticated:
+                self.player_authenticated[player_id]['ready'] = False
         
         # Gửi tín hiệu restart cho tất cả players
         for socket in self.game_engine.get_all_tcp_sockets():
@@ -324,8 +500,18 @@ class TankServer:
         """Vòng lặp cập nhật game chính"""
         while self.running:
             try:
+                start = time.perf_counter()
+                self.run_matchmaking()
+                self.handle_udp_data()
                 self.game_engine.update_game()
+                updated = time.perf_counter()
                 self.broadcast_game_state()
+                end = time.perf_counter()
+                self.tick_duration.observe(updated - start, 'update')  # gồm cả đọc input UDP
+                self.tick_duration.observe(end - updated, 'broadcast')
+                self.tick_duration.observe(end - start, 'total')
+                if end - start > TICK_BUDGET:
+                    self.tick_overruns.inc()
                 time.sleep(1/60)  # 60 FPS
             except Exception as e:
                 print(f"Lỗi trong game loop: {e}")
@@ -338,7 +524,7 @@ class TankServer:
         while self.running:
             try:
                 client_socket, address = self.tcp_socket.accept()
-                if len(self.game_engine.players) < GameConstants.MAX_PLAYERS:
+                if len(self.matchmaker) < MATCHMAKING_QUEUE_LIMIT:
                     threading.Thread(
                         target=self.handle_tcp_client,
                         args=(client_socket, address),
@@ -354,8 +540,13 @@ class TankServer:
     def start(self):
         """Khởi động server"""
         threading.Thread(target=self.accept_tcp_connections, daemon=True).start()
-        threading.Thread(target=self.handle_udp_data, daemon=True).start()
         threading.Thread(target=self.update_game_loop, daemon=True).start()
+        if self.metrics_port:
+            try:
+                self.metrics_server = MetricsServer(self.metrics, '127.0.0.1', self.metrics_port).start()
+                print(f"Metrics: http://127.0.0.1:{self.metrics_port}/metrics")
+            except OSError as e:
+                print(f"Không thể mở cổng metrics {self.metrics_port}: {e}")
         
         print("Server is running...")
         try:
@@ -364,6 +555,10 @@ class TankServer:
         except KeyboardInterrupt:
             print("Shutting down server...")
             self.running = False
+            if self.game_engine.recorder:
+                self.game_engine.recorder.close(wait=True)
+            if self.metrics_server:
+                self.metrics_server.stop()
             self.tcp_socket.close()
             self.udp_socket.close()
             self.database.close()
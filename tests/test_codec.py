@@ -0,0 +1,58 @@
+# Mọi codec: roundtrip message của game, và dữ liệu cắt cụt/rác chỉ gây ra lỗi trong DECODE_ERRORS
+import random
+
+import pytest
+
+from common.codec import CODECS, DECODE_ERRORS
+
+SNAPSHOT = {
+    'tick': 1234,
+    'players': {'1': {'x': 100.5, 'y': 300, 'angle': 270, 'hp': 75, 'ammo': 3, 'name': 'Tên (1)', 'ready': True}},
+    'bullet_events': [['s', 1230, 7, 100.5, 300.0, 270, '1'], ['d', 1233, 7, 'hit', '2']],
+    'game_over': False,
+    'winner_id': None,
+    'map_id': 2,
+}
+
+
+def _decode_or_reject(codec, data):
+    try:
+        codec.decode(data)
+    except DECODE_ERRORS:
+        pass
+
+
+@pytest.mark.parametrize('name', sorted(CODECS))
+def test_roundtrip(name):
+    codec = CODECS[name]
+    assert codec.decode(codec.encode(SNAPSHOT)) == SNAPSHOT
+
+
+@pytest.mark.parametrize('name', sorted(CODECS))
+def test_truncated_input_is_rejected(name):
+    codec = CODECS[name]
+    data = codec.encode(SNAPSHOT)
+    for end in range(len(data)):
+        _decode_or_reject(codec, data[:end])
+
+
+@pytest.mark.parametrize('name', sorted(CODECS))
+def test_garbage_input_is_rejected(name):
+    codec = CODECS[name]
+    rng = random.Random(0)
+    data = codec.encode(SNAPSHOT)
+    for _ in range(2000):
+        garbage = bytearray(data)
+        for _ in range(rng.randint(1, 8)):
+            garbage[rng.randrange(len(garbage))] = rng.randrange(256)
+        _decode_or_reject(codec, bytes(garbage))
+        _decode_or_reject(codec, bytes(rng.randrange(256) for _ in range(rng.randint(1, 64))))
+
+
+@pytest.mark.parametrize('name', sorted(CODECS))
+def test_deep_nesting_is_rejected(name):
+    codec = CODECS[name]
+    # Mảng lồng sâu theo từng định dạng: JSON '[', msgpack fixarray 0x91, binary LIST8 dài 1
+    for prefix in (b'{"a":', b'\x81\xa1a', b'\x0c\x01\x41'):
+        for item in (b'[', b'\x91', b'\x0a\x01'):
+            _decode_or_reject(codec, prefix + item * 5000)
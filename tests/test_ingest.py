@@ -0,0 +1,75 @@
+# UdpIngest.drain: gói hỏng chỉ bị đếm và bỏ qua, các input hợp lệ cùng lô vẫn được trả về
+import socket
+import time
+
+from server.ingest import UdpIngest
+from server.metrics import MetricsRegistry
+
+
+def _pair():
+    receiver = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    receiver.bind(('127.0.0.1', 0))
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.bind(('127.0.0.1', 0))
+    return receiver, sender
+
+
+def _drain_until(ingest, count, timeout=1.0):
+    batch = []
+    deadline = time.monotonic() + timeout
+    while ingest.packets.value('in') < count and time.monotonic() < deadline:
+        batch += ingest.drain()
+        time.sleep(0.001)
+    return batch
+
+
+def test_deeply_nested_datagram_does_not_break_drain():
+    receiver, sender = _pair()
+    try:
+        metrics = MetricsRegistry()
+        ingest = UdpIngest(receiver, packets=metrics.counter('packets', '', labels=('direction',)),
+                           decode_errors=metrics.counter('decode', ''))
+        ingest.register('1', sender.getsockname())
+        target = receiver.getsockname()
+        sender.sendto(b'{"a":' + b'[' * 1019, target)
+        sender.sendto(b'{"id":"1","x":1,"y":2,"angle":3}', target)
+
+        batch = _drain_until(ingest, 2)
+        assert batch == [('1', {'id': '1', 'x': 1, 'y': 2, 'angle': 3})]
+        assert ingest.decode_errors.value() == 1
+    finally:
+        sender.close()
+        receiver.close()
+
+
+def test_rebind_requires_session_token():
+    receiver, sender = _pair()
+    intruder = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    intruder.bind(('127.0.0.1', 0))
+    try:
+        metrics = MetricsRegistry()
+        rebinds = []
+        ingest = UdpIngest(receiver, packets=metrics.counter('packets', '', labels=('direction',)),
+                           rejected=metrics.counter('rejected', '', labels=('reason',)),
+                           on_rebind=lambda player_id, address: rebinds.append((player_id, address)))
+        ingest.register('1', sender.getsockname(), token='secret')
+        target = receiver.getsockname()
+
+        # Cùng IP nhưng cổng khác, không có (hoặc sai) token: không được nhận là player '1'
+        intruder.sendto(b'{"id":"1","x":1,"y":2,"angle":3}', target)
+        intruder.sendto(b'{"id":"1","x":1,"y":2,"angle":3,"token":"guess"}', target)
+        assert _drain_until(ingest, 2) == []
+        assert ingest.rejected.value('id_mismatch') == 2
+        assert rebinds == []
+        assert ingest.routes[sender.getsockname()].player_id == '1'
+
+        # Đúng token (NAT đổi cổng): route chuyển sang địa chỉ mới
+        intruder.sendto(b'{"id":"1","x":1,"y":2,"angle":3,"token":"secret"}', target)
+        batch = _drain_until(ingest, 3)
+        assert [player_id for player_id, _ in batch] == ['1']
+        assert rebinds == [('1', intruder.getsockname())]
+        assert sender.getsockname() not in ingest.routes
+    finally:
+        intruder.close()
+        sender.close()
+        receiver.close()
@@ -0,0 +1,120 @@
+# Đối thủ rời phòng -> người còn lại quay về hàng đợi -> cặp mới bắt đầu từ màn hình chờ
+import contextlib
+import io
+
+import pytest
+
+from server.game import GameEngine
+
+
+class _Socket:
+    def __init__(self):
+        self.sent = []
+
+    def send(self, data):
+        self.sent.append(data.decode())
+
+
+class _Database:
+    def __init__(self):
+        self.ratings = []
+
+    def create_game_session(self, *args):
+        return 1
+
+    def update_ratings(self, ratings):
+        self.ratings.append(ratings)
+
+
+def _quiet():
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def test_reset_room_clears_finished_match():
+    engine = GameEngine()
+    with _quiet():
+        engine.add_player('1', None, None, 'a')
+        engine.add_player('2', None, None, 'b')
+        engine.set_player_ready('1')
+        engine.set_player_ready('2')
+        engine.start_game()
+        engine.queue_input('1', {'x': 100, 'y': 300, 'angle': 0, 'fire': True})
+        engine.update_game()
+        engine.remove_player('2')
+        assert engine.game_state['game_over'] and engine.game_state['winner_id'] == '1'
+        engine.remove_player('1')
+        engine.reset_room()
+        engine.add_player('1', None, None, 'a')
+        engine.add_player('3', None, None, 'c')
+
+    snapshot = engine.get_snapshot()
+    assert snapshot['game_over'] is False
+    assert snapshot['winner_id'] is None
+    assert not engine.game_started
+    assert not engine.bullets
+    assert not engine.ready_players and not engine.restart_requests
+
+
+def test_leave_requeue_new_pair():
+    pytest.importorskip('pymysql')
+    from server.matchmaking import Matchmaker
+    from server.server import TankServer
+
+    server = TankServer.__new__(TankServer)
+    server.game_engine = GameEngine()
+    server.database = _Database()
+    server.matchmaker = Matchmaker()
+    server.player_authenticated = {}
+    server.current_match = None
+    server._next_matchmaking = 0.0
+
+    def login(player_id, rating):
+        server.player_authenticated[player_id] = {
+            'db_id': int(player_id), 'username': f"p{player_id}", 'udp_address': None,
+            'socket': _Socket(), 'rating': rating, 'rated_games': 0, 'ready': False,
+        }
+        server.matchmaker.enqueue(player_id, rating)
+
+    def disconnect(player_id):
+        # Giống khối finally của handle_tcp_client
+        server.matchmaker.cancel(player_id)
+        with server.game_engine.lock:
+            seated = player_id in server.game_engine.players
+            server.game_engine.remove_player(player_id)
+            if seated:
+                server._requeue_room()
+        del server.player_authenticated[player_id]
+
+    engine = server.game_engine
+    with _quiet():
+        login('1', 1500.0)
+        login('2', 1500.0)
+        server.run_matchmaking()
+        assert set(engine.players) == {'1', '2'}
+        for player_id in ('1', '2'):
+            server.player_authenticated[player_id]['ready'] = True
+            engine.set_player_ready(player_id)
+        server.start_game()
+        assert engine.game_started and server.current_match is not None
+
+        disconnect('2')
+
+        # Trận bỏ dở được tính cho người còn lại, người đó quay về hàng đợi một lần và phải READY lại
+        survivor = server.player_authenticated['1']
+        assert server.current_match is None
+        assert len(server.database.ratings) == 1
+        assert survivor['rating'] > 1500.0
+        assert survivor['ready'] is False
+        assert '1' in server.matchmaker and not engine.players
+        assert survivor['socket'].sent.count('WAITING_FOR_PLAYERS') == 1
+
+        login('3', 1500.0)
+        server._next_matchmaking = 0.0
+        server.run_matchmaking()
+
+    assert set(engine.players) == {'1', '3'}
+    assert not engine.ready_players and not engine.game_started
+    snapshot = engine.get_snapshot()
+    assert snapshot['game_over'] is False
+    assert snapshot['winner_id'] is None
+    assert survivor['socket'].sent.count('WAITING_FOR_PLAYERS') == 1
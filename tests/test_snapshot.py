@@ -0,0 +1,33 @@
+# get_snapshot: players được đưa thẳng ra (copy-on-write), tick sau không được sửa snapshot đã phát ra
+import contextlib
+import io
+
+from server.game import GameEngine
+
+
+def test_snapshot_views_are_not_mutated_by_later_ticks():
+    engine = GameEngine()
+    with contextlib.redirect_stdout(io.StringIO()):
+        engine.add_player('1', None, None, 'a')
+        engine.add_player('2', None, None, 'b')
+        engine.set_player_ready('1')
+        engine.set_player_ready('2')
+        engine.start_game()
+        engine.update_game()
+
+        before = engine.get_snapshot()
+        x = before['players']['1']['x']
+        still = before['players']['2']
+
+        engine.queue_input('1', {'x': x + 5, 'y': 300, 'angle': 0})
+        engine.update_game()
+        after = engine.get_snapshot()
+
+        # Player 1 di chuyển: dict mới; player 2 đứng yên: dùng lại đúng dict cũ
+        assert before['players']['1']['x'] == x
+        assert after['players']['1']['x'] == x + 5
+        assert after['players']['2'] is still
+
+        engine.remove_player('2')
+    assert '2' in before['players']
+    assert '2' not in engine.get_snapshot()['players']